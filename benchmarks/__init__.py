@@ -0,0 +1,23 @@
+"""
+Benchmarks for flickr-archive-rebuilder.
+
+Run from the repository root as modules, e.g.
+
+  python3 -m benchmarks.suite --files 100000 --output results.json
+  python3 -m benchmarks.bench_json_loading --files 50000
+  python3 -m benchmarks.bench_memory --files 200000
+  python3 -m benchmarks.bench_classify --files 100000
+
+The scripts/ folder is put on sys.path so its modules import as they do
+when the scripts are run directly.
+"""
+
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+SCRIPTS = ROOT / "scripts"
+FAKE_EXIFTOOL = Path(__file__).resolve().parent / "fake_exiftool.py"
+
+if str(SCRIPTS) not in sys.path:
+    sys.path.insert(0, str(SCRIPTS))
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Media classification: per-name cost and find_media() walk time.
+
+Generates a synthetic export (or re-uses --corpus) and compares
+
+  names   classifying every file name the walk sees: the copy-pasted
+          splitext/suffix + set lookups + ID_RE.findall per script vs
+          media_names.classify()
+  walk    the original find_media() (Path.rglob, a Path per entry,
+          p.suffix.lower(), ID_RE.findall on p.name) vs the current one
+          (os.scandir on entry names, media_names.classify, Path only for
+          matched files)
+
+Both walks must return the same Flickr ID -> files mapping. Each timing is
+the best of --rounds, with a warm page cache.
+
+python3 -m benchmarks.bench_classify --files 100000
+"""
+
+import argparse, os, re, tempfile, time
+from pathlib import Path
+
+from benchmarks.synthetic import ensure
+from media_inventory import group_by_id, walk_media
+from media_names import classify
+
+ID_RE = re.compile(r'(?<!\d)(\d{10,12})(?!\d)')
+PHOTO_EXTS = {".jpg",".jpeg",".png",".heic",".tif",".tiff"}
+VIDEO_EXTS = {".mp4",".mov",".m4v"}
+
+def old_classify(name):
+    ext = os.path.splitext(name)[1].lower()
+    kind = "photo" if ext in PHOTO_EXTS else ("video" if ext in VIDEO_EXTS else None)
+    if not kind:
+        return None
+    m = ID_RE.findall(name)
+    return kind, m[-1] if m else ""
+
+def old_find_media(root):
+    id_to_files = {}
+    for p in Path(root).rglob("*"):
+        if not p.is_file():
+            continue
+        ext = p.suffix.lower()
+        if ext not in PHOTO_EXTS and ext not in VIDEO_EXTS:
+            continue
+        m = ID_RE.findall(p.name)
+        if m:
+            id_to_files.setdefault(m[-1], []).append(p)
+    return id_to_files
+
+def new_find_media(root):
+    return group_by_id(walk_media(root))
+
+def best_of(rounds, fn):
+    best = None
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        out = fn()
+        secs = time.perf_counter() - t0
+        best = secs if best is None else min(best, secs)
+    return out, best
+
+def report(label, n, t_old, t_new):
+    print(f"[RESULT] {label:5s} old: {t_old:7.3f}s {n / t_old:12,.0f}/s   "
+          f"new: {t_new:7.3f}s {n / t_new:12,.0f}/s   speedup {t_old / t_new:.2f}x")
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--files", type=int, default=50000)
+    ap.add_argument("--rounds", type=int, default=3)
+    ap.add_argument("--repeat", type=int, default=10, help="Passes over the names for the per-name timing")
+    ap.add_argument("--corpus", default=None, help="Keep the generated export here (re-used if present)")
+    args = ap.parse_args()
+
+    tmp = None
+    if args.corpus:
+        root = Path(args.corpus).expanduser()
+    else:
+        tmp = tempfile.TemporaryDirectory()
+        root = Path(tmp.name)
+    spec = ensure(root, args.files, media_bytes=64)
+    media_root = spec["media_root"]
+
+    names = [n for _, _, files in os.walk(media_root) for n in files] * args.repeat
+    old, t_old = best_of(args.rounds, lambda: [old_classify(n) for n in names])
+    new, t_new = best_of(args.rounds, lambda: [classify(n) for n in names])
+    assert old == new, "classify() disagrees with the old per-script checks"
+    report("names", len(names), t_old, t_new)
+
+    old, t_old = best_of(args.rounds, lambda: old_find_media(media_root))
+    new, t_new = best_of(args.rounds, lambda: new_find_media(media_root))
+    assert {k: sorted(map(str, v)) for k, v in old.items()} == {k: sorted(map(str, v)) for k, v in new.items()}, \
+        "find_media results differ"
+    report("walk", spec["files"], t_old, t_new)
+
+    if tmp:
+        tmp.cleanup()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Compare serial vs process-pool parsing of Flickr JSON sidecars.
+
+Generates a synthetic corpus of photo_<id>.json files in a temp folder (or
+--corpus, which is kept), then times sidecar_index.parse_files() with
+1 worker and with --json-workers.
+
+python3 -m benchmarks.bench_json_loading --files 50000 --json-workers 8
+"""
+
+import argparse, tempfile, time
+from pathlib import Path
+
+from benchmarks.synthetic import write_sidecars
+from sidecar_index import DEFAULT_JSON_WORKERS, parse_files
+
+def timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return out, time.perf_counter() - t0
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--files", type=int, default=20000)
+    ap.add_argument("--json-workers", type=int, default=DEFAULT_JSON_WORKERS)
+    ap.add_argument("--corpus", default=None, help="Keep the generated corpus here (re-used if present)")
+    args = ap.parse_args()
+
+    tmp = None
+    if args.corpus:
+        root = Path(args.corpus).expanduser()
+    else:
+        tmp = tempfile.TemporaryDirectory()
+        root = Path(tmp.name)
+
+    paths = sorted(root.rglob("photo_*.json"))
+    if len(paths) < args.files:
+        print(f"[INFO] Generating {args.files:,} synthetic sidecars in {root}")
+        write_sidecars(root, args.files)
+        paths = sorted(root.rglob("photo_*.json"))
+    paths = paths[:args.files]
+
+    serial, t_serial = timed(lambda: parse_files(paths, 1))
+    parallel, t_parallel = timed(lambda: parse_files(paths, args.json_workers))
+    assert serial == parallel, "parallel loader returned different records"
+
+    print(f"[RESULT] serial:   {t_serial:7.2f}s  {len(paths) / t_serial:10,.0f} files/s")
+    print(f"[RESULT] parallel: {t_parallel:7.2f}s  {len(paths) / t_parallel:10,.0f} files/s  (json-workers={args.json_workers})")
+    print(f"[RESULT] speedup:  {t_serial / t_parallel:.2f}x")
+
+    if tmp:
+        tmp.cleanup()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Peak memory of the fix/embed worklist, default vs --stream.
+
+Generates a synthetic organized archive (benchmarks/synthetic.py,
+layout="organized": media in YYYY/MM folders plus JSON sidecars), builds the
+sidecar index once, then runs fix_and_embed.py --dry-run with all metadata flags in both
+modes and reports each run's peak RSS. No exiftool is needed: a dry run
+builds the full worklist but writes nothing.
+
+python3 -m benchmarks.bench_memory --files 200000
+"""
+
+import argparse, os, subprocess, sys, tempfile, time
+from pathlib import Path
+
+from benchmarks import SCRIPTS
+from benchmarks.synthetic import ensure
+
+def peak_rss_mb(cmd):
+    # -> (seconds, peak RSS in MB) of one child process
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL)
+    _, status, usage = os.wait4(proc.pid, 0)
+    elapsed = time.perf_counter() - t0
+    if os.waitstatus_to_exitcode(status) != 0:
+        sys.exit(f"[ERROR] {' '.join(cmd)} failed")
+    # ru_maxrss is KB on Linux, bytes on macOS
+    return elapsed, usage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--files", type=int, default=100000)
+    ap.add_argument("--corpus", default=None, help="Keep the generated archive here (re-used if present)")
+    args = ap.parse_args()
+
+    tmp = None
+    if args.corpus:
+        root = Path(args.corpus).expanduser()
+    else:
+        tmp = tempfile.TemporaryDirectory()
+        root = Path(tmp.name)
+
+    spec = ensure(root, args.files, layout="organized", media_bytes=64)
+    json_dirs = spec["json_dirs"]
+    index = str(root / "index.sqlite")
+    subprocess.run([sys.executable, str(SCRIPTS / "sidecar_index.py"), "--json", *json_dirs, "--index", index],
+                   check=True, stdout=subprocess.DEVNULL)
+
+    base = [sys.executable, str(SCRIPTS / "fix_and_embed.py"), "--media-root", spec["media_root"],
+            "--json", *json_dirs, "--index", index, "--title", "--description", "--tags", "--geo", "--dry-run"]
+    for label, extra in (("default", []), ("stream", ["--stream"])):
+        secs, mb = peak_rss_mb(base + extra)
+        print(f"[RESULT] {label:8s} {secs:7.2f}s  peak RSS {mb:8.1f} MB  ({args.files:,} files)")
+
+    if tmp:
+        tmp.cleanup()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Stand-in for exiftool used by the benchmarks (point EXIFTOOL at this file).
+
+Understands what the scripts send: the -stay_open/-@ - protocol with
+-echo3/-echo4/-executeN, -T scans with an -@ argfile, -j reads and tag
+writes. Dates come from the "FAKEEXIF <date>" first line that
+benchmarks/synthetic.py writes into each media file. Writes only touch the
+file's mtime, so the journal sees a change like after a real write.
+
+Latency is simulated per file:
+  FAKE_EXIFTOOL_LATENCY_MS   per file written (default 5)
+  FAKE_EXIFTOOL_READ_MS      per file in a -j read (default 1)
+  FAKE_EXIFTOOL_SCAN_MS      per file in a -T scan (default 0.2)
+"""
+
+import json, os, sys, time
+
+WRITE_S = float(os.environ.get("FAKE_EXIFTOOL_LATENCY_MS", "5")) / 1000
+READ_S = float(os.environ.get("FAKE_EXIFTOOL_READ_MS", "1")) / 1000
+SCAN_S = float(os.environ.get("FAKE_EXIFTOOL_SCAN_MS", "0.2")) / 1000
+DATE_TAGS = {"DateTimeOriginal", "CreateDate"}
+VALUE_OPTS = {"-echo1", "-echo2", "-echo3", "-echo4", "-@"}
+
+def file_date(path):
+    try:
+        with open(path, "rb") as f:
+            head = f.readline(64).decode("ascii", "replace").split()
+    except OSError:
+        return None
+    if len(head) >= 3 and head[0] == "FAKEEXIF":
+        return f"{head[1]} {head[2]}"
+    return None
+
+def parse(args):
+    files, tags, echo, flags = [], [], [], set()
+    i = 0
+    while i < len(args):
+        a = args[i]
+        if a in VALUE_OPTS and i + 1 < len(args):
+            v = args[i + 1]
+            if a == "-@":
+                with open(v, encoding="utf-8") as f:
+                    files += [line.rstrip("\n") for line in f if line.strip()]
+            else:
+                echo.append((a, v))
+            i += 2
+            continue
+        if a.startswith("-"):
+            if "=" in a:
+                tags.append(a)
+            elif a[1:] in ("T", "j", "n", "G0", "ec", "overwrite_original", "m", "q"):
+                flags.add(a[1:])
+            else:
+                tags.append(a)
+        else:
+            files.append(a)
+        i += 1
+    return files, tags, echo, flags
+
+def scan(files, tags, out):
+    names = [t[1:] for t in tags if "=" not in t]
+    for f in files:
+        time.sleep(SCAN_S)
+        date = file_date(f)
+        cols = []
+        for t in names:
+            if t in DATE_TAGS:
+                cols.append(date or "-")
+            elif t == "FileName":
+                cols.append(os.path.basename(f))
+            elif t == "Directory":
+                cols.append(os.path.dirname(f) or ".")
+            else:
+                cols.append("-")
+        out.write("\t".join(cols) + "\n")
+        out.flush()  # exiftool -T prints each file's line as it goes
+    return 0
+
+def read(files, out):
+    rows = []
+    for f in files:
+        time.sleep(READ_S)
+        if os.path.exists(f):
+            date = file_date(f)
+            rows.append({"SourceFile": f, "EXIF:DateTimeOriginal": date} if date else {"SourceFile": f})
+    out.write(json.dumps(rows) + "\n")
+    return 0
+
+def write(files, out, err):
+    status = updated = 0
+    for f in files:
+        time.sleep(WRITE_S)
+        if os.path.exists(f):
+            os.utime(f)
+            updated += 1
+        else:
+            err.write(f"Error: File not found - {f}\n")
+            status = 1
+    out.write(f"    {updated} image files updated\n")
+    return status
+
+def run(args, out, err):
+    files, tags, echo, flags = parse(args)
+    if "T" in flags:
+        status = scan(files, tags, out)
+    elif "j" in flags:
+        status = read(files, out)
+    else:
+        status = write(files, out, err)
+    for opt, text in echo:
+        stream = out if opt in ("-echo1", "-echo3") else err
+        stream.write(text.replace("${status}", str(status)) + "\n")
+    return status
+
+def main():
+    argv = sys.argv[1:]
+    if argv[:4] != ["-stay_open", "True", "-@", "-"]:
+        sys.exit(run(argv, sys.stdout, sys.stderr))
+    buf = []
+    for line in sys.stdin:
+        line = line.rstrip("\n")
+        if line.startswith("-execute"):
+            run(buf, sys.stdout, sys.stderr)
+            sys.stdout.write("{ready%s}\n" % line[len("-execute"):])
+            sys.stdout.flush()
+            sys.stderr.flush()
+            buf = []
+        elif buf == ["-stay_open"] and line == "False":
+            break
+        else:
+            buf.append(line)
+
+if __name__ == "__main__":
+    main()
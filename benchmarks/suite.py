@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark suite on a synthetic Flickr export.
+
+Generates (or re-uses, see --corpus) a synthetic export, points EXIFTOOL at
+benchmarks/fake_exiftool.py and times each stage in its own child process:
+
+  json_index         build the sidecar index from scratch
+  load_json_records  load all records from the (warm) index
+  find_media         walk + group the export by Flickr ID
+  organize           organize_by_year_month.run (copy) into <corpus>/out
+  fix_photo_dates    \\
+  fix_video_dates     > on <corpus>/out, through the fake exiftool
+  embed_metadata     /
+  fix_and_embed      fused dates + metadata stage
+
+Each stage reports seconds, files, files/s and the child's peak RSS. The
+results go to a JSON file (--output) so runs can be compared between
+versions with --compare.
+
+python3 -m benchmarks.suite --files 100000 --output results.json
+python3 -m benchmarks.suite --files 100000 --output new.json --compare results.json
+"""
+
+import argparse, json, os, platform, resource, shutil, subprocess, sys, tempfile, time
+from datetime import datetime, timezone
+
+from benchmarks import FAKE_EXIFTOOL, ROOT
+from benchmarks.synthetic import ensure
+
+RESULTS_VERSION = 1
+STAGES = ["json_index", "load_json_records", "find_media", "organize",
+          "fix_photo_dates", "fix_video_dates", "embed_metadata", "fix_and_embed"]
+# A stage this much slower (files/s) than the baseline is flagged.
+REGRESSION = 0.10
+
+def peak_rss_mb():
+    # ru_maxrss is KB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+def run_stage(name, spec, corpus, workers):
+    """Runs in the child process; -> number of files the stage handled."""
+    from pathlib import Path
+    from run_context import RunContext
+
+    json_dirs = spec["json_dirs"]
+    index = str(Path(corpus) / "bench-index.sqlite")
+    out = str(Path(corpus) / "out")
+    common = ["--json", *json_dirs, "--index", index, "--workers", str(workers)]
+
+    if name == "json_index":
+        from sidecar_index import open_index
+        Path(index).unlink(missing_ok=True)
+        with open_index(json_dirs, index) as idx:
+            return idx.count()
+    if name == "load_json_records":
+        from embed_metadata import load_json_records
+        return len(load_json_records(json_dirs, index))
+    if name == "find_media":
+        from flickr_dates import find_media
+        return sum(len(v) for v in find_media(spec["media_root"]).values())
+
+    import importlib
+    if name == "organize":
+        shutil.rmtree(out, ignore_errors=True)
+        module = importlib.import_module("organize_by_year_month")
+        argv = ["--downloads", spec["media_root"], "--out", out,
+                "--manifest", str(Path(corpus) / "manifest.csv")]
+    else:
+        if not Path(out).exists():
+            raise SystemExit(f"[ERROR] {out} missing; run the organize stage first")
+        module = importlib.import_module(name)
+        if name in ("fix_photo_dates", "fix_video_dates"):
+            argv = ["--downloads", out] + common
+        else:
+            argv = ["--media-root", out] + common + ["--title", "--description", "--tags", "--geo"]
+    args = module.build_parser().parse_args(argv)
+    with RunContext.from_args(args) as ctx:
+        return module.run(args, ctx)
+
+def child(args):
+    spec = json.loads(args.spec)
+    with open(os.devnull, "w") as devnull:
+        stdout, sys.stdout = sys.stdout, devnull
+        try:
+            t0 = time.perf_counter()
+            files = run_stage(args.run_stage, spec, args.corpus, args.workers)
+            seconds = time.perf_counter() - t0
+        finally:
+            sys.stdout = stdout
+    result = {"seconds": round(seconds, 3), "files": files,
+              "files_per_s": round(files / seconds, 1) if seconds else 0.0,
+              "peak_rss_mb": round(peak_rss_mb(), 1)}
+    with open(args.result, "w", encoding="utf-8") as f:
+        json.dump(result, f)
+
+def git_rev():
+    try:
+        res = subprocess.run(["git", "-C", str(ROOT), "rev-parse", "--short", "HEAD"],
+                             capture_output=True, text=True, timeout=10)
+        return res.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def compare(results, baseline_path):
+    base = json.loads(open(baseline_path, encoding="utf-8").read())
+    print(f"\n[INFO] Compared with {baseline_path} ({base.get('git') or 'unknown rev'})")
+    for name, r in results["stages"].items():
+        old = base.get("stages", {}).get(name)
+        if not old or not old.get("files_per_s"):
+            continue
+        ratio = r["files_per_s"] / old["files_per_s"]
+        tag = "[WARN]" if ratio < 1 - REGRESSION else "[INFO]"
+        print(f"{tag} {name:18s} {ratio:6.2f}x files/s   peak RSS {old['peak_rss_mb']:.0f} -> {r['peak_rss_mb']:.0f} MB")
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--files", type=int, default=10000, help="Synthetic Flickr IDs (e.g. 10000, 100000, 1000000)")
+    ap.add_argument("--corpus", default=None, help="Keep the synthetic export here (re-used if present)")
+    ap.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    ap.add_argument("--workers", type=int, default=4, help="exiftool workers for the write stages (default: 4)")
+    ap.add_argument("--latency-ms", type=float, default=5.0, help="Simulated exiftool time per written file")
+    ap.add_argument("--output", default="bench_results.json", help="Results file (default: ./bench_results.json)")
+    ap.add_argument("--compare", default=None, help="Earlier results file to compare files/s against")
+    # internal: run one stage in this (child) process
+    ap.add_argument("--run-stage", choices=STAGES, help=argparse.SUPPRESS)
+    ap.add_argument("--spec", help=argparse.SUPPRESS)
+    ap.add_argument("--result", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.run_stage:
+        child(args)
+        return
+
+    tmp = None
+    if args.corpus:
+        corpus = os.path.abspath(os.path.expanduser(args.corpus))
+        os.makedirs(corpus, exist_ok=True)
+    else:
+        tmp = tempfile.TemporaryDirectory(prefix="flickr-bench-")
+        corpus = tmp.name
+    spec = ensure(corpus, args.files)
+
+    env = dict(os.environ, EXIFTOOL=str(FAKE_EXIFTOOL), FAKE_EXIFTOOL_LATENCY_MS=str(args.latency_ms))
+    results = {
+        "version": RESULTS_VERSION,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git": git_rev(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "params": {"ids": spec["ids"], "media_files": spec["files"], "workers": args.workers,
+                   "latency_ms": args.latency_ms},
+        "stages": {},
+    }
+    for name in [s for s in STAGES if s in args.stages]:
+        with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as rf:
+            result_path = rf.name
+        cmd = [sys.executable, "-m", "benchmarks.suite", "--run-stage", name, "--spec", json.dumps(spec),
+               "--corpus", corpus, "--workers", str(args.workers), "--result", result_path]
+        res = subprocess.run(cmd, cwd=str(ROOT), env=env)
+        if res.returncode != 0:
+            os.unlink(result_path)
+            sys.exit(f"[ERROR] Stage {name} failed")
+        with open(result_path, encoding="utf-8") as f:
+            r = results["stages"][name] = json.load(f)
+        os.unlink(result_path)
+        print(f"[RESULT] {name:18s} {r['seconds']:8.2f}s {r['files']:>10,} files {r['files_per_s']:>10,.0f} files/s "
+              f"peak RSS {r['peak_rss_mb']:7.1f} MB")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"[DONE] Results -> {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+
+    if tmp:
+        tmp.cleanup()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Synthetic Flickr export generator.
+
+Writes a tree shaped like a real export:
+
+  <root>/downloads/data-download-1 .. -N/   media files
+  <root>/json/export_part1, export_part2/   photo_<id>.json sidecars
+
+or, with layout="organized", the media already sorted into
+<root>/media/YYYY/MM/ (what the fix/embed steps see after organizing).
+
+Media filenames follow the patterns of real exports, so ID_RE finds the
+Flickr ID in every one: "<title>_<id>_o.jpg", "<id>_<secret>_o.jpg",
+"<title>_<id>.mp4", ... About 10% of items are videos, 5% of files carry no
+capture date and 2% of IDs get a second copy in another part.
+
+Each media file starts with a "FAKEEXIF <date>" line (or "FAKEEXIF -")
+which benchmarks/fake_exiftool.py reports as DateTimeOriginal/CreateDate;
+the rest is random padding up to the requested size.
+
+python3 -m benchmarks.synthetic --files 100000 --out /tmp/flickr-synth
+"""
+
+import argparse, json, os, random
+from pathlib import Path
+
+SPEC_NAME = "synthetic.json"
+FIRST_ID = 10_000_000_000
+TITLES = ["IMG", "DSC", "beach", "sunset", "family-trip", "P1000", "birthday party"]
+WORDS = ["beach", "sunset", "family", "trip", "dog", "snow", "city", "night"]
+
+def make_sidecar(pid, rnd):
+    return {
+        "id": str(pid),
+        "name": f"IMG_{rnd.randint(0, 9999):04d}",
+        "description": " ".join(rnd.choice(WORDS) for _ in range(rnd.randint(0, 30))),
+        "date_taken": f"{rnd.randint(2005, 2023)}-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d} 12:34:56",
+        "tags": [{"tag": t, "raw": t} for t in rnd.sample(WORDS, rnd.randint(0, 4))],
+        "geo": [{"latitude": rnd.uniform(-60, 60), "longitude": rnd.uniform(-180, 180)}] if rnd.random() < 0.3 else [],
+        "comments": [{"user": "x", "comment": "nice"}] * rnd.randint(0, 5),
+    }
+
+def write_sidecars(json_root, n, seed=0):
+    # Just the sidecars, split over two parts like a real export.
+    rnd = random.Random(seed)
+    for i in range(n):
+        pid = FIRST_ID + i
+        part = Path(json_root) / f"export_part{i % 2 + 1}"
+        part.mkdir(parents=True, exist_ok=True)
+        (part / f"photo_{pid}.json").write_text(json.dumps(make_sidecar(pid, rnd)), encoding="utf-8")
+
+def media_name(pid, rnd, video):
+    title = rnd.choice(TITLES)
+    if video:
+        return f"{title}_{pid}.{rnd.choice(['mp4', 'mp4', 'mov', 'm4v'])}"
+    ext = rnd.choice(["jpg"] * 8 + ["jpeg", "png", "heic"])
+    pattern = rnd.randrange(3)
+    if pattern == 0:
+        return f"{title}_{pid}_o.{ext}"
+    if pattern == 1:
+        # Secret starts with a letter so it can never look like an ID.
+        secret = rnd.choice("abcdef") + f"{rnd.getrandbits(36):09x}"
+        return f"{pid}_{secret}_o.{ext}"
+    return f"{title.lower()}_{rnd.randint(1, 9999)}_{pid}_o.{ext}"
+
+def media_body(date, rnd, size):
+    head = f"FAKEEXIF {date or '-'}\n".encode("ascii")
+    return head + rnd.randbytes(max(0, size - len(head)))
+
+def generate(root, n, *, parts=4, media_bytes=2048, layout="export", seed=0):
+    """
+    Write n Flickr IDs (sidecar + media) under root and return the spec dict
+    that describes the tree (also saved as root/synthetic.json).
+    """
+    root = Path(root)
+    rnd = random.Random(seed)
+    json_dirs = [root / "json" / "export_part1", root / "json" / "export_part2"]
+    media_root = root / ("downloads" if layout == "export" else "media")
+    files = 0
+    for d in json_dirs:
+        d.mkdir(parents=True, exist_ok=True)
+    for i in range(n):
+        pid = FIRST_ID + i
+        side = make_sidecar(pid, rnd)
+        (json_dirs[i % 2] / f"photo_{pid}.json").write_text(json.dumps(side), encoding="utf-8")
+
+        video = rnd.random() < 0.10
+        date = None if rnd.random() < 0.05 else side["date_taken"].replace("-", ":")
+        name = media_name(pid, rnd, video)
+        copies = 2 if rnd.random() < 0.02 else 1
+        for c in range(copies):
+            if layout == "export":
+                d = media_root / f"data-download-{(i + c) % parts + 1}"
+            else:
+                d = media_root / side["date_taken"][:4] / side["date_taken"][5:7]
+            d.mkdir(parents=True, exist_ok=True)
+            fn = name if c == 0 or layout == "export" else f"{Path(name).stem}_1{Path(name).suffix}"
+            (d / fn).write_bytes(media_body(date, rnd, media_bytes))
+            files += 1
+
+    spec = {
+        "ids": n, "files": files, "parts": parts, "media_bytes": media_bytes, "layout": layout, "seed": seed,
+        "media_root": str(media_root), "json_dirs": [str(d) for d in json_dirs],
+    }
+    (root / SPEC_NAME).write_text(json.dumps(spec, indent=2), encoding="utf-8")
+    return spec
+
+def ensure(root, n, **kw):
+    """Re-use root if it already holds a tree generated with the same settings."""
+    root = Path(root)
+    spec_path = root / SPEC_NAME
+    if spec_path.exists():
+        spec = json.loads(spec_path.read_text(encoding="utf-8"))
+        want = {"ids": n, "parts": kw.get("parts", 4), "media_bytes": kw.get("media_bytes", 2048),
+                "layout": kw.get("layout", "export"), "seed": kw.get("seed", 0)}
+        if all(spec.get(k) == v for k, v in want.items()):
+            return spec
+        raise SystemExit(f"[ERROR] {root} holds a different synthetic tree; use another --corpus")
+    print(f"[INFO] Generating {n:,} synthetic Flickr items in {root}")
+    return generate(root, n, **kw)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--files", type=int, default=10000, help="Flickr IDs to generate (e.g. 10000, 100000, 1000000)")
+    ap.add_argument("--out", required=True, help="Folder to write the synthetic export into")
+    ap.add_argument("--parts", type=int, default=4, help="Number of data-download-* folders (default: 4)")
+    ap.add_argument("--media-bytes", type=int, default=2048, help="Size of each media file (default: 2048)")
+    ap.add_argument("--layout", choices=["export", "organized"], default="export")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    spec = ensure(args.out, args.files, parts=args.parts, media_bytes=args.media_bytes,
+                  layout=args.layout, seed=args.seed)
+    print(f"[DONE] {spec['ids']:,} IDs, {spec['files']:,} media files -> {args.out}")
+
+if __name__ == "__main__":
+    main()
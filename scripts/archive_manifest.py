@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Structured organize manifest, carried from source to destination.
+
+The organize step already knows, for every file it places, the Flickr ID and
+the DateTimeOriginal/CreateDate exiftool found in it. It records them in a
+SQLite file in the output folder (.archive_manifest.sqlite), one row per
+source path:
+
+  src, pid, kind, dest, date_original, create_date, date_source, dest size/mtime
+
+date_source is "exif" or "json" (placed by the JSON date_taken because the
+file had no date tags). Files skipped for lack of any date get a row without
+dest, so every scanned source is accounted for. The fix steps (--from-manifest) take their worklist
+from it instead of walking the output folder, and skip the date write for
+files whose recorded dates already match the target; after writing they
+store the new dates, so a rerun skips them too. Recorded dates are only
+trusted while the destination's size/mtime are unchanged.
+
+The exif_manifest.csv written by the organize step is unchanged; this file
+is what the pipeline itself reads.
+
+python3 scripts/archive_manifest.py --out "/path/to/Flickr Organized"
+"""
+
+import argparse, os, sqlite3, threading
+from pathlib import Path
+
+MANIFEST_NAME = ".archive_manifest.sqlite"
+COMMIT_EVERY = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    src TEXT PRIMARY KEY, pid TEXT, kind TEXT, dest TEXT,
+    date_original TEXT, create_date TEXT, date_source TEXT,
+    dest_size INTEGER, dest_mtime_ns INTEGER
+);
+CREATE INDEX IF NOT EXISTS files_dest ON files (dest);
+CREATE INDEX IF NOT EXISTS files_pid ON files (pid);
+"""
+
+def manifest_path(out_root, shard=None):
+    # --shard K/N: one file per shard, merged by shards.py
+    path = Path(out_root).expanduser() / MANIFEST_NAME
+    return shard.path(path) if shard else path
+
+def dates_match(current, exif_dt, kind):
+    # Photos get DateTimeOriginal + CreateDate, videos CreateDate (see date_tag_args).
+    date_original, create_date = current
+    if kind == "photo" and (date_original or "")[:19] != exif_dt:
+        return False
+    return (create_date or "")[:19] == exif_dt
+
+class ArchiveManifest:
+    """Shared by the organize threads and the write step; every call takes the lock."""
+
+    def __init__(self, path):
+        self.path = Path(path).expanduser()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+        self.lock = threading.Lock()
+        self.pending = 0
+
+    def _changed(self):
+        self.pending += 1
+        if self.pending >= COMMIT_EVERY:
+            self.db.commit()
+            self.pending = 0
+
+    def record_placed(self, src, dest, pid, kind, date_original, create_date, date_source, replace=True):
+        # replace=False only fills in a missing row (resumed files keep the dates written since).
+        st = os.stat(dest)
+        with self.lock:
+            self.db.execute(f"INSERT OR {'REPLACE' if replace else 'IGNORE'} INTO files VALUES (?,?,?,?,?,?,?,?,?)",
+                            (str(src), pid, kind, str(dest), date_original, create_date, date_source,
+                             st.st_size, st.st_mtime_ns))
+            self._changed()
+
+    def record_skipped(self, src, pid, kind, date_original, create_date):
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO files VALUES (?,?,?,NULL,?,?,'none',NULL,NULL)",
+                            (str(src), pid, kind, date_original, create_date))
+            self._changed()
+
+    def record_dates(self, dest, exif_dt=None, kind=None):
+        # After a successful write: the file now carries exif_dt. exif_dt=None
+        # (metadata-only write) keeps the recorded dates valid for the new size/mtime.
+        st = os.stat(dest)
+        with self.lock:
+            if exif_dt is None:
+                self.db.execute("UPDATE files SET dest_size=?, dest_mtime_ns=? WHERE dest=?",
+                                (st.st_size, st.st_mtime_ns, str(dest)))
+            elif kind == "photo":
+                self.db.execute("UPDATE files SET date_original=?, create_date=?, dest_size=?, dest_mtime_ns=? "
+                                "WHERE dest=?", (exif_dt, exif_dt, st.st_size, st.st_mtime_ns, str(dest)))
+            else:
+                self.db.execute("UPDATE files SET create_date=?, dest_size=?, dest_mtime_ns=? WHERE dest=?",
+                                (exif_dt, st.st_size, st.st_mtime_ns, str(dest)))
+            self._changed()
+
+    def current_dates(self, dest):
+        """(date_original, create_date) of dest if it is unchanged since recorded, else None."""
+        with self.lock:
+            row = self.db.execute("SELECT date_original, create_date, dest_size, dest_mtime_ns FROM files "
+                                  "WHERE dest=?", (str(dest),)).fetchone()
+        if not row:
+            return None
+        try:
+            st = os.stat(dest)
+        except OSError:
+            return None
+        return row[:2] if (st.st_size, st.st_mtime_ns) == (row[2], row[3]) else None
+
+    def id_to_files(self):
+        """{pid: [dest Path]} of every placed file with a Flickr ID, like group_by_id()."""
+        out = {}
+        with self.lock:
+            rows = self.db.execute("SELECT pid, dest FROM files WHERE pid != '' AND dest IS NOT NULL "
+                                   "ORDER BY dest").fetchall()
+        for pid, dest in rows:
+            out.setdefault(pid, []).append(Path(dest))
+        return out
+
+    def count(self):
+        with self.lock:
+            return self.db.execute("SELECT count(*), sum(date_source = 'json') FROM files "
+                                   "WHERE dest IS NOT NULL").fetchone()
+
+    def close(self):
+        with self.lock:
+            self.db.commit()
+            self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def open_manifest(out_root, shard=None):
+    return ArchiveManifest(manifest_path(out_root, shard))
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--out", required=True, help="Organized output folder")
+    args = ap.parse_args()
+    path = manifest_path(args.out)
+    if not path.exists():
+        raise SystemExit(f"[ERROR] No manifest in {args.out}; run organize_by_year_month.py first")
+    with ArchiveManifest(path) as m:
+        total, by_json = m.count()
+        ids = len(m.id_to_files())
+    print(f"[DONE] {total or 0:,} files ({ids:,} Flickr IDs), placed by JSON date_taken: {by_json or 0:,}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Backup strategies for the write steps (--backup) and batched syncs (--fsync).
+
+exiftool keeps a full FILE_original copy of every file it rewrites, which
+doubles the output folder. --backup picks what is kept instead:
+
+  exiftool  FILE_original next to the file (default; what exiftool does)
+  none      nothing (same as --overwrite-original)
+  reflink   FILE_original as a copy-on-write clone, made just before the
+            write (FICLONE on btrfs/XFS/APFS-like filesystems; a plain copy
+            where clones are not supported). --native-dates patches only a
+            few bytes, so its backups then cost almost no space; an exiftool
+            rewrite replaces the file, and the clone keeps the old blocks.
+  journal   no file at all: the current values of the tags about to be
+            written are read (batched, like --skip-correct) and stored as
+            "backup" lines in the run journal. Needs --journal.
+
+scripts/restore_backups.py undoes the writes from either kind of backup.
+
+--fsync makes the written files durable without waiting for each one: the
+write step hands over each finished file, and when the worklist moves on to
+the next folder with at least SYNC_BATCH files written since the last sync,
+the batch is synced together: every file is fsync'ed, then each of their
+folders once, so the renamed/created entries are durable too (and whatever
+is left at the end). Only these files are flushed, not every filesystem on
+the host. Syncs run on a background thread and a batch that is still queued
+absorbs the next one, so the writes never wait for the disk.
+"""
+
+import os, threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from file_copy import copy_into_place, reflink
+from precheck import READ_BATCH, RELATED_TAGS, parse_tag_args, read_current
+
+BACKUPS = ["exiftool", "none", "reflink", "journal"]
+SYNC_BATCH = 256  # --fsync: files written before the next folder change triggers a sync
+BACKUP_SUFFIX = "_original"  # exiftool's name, also used for reflink clones
+# Groups exiftool reports but cannot write back.
+READ_ONLY_GROUPS = {"Composite", "File", "ExifTool", "SourceFile"}
+
+def add_backup_args(ap):
+    ap.add_argument("--backup", choices=BACKUPS, default=None,
+                    help="What to keep of each file before writing: exiftool (FILE_original, default), none, "
+                         "reflink (copy-on-write FILE_original) or journal (old tag values in the run journal)")
+    ap.add_argument("--fsync", action="store_true",
+                    help="Sync written files to disk, once per folder instead of once per file")
+
+def resolve_backup(args):
+    """
+    -> the --backup strategy. --overwrite-original is the older spelling of
+    --backup none. Afterwards args.overwrite_original says whether exiftool
+    and native_dates.py should skip their own FILE_original (every strategy
+    but "exiftool" either keeps none or makes its own).
+    """
+    mode = args.backup or ("none" if args.overwrite_original else "exiftool")
+    args.backup = mode
+    args.overwrite_original = mode != "exiftool"
+    return mode
+
+def check_backup_args(ap, args):
+    if args.backup == "journal" and not args.journal:
+        ap.error("--backup journal stores the old tag values in the run journal; give --journal")
+
+def _saved_values(cur, tag):
+    # current "Group:Tag" values for a requested tag, or {tag: None} if it is not set
+    found = {}
+    for key, value in (cur or {}).items():
+        group, _, name = key.rpartition(":")
+        if group in READ_ONLY_GROUPS:
+            continue
+        if key == tag if ":" in tag else name == tag:
+            found[key] = value
+    return found or {tag: None}
+
+class BackupItems:
+    """
+    Iterates a worklist and makes each item's backup (--backup reflink or
+    journal) before handing it on to the pool, like precheck.SkipCurrent.
+    build_args(item) is the builder passed to pool.map(); its last argument
+    is the file.
+    """
+
+    def __init__(self, mode, pool, items, build_args, journal=None):
+        self.mode = mode
+        self.pool = pool
+        self.items = items
+        self.build_args = build_args
+        self.journal = journal
+        self.cloned = 0
+        self.copied = 0
+        self.saved = 0
+
+    def _clone(self, path):
+        bak = Path(f"{path}{BACKUP_SUFFIX}")
+        if bak.exists():  # as exiftool: the first backup is the original
+            return
+        # Through a .part file: a truncated FILE_original would count as the original.
+        if copy_into_place(Path(path), bak, reflink):
+            self.cloned += 1
+        else:
+            self.copied += 1
+
+    def _save_tags(self, batch):
+        jobs = []
+        for item in batch:
+            args = self.build_args(item)
+            if not args:
+                continue
+            # Tags already saved for this file by an earlier write keep their older value.
+            tags = {tag for tag, _, _ in parse_tag_args(args)}
+            tags |= {r for tag in tags for r in RELATED_TAGS.get(tag, ())}
+            tags -= self.journal.backed_up(args[-1])
+            if tags:
+                jobs.append((args[-1], tags))
+        if not jobs:
+            return
+        current = read_current(self.pool, [path for path, _ in jobs], set().union(*(t for _, t in jobs)))
+        for path, tags in jobs:
+            values = {}
+            for tag in sorted(tags):
+                values.update(_saved_values(current.get(path), tag))
+            self.journal.record_backup(path, sorted(tags), values)
+            self.saved += 1
+
+    def __iter__(self):
+        if self.mode == "reflink":
+            for item in self.items:
+                args = self.build_args(item)
+                if args:
+                    self._clone(args[-1])
+                yield item
+        elif self.mode == "journal":
+            batch = []
+            for item in self.items:
+                batch.append(item)
+                if len(batch) >= READ_BATCH:
+                    self._save_tags(batch)
+                    yield from batch
+                    batch = []
+            if batch:
+                self._save_tags(batch)
+                yield from batch
+        else:
+            yield from self.items
+
+    def summary(self):
+        if self.mode == "reflink":
+            return f"[INFO] Backups: {self.cloned:,} reflinked, {self.copied:,} copied (no clone support)"
+        if self.mode == "journal":
+            return f"[INFO] Backups: old tag values of {self.saved:,} files saved in the run journal"
+        return None
+
+def with_backups(mode, pool, items, build_args, journal=None):
+    """items, wrapped in BackupItems when the strategy needs work before each write."""
+    if mode in ("reflink", "journal"):
+        return BackupItems(mode, pool, items, build_args, journal)
+    return items
+
+def _fsync(path, flags=os.O_RDONLY):
+    try:
+        fd = os.open(path, flags)
+    except OSError:  # gone, or a folder on Windows
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def _sync_paths(paths):
+    # Each file, then each folder once: a new or renamed entry is only
+    # durable once its folder is synced.
+    for p in paths:
+        _fsync(p)
+    for d in sorted({os.path.dirname(p) or "." for p in paths}):
+        _fsync(d, os.O_RDONLY | getattr(os, "O_DIRECTORY", 0))
+
+class DirSync:
+    """
+    --fsync: add(path) after each successful write, close() at the end.
+    Folders are only synced whole, as long as the worklist comes grouped by
+    folder (sorted by path, or one directory at a time with --stream).
+    """
+
+    def __init__(self):
+        self.ex = ThreadPoolExecutor(max_workers=1)
+        self.dir = None
+        self.paths = []
+        self.queued = None  # batch of the sync that has not started yet
+        self.syncs = 0
+        self.lock = threading.Lock()
+
+    def add(self, path):
+        d = os.path.dirname(str(path))
+        if d != self.dir:
+            if len(self.paths) >= SYNC_BATCH:
+                self._flush()
+            self.dir = d
+        self.paths.append(str(path))
+
+    def _flush(self):
+        if not self.paths:
+            return
+        paths, self.paths = self.paths, []
+        with self.lock:
+            if self.queued is not None:  # not started yet: it takes these files too
+                self.queued.extend(paths)
+                return
+            self.queued = paths
+        self.ex.submit(self._sync)
+
+    def _sync(self):
+        with self.lock:
+            paths, self.queued = self.queued, None
+        _sync_paths(paths)
+        with self.lock:
+            self.syncs += 1
+
+    def close(self):
+        self._flush()
+        self.ex.shutdown(wait=True)
+        print(f"[INFO] Synced to disk ({self.syncs:,} sync(s))")
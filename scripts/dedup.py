@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Content-hash deduplication of the media files in a Flickr export.
+
+The same photo/video often appears more than once across the
+data-download-* parts. Candidates are narrowed in three passes so most files
+are never read in full:
+
+  1. same size (from the inventory, no I/O),
+  2. same partial hash (BLAKE2 of the first and last 64 KB),
+  3. same full BLAKE2 hash.
+
+Hashes are computed on a thread pool (hashlib releases the GIL on large
+buffers) and cached in ~/.cache/flickr-archive-rebuilder/hashes.sqlite keyed
+by path, size and mtime, so re-runs only hash new or changed files.
+
+Only files with the same Flickr ID (or both without one) are treated as
+copies of one item: two uploads with identical bytes but different IDs have
+different JSON metadata and are both kept. Of each set of copies the one
+pick_best_file() would choose (the "_o." original) is kept.
+
+Run directly to list duplicates without organizing anything:
+python3 scripts/dedup.py --root "/path/to/Flickr Downloads"
+"""
+
+import argparse, hashlib, os, sqlite3, sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from media_inventory import walk_media
+from sidecar_index import CACHE_DIR
+
+PARTIAL_BYTES = 64 * 1024
+READ_CHUNK = 1024 * 1024
+DEFAULT_HASH_WORKERS = min(8, (os.cpu_count() or 1) * 2)
+HASH_CACHE = CACHE_DIR / "hashes.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS hashes (
+    path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, partial TEXT, full TEXT
+);
+"""
+
+def partial_hash(path, size):
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        if size <= 2 * PARTIAL_BYTES:
+            h.update(f.read())
+        else:
+            h.update(f.read(PARTIAL_BYTES))
+            f.seek(-PARTIAL_BYTES, os.SEEK_END)
+            h.update(f.read(PARTIAL_BYTES))
+    return h.hexdigest()
+
+def full_hash(path):
+    h = hashlib.blake2b(digest_size=32)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(READ_CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+class HashCache:
+    """Only touched from the calling thread; the hashing threads never see it."""
+
+    def __init__(self, db_path=HASH_CACHE):
+        self.path = Path(db_path).expanduser()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(self.path))
+        self.db.executescript(SCHEMA)
+
+    def get(self, e, kind):
+        row = self.db.execute(
+            f"SELECT {kind} FROM hashes WHERE path=? AND size=? AND mtime_ns=?", (e.path, e.size, e.mtime_ns)
+        ).fetchone()
+        return row[0] if row else None
+
+    def put(self, e, kind, digest):
+        row = self.db.execute("SELECT size, mtime_ns, partial, full FROM hashes WHERE path=?", (e.path,)).fetchone()
+        partial = full = None
+        if row and (row[0], row[1]) == (e.size, e.mtime_ns):
+            partial, full = row[2], row[3]
+        if kind == "partial":
+            partial = digest
+        else:
+            full = digest
+        self.db.execute("INSERT OR REPLACE INTO hashes VALUES (?,?,?,?,?)",
+                        (e.path, e.size, e.mtime_ns, partial, full))
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def _hash_all(entries, kind, cache, ex):
+    # -> {path: digest}; unreadable files are left out (and so never deduped)
+    out = {}
+    todo = []
+    for e in entries:
+        digest = cache.get(e, kind) if cache else None
+        if digest:
+            out[e.path] = digest
+        else:
+            todo.append(e)
+    fn = (lambda e: partial_hash(e.path, e.size)) if kind == "partial" else (lambda e: full_hash(e.path))
+
+    def job(e):
+        try:
+            return e, fn(e)
+        except OSError as err:
+            print(f"[WARN] Cannot hash {e.path}: {err}", file=sys.stderr)
+            return e, None
+
+    for e, digest in ex.map(job, todo):
+        if digest:
+            out[e.path] = digest
+            if cache:
+                cache.put(e, kind, digest)
+    return out
+
+def _split(groups, digests):
+    out = []
+    for group in groups:
+        by_digest = {}
+        for e in group:
+            d = digests.get(e.path)
+            if d:
+                by_digest.setdefault(d, []).append(e)
+        out += [g for g in by_digest.values() if len(g) > 1]
+    return out
+
+def find_duplicates(entries, workers=DEFAULT_HASH_WORKERS, cache=None):
+    """Lists of MediaEntry (2+ each) with the same Flickr ID, kind and content."""
+    by_key = {}
+    for e in entries:
+        by_key.setdefault((e.pid, e.kind, e.size), []).append(e)
+    groups = [g for g in by_key.values() if len(g) > 1]
+    if not groups:
+        return []
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as ex:
+        groups = _split(groups, _hash_all([e for g in groups for e in g], "partial", cache, ex))
+        # Files up to 2 x 64 KB were hashed whole by the partial pass already.
+        small = [g for g in groups if g[0].size <= 2 * PARTIAL_BYTES]
+        large = [g for g in groups if g[0].size > 2 * PARTIAL_BYTES]
+        large = _split(large, _hash_all([e for g in large for e in g], "full", cache, ex))
+    return small + large
+
+def keeper(group):
+    # Same preference as pick_best_file(): the "_o." original, else the first by name.
+    return min(group, key=lambda e: ("_o." not in os.path.basename(e.path).lower(),
+                                     os.path.basename(e.path).lower(), e.path.lower()))
+
+def dedup_entries(entries, workers=DEFAULT_HASH_WORKERS, cache_path=HASH_CACHE):
+    """
+    -> (entries to keep, [(dropped entry, kept entry)]). Order of the kept
+    entries is unchanged. cache_path=None disables the hash cache.
+    """
+    cache = HashCache(cache_path) if cache_path else None
+    try:
+        groups = find_duplicates(entries, workers, cache)
+    finally:
+        if cache:
+            cache.close()
+    dropped = []
+    for g in groups:
+        keep = keeper(g)
+        dropped += [(e, keep) for e in g if e is not keep]
+    gone = {e.path for e, _ in dropped}
+    return [e for e in entries if e.path not in gone], dropped
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--root", required=True, help="Folder to check (e.g. the Flickr Downloads root)")
+    ap.add_argument("--hash-workers", type=int, default=DEFAULT_HASH_WORKERS,
+                    help=f"Threads used for hashing (default: {DEFAULT_HASH_WORKERS})")
+    ap.add_argument("--no-cache", action="store_true", help="Do not read or update the hash cache")
+    args = ap.parse_args()
+
+    entries = walk_media(args.root)
+    kept, dropped = dedup_entries(entries, args.hash_workers, None if args.no_cache else HASH_CACHE)
+    for e, keep in dropped:
+        print(f"[DUP] {e.path}  ==  {keep.path}")
+    saved = sum(e.size for e, _ in dropped)
+    print(f"[DONE] {len(entries):,} media files, {len(dropped):,} duplicates ({saved / 1e6:,.1f} MB)")
+
+if __name__ == "__main__":
+    main()
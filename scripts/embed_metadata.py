@@ -7,83 +7,41 @@ Matches media to JSON via Flickr photo ID in the filename.
 Safe defaults:
 - Writes only fields enabled by flags
 - Never blanks fields when JSON is empty
-- Creates *_original backups unless --overwrite-original is used
+- Creates *_original backups unless --overwrite-original or another --backup
+  strategy is used (see backups.py)
+- --xmp-sidecar writes the fields to a .xmp file next to each media file
+  instead and leaves the media file alone (see xmp_sidecar.py)
 """
 
-import argparse, json, re, subprocess, sys
+import argparse, sys
 from pathlib import Path
 
-ID_RE = re.compile(r'(?<!\d)(\d{10,12})(?!\d)')
-
-PHOTO_EXTS = {".jpg",".jpeg",".png",".heic",".tif",".tiff"}
-VIDEO_EXTS = {".mp4",".mov",".m4v"}
-MEDIA_EXTS = PHOTO_EXTS | VIDEO_EXTS
-
-def load_json_records(json_dirs):
-    out = {}
-    scanned = 0
-    for d in map(Path, json_dirs):
-        d = d.expanduser()
-        if not d.exists():
-            print(f"[ERROR] JSON dir not found: {d}", file=sys.stderr)
-            sys.exit(1)
-        for p in d.rglob("photo_*.json"):
-            scanned += 1
-            try:
-                obj = json.loads(p.read_text(encoding="utf-8"))
-                pid = str(obj.get("id","")).strip()
-                if not pid:
-                    continue
-
-                title = (obj.get("name") or "").strip()
-                desc  = (obj.get("description") or "").strip()
-
-                tags_raw = obj.get("tags") or []
-                tags = []
-                if isinstance(tags_raw, list):
-                    for t in tags_raw:
-                        if isinstance(t, str) and t.strip():
-                            tags.append(t.strip())
-                        elif isinstance(t, dict):
-                            for k in ("raw","tag","name","text","value"):
-                                v = t.get(k)
-                                if isinstance(v, str) and v.strip():
-                                    tags.append(v.strip())
-                                    break
-                seen = set()
-                tags = [x for x in tags if not (x.lower() in seen or seen.add(x.lower()))]
-
-                geo = None
-                g = obj.get("geo")
-                if isinstance(g, dict):
-                    lat = g.get("latitude") or g.get("lat")
-                    lon = g.get("longitude") or g.get("lon") or g.get("lng")
-                    if lat is not None and lon is not None:
-                        geo = {"lat": lat, "lon": lon}
-                elif isinstance(g, list) and len(g) > 0 and isinstance(g[0], dict):
-                    lat = g[0].get("latitude") or g[0].get("lat")
-                    lon = g[0].get("longitude") or g[0].get("lon") or g[0].get("lng")
-                    if lat is not None and lon is not None:
-                        geo = {"lat": lat, "lon": lon}
-
-                out[pid] = {"title": title, "description": desc, "tags": tags, "geo": geo}
-            except Exception:
-                continue
-
-    print(f"[INFO] JSON files scanned: {scanned:,} | mapped IDs: {len(out):,}")
+from backups import DirSync, add_backup_args, check_backup_args, resolve_backup, with_backups
+from exiftool_pool import DEFAULT_BATCH_SIZE, DEFAULT_WORKERS
+from failed_items import add_retry_args, load_failed
+from media_names import media_kind
+from metrics import add_metrics_args
+from precheck import drop_current
+from run_context import RunContext
+from sidecar_index import DEFAULT_JSON_WORKERS, open_index
+from xmp_sidecar import XmpSidecars, add_xmp_args
+
+def load_json_records(json_dirs, index_path=None, workers=DEFAULT_JSON_WORKERS, ctx=None):
+    if ctx is not None:
+        return ctx.sidecar_records(json_dirs, index_path, workers)
+    with open_index(json_dirs, index_path, workers) as idx:
+        out = idx.records()
+    print(f"[INFO] JSON sidecars indexed: {len(out):,}")
     return out
 
-def exiftool_write(path, rec, *, title, description, tags, geo, overwrite_original):
-    ext = path.suffix.lower()
-    is_photo = ext in PHOTO_EXTS
-    is_video = ext in VIDEO_EXTS
+def metadata_tag_args(path, rec, *, title, description, tags, geo):
+    kind = media_kind(path.name)
+    is_photo = kind == "photo"
+    is_video = kind == "video"
     if not (is_photo or is_video):
-        return None
-
-    args = ["exiftool"]
-    if overwrite_original:
-        args += ["-overwrite_original"]
+        return []
 
+    args = []
     if title and rec["title"]:
         args += [f"-XMP:Title={rec['title']}"]
         if is_photo:
@@ -108,43 +66,68 @@ def exiftool_write(path, rec, *, title, description, tags, geo, overwrite_origin
         # Best-effort for videos/other tools
         args += [f"-XMP:GPSLatitude={lat}", f"-XMP:GPSLongitude={lon}"]
 
-    if len(args) == (2 if overwrite_original else 1):
-        return None
+    return args
 
-    args += [str(path)]
-    return subprocess.run(args, capture_output=True, text=True)
+def exiftool_write_args(path, rec, *, title, description, tags, geo, overwrite_original):
+    tag_args = metadata_tag_args(path, rec, title=title, description=description, tags=tags, geo=geo)
+    if not tag_args:
+        return None
+    args = ["-overwrite_original"] if overwrite_original else []
+    return args + tag_args + [str(path)]
 
-def main():
+def build_parser():
     ap = argparse.ArgumentParser()
     ap.add_argument("--media-root", required=True)
     ap.add_argument("--json", required=True, nargs="+")
+    ap.add_argument("--index", default=None)
+    ap.add_argument("--json-workers", type=int, default=DEFAULT_JSON_WORKERS)
     ap.add_argument("--title", action="store_true")
     ap.add_argument("--description", action="store_true")
     ap.add_argument("--tags", action="store_true")
     ap.add_argument("--geo", action="store_true")
     ap.add_argument("--dry-run", action="store_true")
+    ap.add_argument("--inventory", default=None, help="Saved media inventory of --media-root (skips the walk)")
     ap.add_argument("--limit", type=int, default=0)
     ap.add_argument("--overwrite-original", action="store_true")
-    args = ap.parse_args()
-
-    records = load_json_records(args.json)
-
-    root = Path(args.media_root).expanduser()
-    files = [p for p in root.rglob("*") if p.is_file() and p.suffix.lower() in MEDIA_EXTS]
-    files.sort(key=lambda x: str(x).lower())
-    print(f"[INFO] Media files found: {len(files):,}")
+    ap.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    ap.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                    help="Files per exiftool round trip, grouped by folder; failed files are retried "
+                         f"one by one (default: {DEFAULT_BATCH_SIZE})")
+    ap.add_argument("--skip-correct", action="store_true",
+                    help="Read current tags first (batched) and skip files that already have the target values")
+    ap.add_argument("--journal", default=None, help="Record completed writes in this JSONL journal")
+    ap.add_argument("--resume", action="store_true", help="Skip files the journal shows as already done and unchanged")
+    add_backup_args(ap)
+    add_xmp_args(ap)
+    add_retry_args(ap)
+    add_metrics_args(ap)
+    return ap
+
+def run(args, ctx):
+    records = load_json_records(args.json, args.index, args.json_workers, ctx)
+
+    entries = ctx.media(args.media_root, args.inventory)
+    print(f"[INFO] Media files found: {len(entries):,}")
 
     updated = 0
     skipped_no_id = 0
     skipped_no_json = 0
     skipped_missing = 0
-
-    for p in files:
-        m = ID_RE.findall(p.name)
-        if not m:
+    resumed = 0
+    journal = ctx.journal
+    backup = resolve_backup(args)
+    step = "xmp_sidecar" if args.xmp_sidecar else "embed_metadata"
+
+    retry = load_failed(args.retry_failed) if args.retry_failed else None
+    work = []
+    for e in entries:
+        if retry is not None and e.path not in retry:
+            continue
+        if not e.pid:
             skipped_no_id += 1
             continue
-        pid = m[-1]
+        pid = e.pid
+        p = Path(e.path)
         rec = records.get(pid)
         if not rec:
             skipped_no_json += 1
@@ -160,37 +143,77 @@ def main():
             skipped_missing += 1
             continue
 
-        if args.dry_run:
-            print(f"[DRY] {pid}  {p.name}")
-            updated += 1
-            if args.limit and updated >= args.limit:
-                break
+        if args.resume and journal.step_done(p, step):
+            resumed += 1
             continue
 
-        res = exiftool_write(
-            p, rec,
-            title=args.title, description=args.description, tags=args.tags, geo=args.geo,
-            overwrite_original=args.overwrite_original
-        )
-        if res is None:
-            skipped_missing += 1
-            continue
-        if res.returncode != 0:
-            print(f"[ERROR] exiftool failed for {p}\n{res.stderr}", file=sys.stderr)
-            continue
-
-        updated += 1
-        if args.limit and updated >= args.limit:
+        work.append((pid, p, rec))
+        if args.limit and len(work) >= args.limit:
             break
 
-    if args.dry_run:
-        print(f"[DONE] Dry run listed: {updated:,}")
+    if args.xmp_sidecar:
+        with XmpSidecars(title=args.title, description=args.description, tags=args.tags, geo=args.geo,
+                         workers=args.workers, journal=journal, failed=ctx.failed, metrics=ctx.metrics,
+                         dry_run=args.dry_run) as xmp:
+            for pid, p, rec in work:
+                xmp.add(p, rec)
+        updated = xmp.counts["written"]
+    elif args.dry_run:
+        for pid, p, rec in work:
+            print(f"[DRY] {pid}  {p.name}")
+        print(f"[DONE] Dry run listed: {len(work):,}")
     else:
+        def build_args(w):
+            pid, p, rec = w
+            return exiftool_write_args(
+                p, rec,
+                title=args.title, description=args.description, tags=args.tags, geo=args.geo,
+                overwrite_original=args.overwrite_original
+            )
+
+        pool = ctx.pool()
+        if args.skip_correct:
+            work, correct = drop_current(pool, work, build_args)
+            print(f"[INFO] Already correct, skipped: {correct:,}")
+        backups = with_backups(backup, pool, work, build_args, journal)
+        sync = DirSync() if args.fsync else None
+        with ctx.metrics.phase("embed_metadata", total=len(work)) as ph:
+            for (pid, p, rec), res in pool.map(backups, build_args, batch_size=args.batch_size, retries=args.retries, timeout=args.timeout):
+                ph.add()
+                if res is None:
+                    skipped_missing += 1
+                    continue
+                if res.returncode != 0:
+                    print(f"[ERROR] exiftool failed for {p}\n{res.stderr}", file=sys.stderr)
+                    if ctx.failed:
+                        ctx.failed.add(p, "embed_metadata", res)
+                    continue
+                updated += 1
+                if sync:
+                    sync.add(p)
+                if journal:
+                    journal.record_step(p, "embed_metadata")
+        if backup in ("reflink", "journal"):
+            print(backups.summary())
+        if sync:
+            sync.close()
         print(f"[DONE] Updated: {updated:,}")
 
     print(f"[INFO] Skipped (no ID in filename): {skipped_no_id:,}")
     print(f"[INFO] Skipped (no JSON match): {skipped_no_json:,}")
     print(f"[INFO] Skipped (requested fields missing): {skipped_missing:,}")
+    if args.resume:
+        print(f"[INFO] Skipped (already embedded, resumed): {resumed:,}")
+    return updated
+
+def main(argv=None):
+    ap = build_parser()
+    args = ap.parse_args(argv)
+    if args.resume and not args.journal:
+        ap.error("--resume requires --journal")
+    check_backup_args(ap, args)
+    with RunContext.from_args(args) as ctx:
+        run(args, ctx)
 
 if __name__ == "__main__":
     main()
@@ -1,38 +1,32 @@
 #!/usr/bin/env python3
-import argparse, json, re, subprocess, sys
+import argparse, sys
 from pathlib import Path
 
-ID_RE = re.compile(r'(?<!\d)(\d{10,12})(?!\d)')
-
-PHOTO_EXTS = {".jpg",".jpeg",".png",".heic",".tif",".tiff"}
-VIDEO_EXTS = {".mp4",".mov",".m4v"}
-
-def load_titles(json_dirs):
-    m = {}
-    total = 0
-    for d in map(Path, json_dirs):
-        d = d.expanduser()
-        for p in d.rglob("photo_*.json"):
-            total += 1
-            try:
-                obj = json.loads(p.read_text(encoding="utf-8"))
-                pid = str(obj.get("id","")).strip()
-                title = (obj.get("name") or "").strip()
-                if pid and title:
-                    m[pid] = title
-            except:
-                pass
-    print(f"[INFO] JSON scanned: {total:,} | titles mapped: {len(m):,}")
+from backups import DirSync, add_backup_args, check_backup_args, resolve_backup, with_backups
+from exiftool_pool import DEFAULT_BATCH_SIZE, DEFAULT_WORKERS
+from media_names import media_kind
+from metrics import add_metrics_args
+from run_context import RunContext
+from sidecar_index import DEFAULT_JSON_WORKERS, open_index
+
+def load_titles(json_dirs, index_path=None, workers=DEFAULT_JSON_WORKERS, ctx=None):
+    if ctx is not None:
+        records = ctx.sidecar_records(json_dirs, index_path, workers)
+        return {pid: r["title"] for pid, r in records.items() if r["title"]}
+    with open_index(json_dirs, index_path, workers) as idx:
+        m = idx.titles()
+        total = idx.count()
+    print(f"[INFO] JSON sidecars indexed: {total:,} | titles mapped: {len(m):,}")
     return m
 
-def set_title(path: Path, title: str, overwrite_original: bool):
-    ext = path.suffix.lower()
-    is_photo = ext in PHOTO_EXTS
-    is_video = ext in VIDEO_EXTS
+def set_title_args(path: Path, title: str, overwrite_original: bool):
+    kind = media_kind(path.name)
+    is_photo = kind == "photo"
+    is_video = kind == "video"
     if not (is_photo or is_video):
         return None
 
-    args = ["exiftool"]
+    args = []
     if overwrite_original:
         args += ["-overwrite_original"]
 
@@ -42,63 +36,101 @@ def set_title(path: Path, title: str, overwrite_original: bool):
         args += [f"-IPTC:ObjectName={title}"]
 
     args += [str(path)]
-    return subprocess.run(args, capture_output=True, text=True)
+    return args
 
-def main():
+def build_parser():
     ap = argparse.ArgumentParser()
     ap.add_argument("--organized", required=True)
     ap.add_argument("--json", required=True, nargs="+")
+    ap.add_argument("--index", default=None)
+    ap.add_argument("--json-workers", type=int, default=DEFAULT_JSON_WORKERS)
     ap.add_argument("--dry-run", action="store_true")
+    ap.add_argument("--inventory", default=None, help="Saved media inventory of --organized (skips the walk)")
     ap.add_argument("--limit", type=int, default=0)
     ap.add_argument("--overwrite-original", action="store_true")
-    args = ap.parse_args()
-
-    titles = load_titles(args.json)
-
-    organized = Path(args.organized).expanduser()
-    files = [p for p in organized.rglob("*") if p.is_file() and p.suffix.lower() in (PHOTO_EXTS | VIDEO_EXTS)]
-    files.sort(key=lambda x: str(x).lower())
-    print(f"[INFO] Media files found: {len(files):,}")
+    ap.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    ap.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                    help="Files per exiftool round trip, grouped by folder; failed files are retried "
+                         f"one by one (default: {DEFAULT_BATCH_SIZE})")
+    ap.add_argument("--journal", default=None, help="Record completed writes in this JSONL journal")
+    ap.add_argument("--resume", action="store_true", help="Skip files the journal shows as already done and unchanged")
+    add_backup_args(ap)
+    add_metrics_args(ap)
+    return ap
+
+def run(args, ctx):
+    titles = load_titles(args.json, args.index, args.json_workers, ctx)
+
+    entries = ctx.media(args.organized, args.inventory)
+    print(f"[INFO] Media files found: {len(entries):,}")
 
     updated = 0
     skipped_no_id = 0
     skipped_no_json = 0
+    resumed = 0
+    journal = ctx.journal
+    backup = resolve_backup(args)
 
-    for p in files:
-        m = ID_RE.findall(p.name)
-        if not m:
+    work = []
+    for e in entries:
+        if not e.pid:
             skipped_no_id += 1
             continue
-        pid = m[-1]
+        pid = e.pid
+        p = Path(e.path)
         title = titles.get(pid)
         if not title:
             skipped_no_json += 1
             continue
-
-        if args.dry_run:
-            print(f"[DRY] {pid}  {p.name}  title='{title[:80]}'")
-            updated += 1
-            if args.limit and updated >= args.limit:
-                break
+        if args.resume and journal.step_done(p, "embed_titles"):
+            resumed += 1
             continue
-
-        res = set_title(p, title, args.overwrite_original)
-        if res is None:
-            continue
-        if res.returncode != 0:
-            print(f"[ERROR] exiftool failed for {p}\n{res.stderr}", file=sys.stderr)
-            continue
-
-        updated += 1
-        if args.limit and updated >= args.limit:
+        work.append((pid, p, title))
+        if args.limit and len(work) >= args.limit:
             break
 
     if args.dry_run:
-        print(f"[DONE] Dry run listed: {updated:,}")
+        for pid, p, title in work:
+            print(f"[DRY] {pid}  {p.name}  title='{title[:80]}'")
+        print(f"[DONE] Dry run listed: {len(work):,}")
     else:
+        build_args = lambda w: set_title_args(w[1], w[2], args.overwrite_original)
+        pool = ctx.pool()
+        backups = with_backups(backup, pool, work, build_args, journal)
+        sync = DirSync() if args.fsync else None
+        jobs = pool.map(backups, build_args, batch_size=args.batch_size)
+        with ctx.metrics.phase("embed_titles", total=len(work)) as ph:
+            for (pid, p, title), res in jobs:
+                ph.add()
+                if res is None:
+                    continue
+                if res.returncode != 0:
+                    print(f"[ERROR] exiftool failed for {p}\n{res.stderr}", file=sys.stderr)
+                    continue
+                updated += 1
+                if sync:
+                    sync.add(p)
+                if journal:
+                    journal.record_step(p, "embed_titles")
+        if backup in ("reflink", "journal"):
+            print(backups.summary())
+        if sync:
+            sync.close()
         print(f"[DONE] Updated: {updated:,}")
     print(f"[INFO] Skipped (no ID in filename): {skipped_no_id:,}")
     print(f"[INFO] Skipped (no JSON match/title): {skipped_no_json:,}")
+    if args.resume:
+        print(f"[INFO] Skipped (already titled, resumed): {resumed:,}")
+    return updated
+
+def main(argv=None):
+    ap = build_parser()
+    args = ap.parse_args(argv)
+    if args.resume and not args.journal:
+        ap.error("--resume requires --journal")
+    check_backup_args(ap, args)
+    with RunContext.from_args(args) as ctx:
+        run(args, ctx)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Long-lived exiftool workers shared by the write steps.
+
+Each worker is one `exiftool -stay_open True -@ -` process. A job is the list
+of arguments we would otherwise pass on the command line (tags + file path);
+it is written to the worker's stdin and terminated with -executeNUM, and the
+matching {readyNUM} line on stdout marks the end of its output. Perl starts
+once per worker instead of once per file. With a batch size > 1, several
+files' blocks are written in one go and read back in order, saving a round
+trip per file.
+
+stdout and stderr are each drained by a reader thread into a queue, so a
+job that writes more warnings than a pipe buffer holds cannot block
+exiftool before it reaches the {readyNUM} line we are waiting for.
+
+Set EXIFTOOL to point at a different exiftool binary.
+"""
+
+import os, queue, subprocess, threading, time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+EXIFTOOL = os.environ.get("EXIFTOOL", "exiftool")
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+DEFAULT_BATCH_SIZE = 16
+# Upper bound on -execute blocks written to one worker in one go.
+MAX_BATCH = 200
+# Per file; a worker that takes longer is killed and restarted.
+DEFAULT_TIMEOUT = 300
+# Per job when the caller gives none (e.g. the batched -j reads), so a hung
+# exiftool cannot stall a run forever.
+DEFAULT_READ_TIMEOUT = 3600
+# Crashed/timed-out jobs are retried this often, waiting RETRY_BACKOFF, 2x, 4x, ...
+DEFAULT_RETRIES = 2
+RETRY_BACKOFF = 1.0
+
+class ExiftoolResult:
+    # Same shape as subprocess.CompletedProcess so callers can keep checking
+    # .returncode / .stderr.
+    def __init__(self, args, returncode, stdout, stderr):
+        self.args = args
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+
+def encode_args(args):
+    # The -@ protocol is one argument per line, so values with newlines (Flickr
+    # descriptions) are C-escaped and -ec tells exiftool to unescape them.
+    if not any("\n" in a or "\r" in a for a in args):
+        return list(args)
+    out = ["-ec"]
+    for a in args:
+        if a.startswith("-") and "=" in a:
+            tag, val = a.split("=", 1)
+            val = val.replace("\\", "\\\\").replace("\r", "\\r").replace("\n", "\\n")
+            a = f"{tag}={val}"
+        out.append(a)
+    return out
+
+class ExiftoolWorker:
+    def __init__(self, executable=EXIFTOOL):
+        self.executable = executable
+        self.seq = 0
+        self.proc = None
+        self.timed_out = False
+        self.start()
+
+    def start(self):
+        self.proc = subprocess.Popen(
+            [self.executable, "-stay_open", "True", "-@", "-"],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            text=True, encoding="utf-8", errors="replace",
+        )
+        self.out = self._pump(self.proc.stdout)
+        self.err = self._pump(self.proc.stderr)
+
+    @staticmethod
+    def _pump(stream):
+        # Lines of stream in a queue, None at EOF; the thread ends with the process.
+        q = queue.Queue()
+
+        def read():
+            for line in iter(stream.readline, ""):
+                q.put(line)
+            q.put(None)
+
+        threading.Thread(target=read, name="exiftool-pipe", daemon=True).start()
+        return q
+
+    def execute(self, args, timeout=None):
+        return self.execute_batch([args], timeout)[0]
+
+    def execute_batch(self, jobs, timeout=None):
+        """
+        Run several argument lists as consecutive -execute blocks written in
+        one go, and return one result per job. Each block has its own
+        {status} echo and {readyNUM} marker, so success/failure is still
+        attributed per job. A worker that takes longer than timeout seconds
+        per job (DEFAULT_READ_TIMEOUT if None) is killed; its unfinished jobs
+        come back with returncode -1.
+        """
+        lines = []
+        seqs = []
+        for args in jobs:
+            self.seq += 1
+            seqs.append(self.seq)
+            lines += encode_args(args) + [
+                "-echo3", "{status}${status}",
+                "-echo4", f"{{ready{self.seq}}}",
+                f"-execute{self.seq}",
+            ]
+        results = []
+        self.timed_out = False
+        limit = (timeout or DEFAULT_READ_TIMEOUT) * len(jobs)
+        deadline = time.monotonic() + limit
+        # The timer also ends a write to a worker that stopped reading its input.
+        # It is bound to this process: it must never kill the replacement.
+        proc = self.proc
+        timer = threading.Timer(limit, self._expire, (proc,))
+        timer.start()
+        try:
+            proc.stdin.write("\n".join(lines) + "\n")
+            proc.stdin.flush()
+            for args, n in zip(jobs, seqs):
+                stdout = self._read_until(self.out, f"{{ready{n}}}", deadline)
+                stderr = self._read_until(self.err, f"{{ready{n}}}", deadline)
+                results.append(self._result(args, stdout, stderr))
+        except (BrokenPipeError, EOFError) as e:
+            # Worker died (crash, killed, timed out); report the unfinished jobs
+            # as failed and replace the process so the rest of the run can continue.
+            timer.cancel()
+            msg = f"exiftool timed out after {limit:g}s" if self.timed_out else f"exiftool worker exited: {e}"
+            self.close()
+            self.start()
+            results += [ExiftoolResult(args, -1, "", msg) for args in jobs[len(results):]]
+        finally:
+            timer.cancel()
+        return results
+
+    def _expire(self, proc):
+        self.timed_out = True
+        proc.kill()
+
+    @staticmethod
+    def _result(args, stdout, stderr):
+        status = 1
+        out = []
+        for line in stdout:
+            if line.startswith("{status}"):
+                tail = line[len("{status}"):].strip()
+                status = int(tail) if tail.isdigit() else 1
+            else:
+                out.append(line)
+        return ExiftoolResult(args, status, "".join(out), "".join(stderr))
+
+    def _read_until(self, lines_q, sentinel, deadline):
+        lines = []
+        while True:
+            try:
+                line = lines_q.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                self._expire(self.proc)
+                raise EOFError("no output before the deadline")
+            if line is None:
+                raise EOFError("unexpected end of output")
+            if line.rstrip("\r\n") == sentinel:
+                return lines
+            lines.append(line)
+
+    def close(self):
+        if self.proc is None:
+            return
+        try:
+            self.proc.stdin.write("-stay_open\nFalse\n")
+            self.proc.stdin.flush()
+            self.proc.stdin.close()
+        except (BrokenPipeError, ValueError):
+            pass
+        try:
+            self.proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+            self.proc.wait()
+        self.proc = None
+
+def _remove_stale_tmp(args):
+    # exiftool writes FILE_exiftool_tmp and renames it over FILE; a worker
+    # killed mid-write leaves it behind, and exiftool refuses to write FILE
+    # again while it exists.
+    try:
+        os.unlink(f"{args[-1]}_exiftool_tmp")
+    except OSError:
+        pass
+
+class ExiftoolPool:
+    """N exiftool workers; execute() is thread-safe, map() runs jobs concurrently."""
+
+    def __init__(self, workers=DEFAULT_WORKERS, executable=EXIFTOOL, metrics=None):
+        self.size = max(1, int(workers))
+        # metrics.observe_latency("read"/"write", seconds) per call, if given
+        self.metrics = metrics
+        self._all = [ExiftoolWorker(executable) for _ in range(self.size)]
+        self._idle = queue.Queue()
+        for w in self._all:
+            self._idle.put(w)
+
+    def execute(self, args, timeout=None):
+        return self.execute_batch([args], timeout)[0]
+
+    def execute_batch(self, jobs, timeout=None):
+        w = self._idle.get()
+        t0 = time.monotonic()
+        try:
+            return w.execute_batch(jobs, timeout)
+        finally:
+            self._idle.put(w)
+            if self.metrics:
+                # Per-file latency: a batch's time is shared by its jobs.
+                per_job = (time.monotonic() - t0) / len(jobs)
+                for args in jobs:
+                    self.metrics.observe_latency("read" if "-j" in args else "write", per_job)
+
+    def _run_batch(self, batch, retries, timeout):
+        # batch: [(item, args)] -> [(item, result)]. A job that failed inside a
+        # batch is rerun on its own once; a crashed or timed-out job
+        # (returncode -1, usually transient) up to `retries` more times with
+        # exponential backoff. The rest of the batch is not rerun.
+        results = self.execute_batch([args for _, args in batch], timeout)
+        out = []
+        for (item, args), res in zip(batch, results):
+            if res.returncode != 0 and len(batch) > 1:
+                if res.returncode == -1:
+                    _remove_stale_tmp(args)
+                res = self.execute(args, timeout)
+            for attempt in range(retries):
+                if res.returncode != -1:
+                    break
+                time.sleep(RETRY_BACKOFF * 2 ** attempt)
+                _remove_stale_tmp(args)
+                res = self.execute(args, timeout)
+            out.append((item, res))
+        return out
+
+    def map(self, items, build_args, batch_size=1, retries=DEFAULT_RETRIES, timeout=None):
+        """
+        Yield (item, result) in input order. build_args(item) returns the
+        exiftool arguments for one file, or None to skip it (result is None).
+
+        With batch_size > 1, consecutive files in the same directory are sent
+        to one worker as a batch of up to batch_size -execute blocks (see
+        ExiftoolWorker.execute_batch). Failed jobs are retried as described
+        in _run_batch; timeout is in seconds per file.
+
+        Backpressure: at most a few jobs or batches per worker are in flight,
+        so a lazy items iterable (worklist construction, directory walks) is
+        only read as fast as the workers finish.
+        """
+        batch_size = max(1, min(int(batch_size), MAX_BATCH))
+
+        def batches():
+            batch = []
+            for item in items:
+                args = build_args(item)
+                if args is None:
+                    if batch:
+                        yield batch
+                        batch = []
+                    yield [(item, None)]
+                    continue
+                if batch and (len(batch) >= batch_size or
+                              os.path.dirname(batch[-1][1][-1]) != os.path.dirname(args[-1])):
+                    yield batch
+                    batch = []
+                batch.append((item, args))
+            if batch:
+                yield batch
+
+        def job(batch):
+            if batch[0][1] is None:
+                return batch
+            return self._run_batch(batch, retries, timeout)
+
+        with ThreadPoolExecutor(max_workers=self.size) as ex:
+            pending = deque()
+            window = self.size * (4 if batch_size == 1 else 2)
+            for batch in batches():
+                pending.append(ex.submit(job, batch))
+                if len(pending) >= window:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+
+    def close(self):
+        for w in self._all:
+            w.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Failed-items file for the write steps (--failed-file / --retry-failed).
+
+The exiftool pool retries crashed and timed-out jobs itself (--retries,
+--timeout). Files that still fail are printed and written to a JSONL file
+(replaced by the next run that has failures), one line per file:
+
+  {"path": ..., "step": "fix_dates", "returncode": 1, "error": "..."}
+
+Feeding that file back with --retry-failed limits the step to those paths,
+so a run with a few hundred failures can be finished without going through
+the whole archive again. The file is only created once something fails. A
+--retry-failed run that fixes everything removes it.
+"""
+
+import json, os, sys, threading
+from pathlib import Path
+
+from exiftool_pool import DEFAULT_RETRIES, DEFAULT_TIMEOUT
+
+FAILED_NAME = "failed_items.jsonl"
+
+def add_retry_args(ap):
+    ap.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT,
+                    help=f"Seconds per file before a stuck exiftool is restarted (default: {DEFAULT_TIMEOUT})")
+    ap.add_argument("--retries", type=int, default=DEFAULT_RETRIES,
+                    help=f"Retries with backoff for crashed/timed-out exiftool jobs (default: {DEFAULT_RETRIES})")
+    ap.add_argument("--failed-file", default=FAILED_NAME,
+                    help=f"Write files that still fail to this JSONL file (default: ./{FAILED_NAME})")
+    ap.add_argument("--retry-failed", default=None, metavar="FILE",
+                    help="Only process the files listed in a failed-items file from an earlier run")
+
+def load_failed(path):
+    """Set of paths listed in a failed-items file."""
+    paths = set()
+    with Path(path).expanduser().open("r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                paths.add(json.loads(line)["path"])
+            except (ValueError, KeyError):
+                continue
+    print(f"[INFO] Retrying {len(paths):,} failed file(s) from {path}")
+    return paths
+
+class FailedItems:
+    def __init__(self, path, retrying=None):
+        self.path = Path(path).expanduser()
+        # The file being retried; removed at close() if nothing failed again.
+        self.retrying = Path(retrying).expanduser() if retrying else None
+        self.count = 0
+        self.f = None
+        self.lock = threading.Lock()
+
+    def add(self, path, step, res):
+        line = json.dumps({"path": str(path), "step": step, "returncode": res.returncode,
+                           "error": (res.stderr or "").strip()}, ensure_ascii=False)
+        with self.lock:
+            if self.f is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                # Replaced per run (a retry run has read its list up front).
+                self.f = self.path.open("w", encoding="utf-8")
+            self.f.write(line + "\n")
+            self.f.flush()
+            self.count += 1
+
+    def close(self):
+        if self.f:
+            self.f.close()
+            print(f"[WARN] {self.count:,} file(s) failed; retry them with --retry-failed {self.path}",
+                  file=sys.stderr)
+        elif self.retrying and self.retrying.exists():
+            os.unlink(self.retrying)
+            print(f"[INFO] All previously failed files done; removed {self.retrying}")
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+File copies shared by the organize step, --backup reflink and restore_backups.py.
+
+reflink() clones a file where the filesystem can share its data blocks
+(FICLONE on btrfs/XFS) and falls back to copy_file_range/a plain copy
+elsewhere. copy_into_place() writes any copy to a hidden ".NAME.part" file
+and renames it over the real name when it is complete, so an interrupted
+copy never leaves a truncated file under that name.
+"""
+
+import errno, os, shutil
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# linux/fs.h: _IOW(0x94, 9, int). Shares the source's extents (btrfs, XFS, ...).
+FICLONE = 0x40049409
+# Copies are written to ".NAME.part" and renamed into place when complete.
+PART_SUFFIX = ".part"
+
+def copy_range(fsrc, fdst):
+    # copy_file_range() stays in the kernel and may itself reflink; fall back
+    # to a plain userspace copy where it is missing or refused.
+    try:
+        while os.copy_file_range(fsrc.fileno(), fdst.fileno(), 1 << 30):
+            pass
+    except (AttributeError, OSError):
+        fsrc.seek(0)
+        fdst.seek(0)
+        fdst.truncate()
+        shutil.copyfileobj(fsrc, fdst, 1 << 20)
+
+def reflink(src: Path, dest: Path) -> bool:
+    # True if dest shares src's data blocks (FICLONE); False if it was copied.
+    with open(src, "rb") as fsrc, open(dest, "wb") as fdst:
+        try:
+            if fcntl is None:
+                raise OSError(errno.ENOTSUP, "FICLONE not available")
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+            cloned = True
+        except OSError:
+            copy_range(fsrc, fdst)
+            cloned = False
+    shutil.copystat(src, dest)
+    return cloned
+
+def copy_into_place(src: Path, dest: Path, copy=shutil.copy2):
+    """
+    copy(src, ".DEST.part"), then renamed over dest; -> what copy returned.
+    An interrupted copy leaves only the hidden .part file behind, never a
+    truncated file under the real name (which --resume would take for a
+    finished one). A leftover .part is overwritten when the name is reused.
+    """
+    part = dest.with_name(f".{dest.name}{PART_SUFFIX}")
+    try:
+        result = copy(src, part)
+        os.replace(part, dest)
+    except BaseException:
+        try:
+            os.unlink(part)
+        except OSError:
+            pass
+        raise
+    return result
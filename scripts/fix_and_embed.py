@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Single-pass "fix dates + embed metadata" stage.
+
+Running fix_photo_dates.py, fix_video_dates.py and embed_metadata.py one after
+another rewrites the same file up to three times (and leaves a *_original
+backup per pass). This stage merges the date tags and the
+title/description/tags/geo tags into one exiftool argument set per file, so
+each file is written exactly once.
+
+Date tags go to the same file the fix scripts would pick (pick_best_file per
+Flickr ID); metadata goes to every media file with a JSON match, like
+embed_metadata.py. With --xmp-sidecar the metadata goes to .xmp sidecars
+instead (xmp_sidecar.py), and only the dates are written into the files.
+"""
+
+import argparse, sys
+from pathlib import Path
+from itertools import islice
+
+from archive_manifest import dates_match, manifest_path
+from backups import DirSync, add_backup_args, check_backup_args, resolve_backup, with_backups
+from exiftool_pool import DEFAULT_BATCH_SIZE, DEFAULT_WORKERS
+from flickr_dates import date_tag_args, find_media, pick_best_file, to_exiftool_dt
+from embed_metadata import load_json_records, metadata_tag_args
+from media_inventory import group_by_id, iter_media_dirs
+from media_names import media_kind
+from failed_items import add_retry_args, load_failed
+from metrics import add_metrics_args
+from native_dates import NativeDates
+from precheck import SkipCurrent
+from run_context import RunContext
+from shards import add_shard_args
+from sidecar_index import DEFAULT_JSON_WORKERS
+from video_tz import add_tz_args, check_tz_args
+from xmp_sidecar import XmpSidecars, add_xmp_args
+
+def build_worklist(id_to_files, id_to_date, records, *, fix, title, description, tags, geo, done=None, tz=None,
+                   in_place=None, xmp=None, only=None):
+    # done(path, step) -> True drops that half of the file's job (--resume).
+    # in_place(path, exif_dt, kind) -> True drops the date half (already written, --from-manifest).
+    # tz: VideoTimes converting video dates to UTC (--tz/--tz-polygons), or None.
+    # xmp: XmpSidecars that takes the metadata half instead of exiftool (--xmp-sidecar), or None.
+    # only: set of path strings to keep (--retry-failed), or None for all.
+    work = []
+    for pid, paths in id_to_files.items():
+        best = pick_best_file(paths) if fix else None
+        exif_dt = to_exiftool_dt(id_to_date.get(pid, "")) if fix else None
+        rec = records.get(pid)
+        for p in paths:
+            if only is not None and str(p) not in only:
+                continue
+            tag_args = []
+            steps = []
+            if p == best and exif_dt and not (done and done(p, "fix_dates")):
+                kind = media_kind(p.name)
+                target = tz.utc(exif_dt, rec["geo"] if rec else None) if kind == "video" and tz else exif_dt
+                if not (in_place and in_place(p, target, kind)):
+                    tag_args += date_tag_args(target, kind)
+                    steps.append("fix_dates")
+            if rec and xmp:
+                if not (done and done(p, "xmp_sidecar")):
+                    xmp.add(p, rec)
+            elif rec and not (done and done(p, "embed_metadata")):
+                meta = metadata_tag_args(p, rec, title=title, description=description, tags=tags, geo=geo)
+                if meta:
+                    tag_args += meta
+                    steps.append("embed_metadata")
+            if tag_args:
+                work.append((pid, p, tag_args, steps))
+    work.sort(key=lambda x: str(x[1]).lower())
+    return work
+
+def build_parser():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--media-root", required=True, help="Organized output folder")
+    ap.add_argument("--json", required=True, nargs="+")
+    ap.add_argument("--index", default=None)
+    ap.add_argument("--json-workers", type=int, default=DEFAULT_JSON_WORKERS)
+    ap.add_argument("--no-fix", action="store_true", help="Do not write date tags")
+    ap.add_argument("--title", action="store_true")
+    ap.add_argument("--description", action="store_true")
+    ap.add_argument("--tags", action="store_true")
+    ap.add_argument("--geo", action="store_true")
+    ap.add_argument("--dry-run", action="store_true")
+    ap.add_argument("--inventory", default=None, help="Saved media inventory of --media-root (skips the walk)")
+    ap.add_argument("--limit", type=int, default=0)
+    ap.add_argument("--from-manifest", action="store_true",
+                    help="Take files and their current dates from the organize manifest in the output folder "
+                         "instead of walking it; dates already in place are not rewritten")
+    ap.add_argument("--stream", action="store_true",
+                    help="Bounded memory: work one directory at a time and look up JSON records per directory")
+    ap.add_argument("--overwrite-original", action="store_true")
+    ap.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    ap.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                    help="Files per exiftool round trip, grouped by folder; failed files are retried "
+                         f"one by one (default: {DEFAULT_BATCH_SIZE})")
+    ap.add_argument("--native-dates", action="store_true",
+                    help="Patch date fields of JPEG/MP4/MOV files in place when they already exist "
+                         "(no rewrite); other files still go through exiftool")
+    ap.add_argument("--skip-correct", action="store_true",
+                    help="Read current tags first (batched) and skip files that already have the target values")
+    ap.add_argument("--journal", default=None, help="Record completed writes in this JSONL journal")
+    ap.add_argument("--resume", action="store_true", help="Skip work the journal shows as already done and unchanged")
+    add_tz_args(ap)
+    add_backup_args(ap)
+    add_xmp_args(ap)
+    add_retry_args(ap)
+    add_shard_args(ap)
+    add_metrics_args(ap)
+    return ap
+
+def dates_of(records):
+    return {pid: r["date_taken"] for pid, r in records.items() if r["date_taken"]}
+
+def run(args, ctx, groups=None):
+    """
+    Without groups the worklist comes from --media-root (walked or --inventory).
+    groups is an optional iterable of {pid: [paths]} batches to write instead,
+    consumed lazily: rebuild_archive.py passes the Flickr IDs the organize step
+    has finished placing, so files are written while later ones still copy.
+
+    With --stream, --media-root is processed one directory at a time and
+    sidecar records are looked up per batch, so memory stays flat however
+    large the archive is. --limit and --dry-run apply to both.
+    """
+    journal = ctx.journal
+    backup = resolve_backup(args)
+    # Applied while building the worklist, before sidecars are handed to xmp.
+    retry = load_failed(args.retry_failed) if args.retry_failed else None
+    tz = None if args.no_fix else ctx.video_times(args.tz, args.tz_polygons)
+    manifest = ctx.archive_manifest(args.media_root) if args.from_manifest else None
+    in_place_count = 0
+    xmp = None
+    if args.xmp_sidecar and (args.title or args.description or args.tags or args.geo):
+        xmp = XmpSidecars(title=args.title, description=args.description, tags=args.tags, geo=args.geo,
+                          workers=args.workers, journal=journal, failed=ctx.failed, metrics=ctx.metrics,
+                          dry_run=args.dry_run)
+
+    def in_place(path, exif_dt, kind):
+        nonlocal in_place_count
+        current = manifest.current_dates(path)
+        if current and dates_match(current, exif_dt, kind):
+            in_place_count += 1
+            return True
+        return False
+
+    build = lambda id_to_files, id_to_date, records: build_worklist(
+        id_to_files, id_to_date, records,
+        fix=not args.no_fix, title=args.title, description=args.description, tags=args.tags, geo=args.geo,
+        done=journal.step_done if args.resume else None, tz=tz, in_place=in_place if manifest else None,
+        xmp=xmp, only=retry,
+    )
+
+    if args.stream:
+        idx = ctx.sidecar_index(args.json, args.index, args.json_workers)
+        print(f"[INFO] JSON sidecars indexed: {idx.count():,} (looked up per directory)")
+
+        def worklist(id_to_files):
+            records = idx.lookup(id_to_files)
+            return build(id_to_files, {} if args.no_fix else dates_of(records), records)
+    else:
+        # One index read serves both halves: records carry date_taken too.
+        records = load_json_records(args.json, args.index, args.json_workers, ctx)
+        id_to_date = {} if args.no_fix else dates_of(records)
+        worklist = lambda id_to_files: build(id_to_files, id_to_date, records)
+
+    # total is only known up front for the in-memory worklist (progress/ETA)
+    total = None
+    if groups is None and not args.stream:
+        if manifest:
+            id_to_files = manifest.id_to_files()
+            print(f"[INFO] Media files from the organize manifest: {sum(map(len, id_to_files.values())):,} "
+                  f"| matched IDs: {len(id_to_files):,}")
+        else:
+            id_to_files = find_media(args.media_root, args.inventory, ctx)
+        if args.shard:
+            id_to_files = args.shard.groups(id_to_files)
+            print(f"[INFO] Shard {args.shard}: {len(id_to_files):,} Flickr IDs")
+        work = worklist(id_to_files)
+        total = len(work)
+        print(f"[INFO] Files with tags to write: {total:,}")
+    else:
+        if groups is None:
+            groups = (group_by_id(entries) for _, entries in iter_media_dirs(args.media_root))
+            if args.shard:
+                groups = (args.shard.groups(g) for g in groups)
+        work = (w for g in groups for w in worklist(g))
+
+    if retry is not None and total is None:
+        work = list(work)
+        total = len(work)
+
+    if args.limit and args.limit > 0:
+        work = islice(work, args.limit)
+        total = min(total, args.limit) if total is not None else None
+        print(f"[INFO] Limiting to first {args.limit} files for this run")
+
+    if args.dry_run:
+        n = 0
+        for pid, path, tag_args, steps in work:
+            print(f"[DRY] {pid}  {path}  ({len(tag_args)} tags)")
+            n += 1
+        print(f"[DONE] Dry run complete. Files with tags to write: {n:,}")
+        if xmp:
+            xmp.close()
+        return 0
+
+    prefix = ["-overwrite_original"] if args.overwrite_original else []
+    build_args = lambda w: prefix + w[2] + [str(w[1])]
+    pool = ctx.pool()
+    if args.skip_correct:
+        work = precheck = SkipCurrent(pool, work, build_args)
+    work = backups = with_backups(backup, pool, work, build_args, journal)
+    sync = DirSync() if args.fsync else None
+
+    if args.native_dates:
+        # Only date-only jobs qualify; anything with metadata tags needs exiftool anyway.
+        def date_only(w):
+            pid, path, tag_args, steps = w
+            if steps != ["fix_dates"]:
+                return None
+            kind = media_kind(path.name)
+            return path, tag_args[0].split("=", 1)[1], kind
+        native = NativeDates(date_only, backup=not args.overwrite_original)
+        jobs = native.map(pool, work, build_args, batch_size=args.batch_size, retries=args.retries, timeout=args.timeout)
+    else:
+        jobs = pool.map(work, build_args, batch_size=args.batch_size, retries=args.retries, timeout=args.timeout)
+
+    updated = 0
+    with ctx.metrics.phase("fix_and_embed", total=total) as ph:
+        if args.skip_correct:
+            precheck.on_skip = ph.add
+        for (pid, path, tag_args, steps), res in jobs:
+            ph.add()
+            if res.returncode == 0:
+                updated += 1
+                if sync:
+                    sync.add(path)
+                if journal:
+                    for step in steps:
+                        journal.record_step(path, step)
+                if manifest and "fix_dates" in steps:
+                    written = next(a.split("=", 1)[1] for a in tag_args if a.startswith("-CreateDate="))
+                    manifest.record_dates(path, written, media_kind(path.name))
+                elif manifest:
+                    manifest.record_dates(path)
+            else:
+                print(f"[ERROR] exiftool failed for {path}\n{res.stderr}", file=sys.stderr)
+                if ctx.failed:
+                    ctx.failed.add(path, "+".join(steps), res)
+
+    if args.skip_correct:
+        print(f"[INFO] Already correct, skipped: {precheck.skipped:,}")
+    if manifest:
+        print(f"[INFO] Dates already in place (organize manifest), not rewritten: {in_place_count:,}")
+    if args.native_dates:
+        print(f"[INFO] Patched in place (no exiftool rewrite): {native.patched:,}")
+    if backup in ("reflink", "journal"):
+        print(backups.summary())
+    if sync:
+        sync.close()
+    if xmp:
+        xmp.close()
+    print(f"[DONE] Updated {updated:,} files (one write each).")
+    return updated
+
+def main(argv=None):
+    ap = build_parser()
+    args = ap.parse_args(argv)
+    if args.resume and not args.journal:
+        ap.error("--resume requires --journal")
+    check_tz_args(ap, args)
+    check_backup_args(ap, args)
+    if args.from_manifest and not manifest_path(args.media_root, args.shard).exists():
+        ap.error(f"--from-manifest: no organize manifest in {Path(args.media_root).expanduser()}")
+    with RunContext.from_args(args) as ctx:
+        run(args, ctx)
+
+if __name__ == "__main__":
+    main()
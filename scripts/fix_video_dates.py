@@ -1,111 +1,65 @@
 #!/usr/bin/env python3
-import argparse, json, re, subprocess, sys
+import argparse, sys
 from pathlib import Path
 
-ID_RE = re.compile(r'(?<!\d)(\d{10,12})(?!\d)')
-
-PHOTO_EXTS = {".jpg", ".jpeg", ".png", ".heic", ".tif", ".tiff"}
-VIDEO_EXTS = {".mp4", ".mov", ".m4v"}
-
-def load_id_to_date(json_dirs):
-    id_to_date = {}
-    total = 0
-    for d in json_dirs:
-        d = Path(d).expanduser()
-        if not d.exists():
-            print(f"[ERROR] JSON dir not found: {d}", file=sys.stderr)
-            sys.exit(1)
-        for p in d.rglob("photo_*.json"):
-            total += 1
-            try:
-                obj = json.loads(p.read_text(encoding="utf-8"))
-                pid = str(obj.get("id", "")).strip()
-                dt  = str(obj.get("date_taken", "")).strip()
-                if pid and dt:
-                    id_to_date[pid] = dt
-            except Exception as e:
-                print(f"[WARN] Failed to read {p}: {e}", file=sys.stderr)
-    print(f"[INFO] JSON files scanned: {total:,} | with date_taken: {len(id_to_date):,}")
-    return id_to_date
-
-def find_media(download_root):
-    download_root = Path(download_root).expanduser()
-    if not download_root.exists():
-        print(f"[ERROR] Downloads root not found: {download_root}", file=sys.stderr)
-        sys.exit(1)
-
-    id_to_files = {}
-    scanned = 0
-    for p in download_root.rglob("*"):
-        if not p.is_file():
-            continue
-        ext = p.suffix.lower()
-        if ext not in PHOTO_EXTS and ext not in VIDEO_EXTS:
-            continue
-        scanned += 1
-        m = ID_RE.findall(p.name)
-        if not m:
-            continue
-        pid = m[-1]
-        id_to_files.setdefault(pid, []).append(p)
-
-    print(f"[INFO] Media files scanned (photos+videos): {scanned:,} | matched IDs: {len(id_to_files):,}")
-    return id_to_files
-
-def pick_best_file(paths):
-    paths = sorted(paths, key=lambda x: x.name.lower())
-    for p in paths:
-        if "_o." in p.name.lower():
-            return p
-    return paths[0]
-
-def to_exiftool_dt(dt):
-    # "YYYY-MM-DD HH:MM:SS" -> "YYYY:MM:DD HH:MM:SS"
-    dt = dt.strip()
-    if len(dt) >= 19 and dt[4] == "-" and dt[7] == "-" and dt[10] == " ":
-        return dt[:10].replace("-", ":") + dt[10:19]
-    return None
-
-def run_exiftool_photo(file_path, exif_dt, overwrite_original):
-    args = ["exiftool"]
-    if overwrite_original:
-        args += ["-overwrite_original"]
-    args += [
-        f'-DateTimeOriginal={exif_dt}',
-        f'-CreateDate={exif_dt}',
-        f'-ModifyDate={exif_dt}',
-        str(file_path),
-    ]
-    return subprocess.run(args, capture_output=True, text=True)
-
-def run_exiftool_video(file_path, exif_dt, overwrite_original):
-    # For MP4/MOV: set QuickTime/MP4 time tags commonly used by Photos/Google Photos.
-    args = ["exiftool"]
-    if overwrite_original:
-        args += ["-overwrite_original"]
-    args += [
-        f'-CreateDate={exif_dt}',
-        f'-ModifyDate={exif_dt}',
-        f'-TrackCreateDate={exif_dt}',
-        f'-TrackModifyDate={exif_dt}',
-        f'-MediaCreateDate={exif_dt}',
-        f'-MediaModifyDate={exif_dt}',
-        str(file_path),
-    ]
-    return subprocess.run(args, capture_output=True, text=True)
-
-def main():
+from archive_manifest import dates_match, manifest_path
+from backups import DirSync, add_backup_args, check_backup_args, resolve_backup, with_backups
+from exiftool_pool import DEFAULT_BATCH_SIZE, DEFAULT_WORKERS
+from flickr_dates import date_tag_args, find_media, load_id_to_date, pick_best_file, to_exiftool_dt
+from media_names import media_kind
+from failed_items import add_retry_args, load_failed
+from metrics import add_metrics_args
+from native_dates import NativeDates
+from precheck import drop_current
+from run_context import RunContext
+from sidecar_index import DEFAULT_JSON_WORKERS
+from video_tz import add_tz_args, check_tz_args
+
+def exiftool_photo_args(file_path, exif_dt, overwrite_original):
+    args = ["-overwrite_original"] if overwrite_original else []
+    return args + date_tag_args(exif_dt, "photo") + [str(file_path)]
+
+def exiftool_video_args(file_path, exif_dt, overwrite_original):
+    args = ["-overwrite_original"] if overwrite_original else []
+    return args + date_tag_args(exif_dt, "video") + [str(file_path)]
+
+def build_parser():
     ap = argparse.ArgumentParser()
     ap.add_argument("--downloads", required=True)
     ap.add_argument("--json", required=True, nargs="+")
+    ap.add_argument("--index", default=None)
+    ap.add_argument("--json-workers", type=int, default=DEFAULT_JSON_WORKERS)
+    ap.add_argument("--inventory", default=None, help="Saved media inventory of --downloads (skips the walk)")
+    ap.add_argument("--from-manifest", action="store_true",
+                    help="Take files and their current dates from the organize manifest in --downloads "
+                         "instead of walking it; dates already in place are not rewritten")
     ap.add_argument("--limit", type=int, default=0)
     ap.add_argument("--dry-run", action="store_true")
     ap.add_argument("--overwrite-original", action="store_true")
     ap.add_argument("--mode", choices=["photos", "videos", "both"], default="videos")
-    args = ap.parse_args()
-
-    id_to_date = load_id_to_date(args.json)
-    id_to_files = find_media(args.downloads)
+    ap.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    ap.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                    help="Files per exiftool round trip, grouped by folder; failed files are retried "
+                         f"one by one (default: {DEFAULT_BATCH_SIZE})")
+    ap.add_argument("--native-dates", action="store_true",
+                    help="Patch date fields of JPEG/MP4/MOV files in place when they already exist "
+                         "(no rewrite); other files still go through exiftool")
+    ap.add_argument("--skip-correct", action="store_true",
+                    help="Read current tags first (batched) and skip files that already have the target values")
+    ap.add_argument("--journal", default=None, help="Record completed writes in this JSONL journal")
+    ap.add_argument("--resume", action="store_true", help="Skip files the journal shows as already done and unchanged")
+    add_tz_args(ap)
+    add_backup_args(ap)
+    add_retry_args(ap)
+    add_metrics_args(ap)
+    return ap
+
+def run(args, ctx):
+    id_to_date = load_id_to_date(args.json, args.index, args.json_workers, ctx)
+    manifest = ctx.archive_manifest(args.downloads) if args.from_manifest else None
+    id_to_files = manifest.id_to_files() if manifest else find_media(args.downloads, args.inventory, ctx)
+    tz = ctx.video_times(args.tz, args.tz_polygons)
+    records = ctx.sidecar_records(args.json, args.index, args.json_workers) if args.tz_polygons else {}
 
     work = []
     for pid, paths in id_to_files.items():
@@ -116,41 +70,103 @@ def main():
         exif_dt = to_exiftool_dt(dt)
         if not exif_dt:
             continue
-        ext = best.suffix.lower()
-        kind = "photo" if ext in PHOTO_EXTS else ("video" if ext in VIDEO_EXTS else None)
+        kind = media_kind(best.name)
         if not kind:
             continue
         if args.mode == "photos" and kind != "photo":
             continue
         if args.mode == "videos" and kind != "video":
             continue
+        if kind == "video" and tz:
+            rec = records.get(pid)
+            exif_dt = tz.utc(exif_dt, rec["geo"] if rec else None)
         work.append((pid, best, exif_dt, kind))
 
     work.sort(key=lambda x: str(x[1]).lower())
     print(f"[INFO] Files to process in mode={args.mode}: {len(work):,}")
 
+    if manifest:
+        before = len(work)
+        work = [w for w in work if not dates_match(manifest.current_dates(w[1]) or ("", ""), w[2], w[3])]
+        print(f"[INFO] Dates already in place (organize manifest): {before - len(work):,}")
+
+    journal = ctx.journal
+    backup = resolve_backup(args)
+    if args.resume:
+        before = len(work)
+        work = [w for w in work if not journal.step_done(w[1], "fix_dates")]
+        print(f"[INFO] Already fixed in a previous run (resumed): {before - len(work):,}")
+
+    if args.retry_failed:
+        retry = load_failed(args.retry_failed)
+        work = [w for w in work if str(w[1]) in retry]
+
     if args.limit and args.limit > 0:
         work = work[:args.limit]
         print(f"[INFO] Limiting to first {len(work)} files for this run")
 
-    updated = 0
-    for pid, path, exif_dt, kind in work:
-        if args.dry_run:
-            print(f"[DRY] {kind} {pid}  {path}  <= {exif_dt}")
-            continue
-        if kind == "photo":
-            res = run_exiftool_photo(path, exif_dt, args.overwrite_original)
-        else:
-            res = run_exiftool_video(path, exif_dt, args.overwrite_original)
-        if res.returncode == 0:
-            updated += 1
-        else:
-            print(f"[ERROR] exiftool failed for {path}\n{res.stderr}", file=sys.stderr)
-
     if args.dry_run:
+        for pid, path, exif_dt, kind in work:
+            print(f"[DRY] {kind} {pid}  {path}  <= {exif_dt}")
         print("[DONE] Dry run complete.")
+        return 0
+
+    def build_args(w):
+        pid, path, exif_dt, kind = w
+        if kind == "photo":
+            return exiftool_photo_args(path, exif_dt, args.overwrite_original)
+        return exiftool_video_args(path, exif_dt, args.overwrite_original)
+
+    pool = ctx.pool()
+    if args.skip_correct:
+        work, correct = drop_current(pool, work, build_args)
+        print(f"[INFO] Already correct, skipped: {correct:,}")
+    backups = with_backups(backup, pool, work, build_args, journal)
+    sync = DirSync() if args.fsync else None
+
+    if args.native_dates:
+        native = NativeDates(lambda w: (w[1], w[2], w[3]), backup=not args.overwrite_original)
+        jobs = native.map(pool, backups, build_args, batch_size=args.batch_size, retries=args.retries, timeout=args.timeout)
     else:
-        print(f"[DONE] Updated {updated:,} files.")
+        jobs = pool.map(backups, build_args, batch_size=args.batch_size, retries=args.retries, timeout=args.timeout)
+
+    updated = 0
+    with ctx.metrics.phase("fix_video_dates", total=len(work)) as ph:
+        for (pid, path, exif_dt, kind), res in jobs:
+            ph.add()
+            if res.returncode == 0:
+                updated += 1
+                if sync:
+                    sync.add(path)
+                if journal:
+                    journal.record_step(path, "fix_dates")
+                if manifest:
+                    manifest.record_dates(path, exif_dt, kind)
+            else:
+                print(f"[ERROR] exiftool failed for {path}\n{res.stderr}", file=sys.stderr)
+                if ctx.failed:
+                    ctx.failed.add(path, "fix_dates", res)
+
+    if args.native_dates:
+        print(f"[INFO] Patched in place (no exiftool rewrite): {native.patched:,}")
+    if backup in ("reflink", "journal"):
+        print(backups.summary())
+    if sync:
+        sync.close()
+    print(f"[DONE] Updated {updated:,} files.")
+    return updated
+
+def main(argv=None):
+    ap = build_parser()
+    args = ap.parse_args(argv)
+    if args.resume and not args.journal:
+        ap.error("--resume requires --journal")
+    check_backup_args(ap, args)
+    if args.from_manifest and not manifest_path(args.downloads).exists():
+        ap.error(f"--from-manifest: no organize manifest in {Path(args.downloads).expanduser()}")
+    check_tz_args(ap, args)
+    with RunContext.from_args(args) as ctx:
+        run(args, ctx)
 
 if __name__ == "__main__":
     main()
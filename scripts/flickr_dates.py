@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Flickr date_taken handling shared by the date-fixing steps.
+
+fix_photo_dates.py, fix_video_dates.py and fix_and_embed.py all map each
+Flickr ID to its JSON date_taken, pick the one file per ID that gets the
+date (the "_o." original if there is one) and turn the date into exiftool
+tag arguments; they use the functions here so they always agree.
+"""
+
+from media_inventory import group_by_id, media_entries
+from sidecar_index import DEFAULT_JSON_WORKERS, open_index
+
+def load_id_to_date(json_dirs, index_path=None, workers=DEFAULT_JSON_WORKERS, ctx=None):
+    if ctx is not None:
+        records = ctx.sidecar_records(json_dirs, index_path, workers)
+        return {pid: r["date_taken"] for pid, r in records.items() if r["date_taken"]}
+    with open_index(json_dirs, index_path, workers) as idx:
+        id_to_date = idx.dates()
+        total = idx.count()
+    print(f"[INFO] JSON sidecars indexed: {total:,} | with date_taken: {len(id_to_date):,}")
+    return id_to_date
+
+def find_media(download_root, inventory=None, ctx=None):
+    entries = ctx.media(download_root, inventory) if ctx else media_entries(download_root, inventory)
+    id_to_files = group_by_id(entries)
+    print(f"[INFO] Media files scanned (photos+videos): {len(entries):,} | matched IDs: {len(id_to_files):,}")
+    return id_to_files
+
+def pick_best_file(paths):
+    # Prefer originals (_o) if present
+    paths = sorted(paths, key=lambda x: x.name.lower())
+    for p in paths:
+        if "_o." in p.name.lower():
+            return p
+    return paths[0]
+
+def to_exiftool_dt(dt):
+    # JSON: "YYYY-MM-DD HH:MM:SS"  -> ExifTool: "YYYY:MM:DD HH:MM:SS"
+    dt = dt.strip()
+    if len(dt) >= 19 and dt[4] == "-" and dt[7] == "-" and dt[10] == " ":
+        return dt[:10].replace("-", ":") + dt[10:19]
+    return None
+
+def date_tag_args(exif_dt, kind):
+    if kind == "photo":
+        return [
+            f'-DateTimeOriginal={exif_dt}',
+            f'-CreateDate={exif_dt}',
+            f'-ModifyDate={exif_dt}',
+        ]
+    # For MP4/MOV: set QuickTime/MP4 time tags commonly used by Photos/Google Photos.
+    return [
+        f'-CreateDate={exif_dt}',
+        f'-ModifyDate={exif_dt}',
+        f'-TrackCreateDate={exif_dt}',
+        f'-TrackModifyDate={exif_dt}',
+        f'-MediaCreateDate={exif_dt}',
+        f'-MediaModifyDate={exif_dt}',
+    ]
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Single-walk media inventory shared by all steps.
+
+One os.scandir pass over a tree records, for every photo/video file: path,
+kind ("photo"/"video"), size, mtime and the Flickr ID from the filename (""
+if none). The fix/embed scripts accept --inventory to load a saved inventory
+instead of walking the tree themselves, and rebuild_archive.py builds it once
+per run for the output folder.
+
+Size/mtime are as of the walk; later steps only rely on path, kind and ID.
+
+python3 scripts/media_inventory.py --root "/path/to/Flickr Organized" --output inventory.json
+"""
+
+import argparse, json, os, sys
+from collections import namedtuple
+from pathlib import Path
+
+from media_names import classify
+
+INVENTORY_VERSION = 1
+
+MediaEntry = namedtuple("MediaEntry", "path kind size mtime_ns pid")
+
+def iter_media_dirs(root):
+    """
+    Yield (directory, [MediaEntry]) one directory at a time, entries sorted by
+    path and subdirectories visited in name order. Only the current directory
+    and the stack of unvisited subdirectories are held in memory (streaming
+    mode); walk_media() collects everything.
+    """
+    root = Path(root).expanduser()
+    if not root.exists():
+        print(f"[ERROR] Media root not found: {root}", file=sys.stderr)
+        sys.exit(1)
+
+    stack = [str(root)]
+    while stack:
+        d = stack.pop()
+        try:
+            it = os.scandir(d)
+        except OSError as e:
+            print(f"[WARN] Cannot list {d}: {e}", file=sys.stderr)
+            continue
+        entries = []
+        subdirs = []
+        with it:
+            for e in it:
+                if e.is_dir(follow_symlinks=False):
+                    subdirs.append(e.path)
+                    continue
+                media = classify(e.name)
+                if media is None or not e.is_file():
+                    continue
+                st = e.stat()
+                entries.append(MediaEntry(e.path, media[0], st.st_size, st.st_mtime_ns, media[1]))
+        stack.extend(sorted(subdirs, key=str.lower, reverse=True))
+        if entries:
+            entries.sort(key=lambda x: x.path.lower())
+            yield d, entries
+
+def iter_media(root):
+    for _, entries in iter_media_dirs(root):
+        yield from entries
+
+def walk_media(root):
+    entries = list(iter_media(root))
+    entries.sort(key=lambda x: x.path.lower())
+    return entries
+
+def save_inventory(path, root, entries):
+    root = str(Path(root).expanduser())
+    data = {
+        "version": INVENTORY_VERSION,
+        "root": root,
+        "entries": [[os.path.relpath(e.path, root), e.kind, e.size, e.mtime_ns, e.pid] for e in entries],
+    }
+    Path(path).write_text(json.dumps(data, separators=(",", ":")), encoding="utf-8")
+
+def load_inventory(path, root=None):
+    data = json.loads(Path(path).expanduser().read_text(encoding="utf-8"))
+    if data.get("version") != INVENTORY_VERSION:
+        raise ValueError(f"unsupported inventory version in {path}")
+    base = data["root"]
+    if root is not None and os.path.realpath(Path(root).expanduser()) != os.path.realpath(base):
+        raise ValueError(f"inventory {path} was built for {base}, not {root}")
+    return [MediaEntry(os.path.join(base, rel), kind, size, mtime, pid) for rel, kind, size, mtime, pid in data["entries"]]
+
+def media_entries(root, inventory=None):
+    """Entries for root: from a saved inventory file if given, else one walk."""
+    if inventory:
+        try:
+            return load_inventory(inventory, root)
+        except (OSError, ValueError) as e:
+            print(f"[WARN] Ignoring inventory {inventory}: {e}", file=sys.stderr)
+    return walk_media(root)
+
+def group_by_id(entries):
+    id_to_files = {}
+    for e in entries:
+        if e.pid:
+            id_to_files.setdefault(e.pid, []).append(Path(e.path))
+    return id_to_files
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--root", required=True, help="Folder to inventory")
+    ap.add_argument("--output", required=True, help="Inventory file to write")
+    args = ap.parse_args()
+
+    entries = walk_media(args.root)
+    save_inventory(args.output, args.root, entries)
+    print(f"[DONE] Inventoried {len(entries):,} media files -> {args.output}")
+
+if __name__ == "__main__":
+    main()
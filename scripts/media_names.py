@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Media classification from a file name, shared by all steps.
+
+Every walk classifies each name it sees: photo, video or neither, and the
+Flickr ID (the last run of 10-12 digits, "" if none). This runs once per
+directory entry, so it works on the plain name string (os.DirEntry.name)
+and callers only build a Path for files that turn out to be media:
+
+  - the extension is cut with rfind(".") and looked up in a precomputed
+    table holding the lower- and upper-case spellings, so str.lower() only
+    runs for mixed case such as ".Jpg";
+  - the ID regex is compiled once and only runs on media names, up to the
+    extension.
+
+python3 scripts/media_names.py "Sunset_49123456789_o.JPG" notes.txt
+"""
+
+import re, sys
+
+# Flickr photo IDs in filenames are typically 10-12 digits. (Avoid 8-digit dates like 20140603.)
+ID_RE = re.compile(r'(?<!\d)(\d{10,12})(?!\d)')
+
+PHOTO_EXTS = {".jpg", ".jpeg", ".png", ".heic", ".tif", ".tiff"}
+VIDEO_EXTS = {".mp4", ".mov", ".m4v"}
+MEDIA_EXTS = PHOTO_EXTS | VIDEO_EXTS
+
+KIND_BY_EXT = {}
+for _kind, _exts in (("photo", PHOTO_EXTS), ("video", VIDEO_EXTS)):
+    for _ext in _exts:
+        KIND_BY_EXT[_ext] = KIND_BY_EXT[_ext.upper()] = _kind
+
+_findall = ID_RE.findall
+
+def _ext_kind(name):
+    # -> (kind, index of the extension's dot); kind None for non-media
+    i = name.rfind(".")
+    if i <= 0:  # no extension, or a dotfile such as ".jpg" (as os.path.splitext)
+        return None, i
+    ext = name[i:]
+    kind = KIND_BY_EXT.get(ext)
+    if kind is None and not ext.islower():
+        kind = KIND_BY_EXT.get(ext.lower())
+    return kind, i
+
+def media_kind(name):
+    """"photo", "video" or None for a file name."""
+    return _ext_kind(name)[0]
+
+def pid_from_name(name):
+    """Flickr ID in a file name: the last run of 10-12 digits, "" if none."""
+    m = _findall(name)
+    return m[-1] if m else ""
+
+def classify(name):
+    """(kind, pid) for a photo/video file name, None for anything else."""
+    kind, i = _ext_kind(name)
+    if kind is None:
+        return None
+    m = _findall(name, 0, i)
+    return kind, m[-1] if m else ""
+
+def main():
+    for name in sys.argv[1:]:
+        print(f"{name}: {classify(name)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Timing, throughput and progress instrumentation.
+
+Every stage records its work in the run context's Metrics:
+
+  with ctx.metrics.phase("organize", total=len(files)) as ph:
+      ...
+      ph.add(1, nbytes)
+
+A phase keeps wall time, items and bytes (files/s, MB/s) and, given a total,
+an ETA. With --progress a line per running phase is printed to stderr every
+few seconds. The exiftool pool reports the latency of every call, kept as
+counts in fixed buckets (1 ms .. 10 s) from which p50/p90/p99 are estimated.
+
+At the end a one-line timing summary is printed and, with --metrics-json,
+the full summary is written as JSON. rebuild_archive.py runs all stages on
+one context, so its summary covers the whole rebuild.
+"""
+
+import json, sys, threading, time
+from bisect import bisect_left
+from contextlib import contextmanager
+from pathlib import Path
+
+PROGRESS_INTERVAL = 5.0
+# Upper bounds (ms) of the latency buckets; the last bucket is open-ended.
+LATENCY_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000]
+BUCKET_LABELS = [f"<={b}ms" for b in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}ms"]
+
+def add_metrics_args(ap):
+    ap.add_argument("--progress", action="store_true",
+                    help="Print files/s, MB/s and ETA for the running step every few seconds")
+    ap.add_argument("--metrics-json", default=None,
+                    help="Write per-step timings, throughput and exiftool latency percentiles to this file")
+
+def fmt_duration(s):
+    s = int(s)
+    if s >= 3600:
+        return f"{s // 3600}h{s % 3600 // 60:02d}m"
+    if s >= 60:
+        return f"{s // 60}m{s % 60:02d}s"
+    return f"{s}s"
+
+class Phase:
+    def __init__(self, name, metrics):
+        self.name = name
+        self.metrics = metrics
+        self.seconds = 0.0
+        self.items = 0
+        self.bytes = 0
+        self.total = None
+        self.started = None
+        self.active = 0  # threads inside the phase; its wall time runs while any is
+        self.last_report = 0.0
+        self.lock = threading.Lock()
+
+    def add(self, items=1, nbytes=0):
+        with self.lock:
+            self.items += items
+            self.bytes += nbytes
+            now = time.monotonic()
+            due = self.metrics.progress and now - self.last_report >= PROGRESS_INTERVAL
+            if due:
+                self.last_report = now
+        if due:
+            print(self.progress_line(), file=sys.stderr, flush=True)
+
+    def elapsed(self):
+        started = self.started
+        running = time.monotonic() - started if started is not None else 0.0
+        return self.seconds + running
+
+    def progress_line(self):
+        secs = max(self.elapsed(), 1e-9)
+        rate = self.items / secs
+        line = f"[PROGRESS] {self.name}: {self.items:,}"
+        if self.total:
+            line += f"/{self.total:,} ({100 * self.items / self.total:.0f}%)"
+        line += f"  {rate:,.0f} files/s"
+        if self.bytes:
+            line += f"  {self.bytes / secs / 1e6:,.1f} MB/s"
+        if self.total and rate > 0 and self.items < self.total:
+            line += f"  ETA {fmt_duration((self.total - self.items) / rate)}"
+        return line
+
+    def summary(self):
+        secs = self.seconds
+        return {
+            "seconds": round(secs, 3),
+            "items": self.items,
+            "bytes": self.bytes,
+            "items_per_s": round(self.items / secs, 1) if secs else 0.0,
+            "bytes_per_s": round(self.bytes / secs, 1) if secs else 0.0,
+        }
+
+class LatencyHistogram:
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.calls = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, ms):
+        self.counts[bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+        self.calls += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def percentile(self, q):
+        # Upper bound of the bucket holding the q-th call, capped at the slowest call.
+        if not self.calls:
+            return 0.0
+        rank = q * self.calls
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and i < len(LATENCY_BUCKETS_MS):
+                return min(float(LATENCY_BUCKETS_MS[i]), round(self.max_ms, 1))
+        return round(self.max_ms, 1)
+
+    @classmethod
+    def from_summary(cls, s):
+        h = cls()
+        for label, n in s["buckets"].items():
+            h.counts[BUCKET_LABELS.index(label)] = n
+        h.calls = s["calls"]
+        h.total_ms = s["mean_ms"] * s["calls"]
+        h.max_ms = s["max_ms"]
+        return h
+
+    def merge(self, other):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.calls += other.calls
+        self.total_ms += other.total_ms
+        self.max_ms = max(self.max_ms, other.max_ms)
+
+    def summary(self):
+        return {
+            "calls": self.calls,
+            "mean_ms": round(self.total_ms / self.calls, 2) if self.calls else 0.0,
+            "max_ms": round(self.max_ms, 1),
+            "p50_ms": self.percentile(0.50),
+            "p90_ms": self.percentile(0.90),
+            "p99_ms": self.percentile(0.99),
+            "buckets": {label: n for label, n in zip(BUCKET_LABELS, self.counts) if n},
+        }
+
+def merge_summaries(summaries):
+    """
+    One summary for runs that ran side by side (shards of a rebuild): items
+    and bytes add up, wall times are the slowest run's, latency histograms
+    are combined. Each run's own summary is kept under "runs".
+    """
+    phases = {}
+    latency = {}
+    for s in summaries:
+        for name, p in s["phases"].items():
+            m = phases.setdefault(name, {"seconds": 0.0, "items": 0, "bytes": 0})
+            m["seconds"] = max(m["seconds"], p["seconds"])
+            m["items"] += p["items"]
+            m["bytes"] += p["bytes"]
+        for kind, h in s["exiftool"].items():
+            h = LatencyHistogram.from_summary(h)
+            if kind in latency:
+                latency[kind].merge(h)
+            else:
+                latency[kind] = h
+    for m in phases.values():
+        secs = m["seconds"]
+        m["items_per_s"] = round(m["items"] / secs, 1) if secs else 0.0
+        m["bytes_per_s"] = round(m["bytes"] / secs, 1) if secs else 0.0
+    return {
+        "total_seconds": max((s["total_seconds"] for s in summaries), default=0.0),
+        "phases": phases,
+        "exiftool": {kind: h.summary() for kind, h in latency.items()},
+        "runs": summaries,
+    }
+
+class Metrics:
+    def __init__(self, progress=False):
+        self.progress = progress
+        self.started = time.monotonic()
+        self.phases = {}
+        self.latency = {}
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name, total=None):
+        # The same phase may run on several threads at once (rebuild_archive.py
+        # overlaps organize and the write step); overlapping time counts once.
+        with self.lock:
+            ph = self.phases.get(name)
+            if ph is None:
+                ph = self.phases[name] = Phase(name, self)
+        with ph.lock:
+            if total is not None:
+                ph.total = (ph.total or 0) + total
+            if not ph.active:
+                ph.started = time.monotonic()
+            ph.active += 1
+        try:
+            yield ph
+        finally:
+            with ph.lock:
+                ph.active -= 1
+                if not ph.active:
+                    ph.seconds += time.monotonic() - ph.started
+                    ph.started = None
+
+    def observe_latency(self, kind, seconds):
+        with self.lock:
+            hist = self.latency.get(kind)
+            if hist is None:
+                hist = self.latency[kind] = LatencyHistogram()
+            hist.observe(seconds * 1000)
+
+    def summary(self):
+        return {
+            "total_seconds": round(time.monotonic() - self.started, 3),
+            "phases": {name: ph.summary() for name, ph in self.phases.items()},
+            "exiftool": {kind: h.summary() for kind, h in self.latency.items()},
+        }
+
+    def report(self):
+        if not self.phases:
+            return
+        parts = []
+        for name, ph in self.phases.items():
+            part = f"{name} {ph.seconds:,.1f}s"
+            if ph.items and ph.seconds:
+                part += f" ({ph.items / ph.seconds:,.0f}/s)"
+            parts.append(part)
+        print(f"[INFO] Timing: {', '.join(parts)}")
+        for kind, h in self.latency.items():
+            s = h.summary()
+            print(f"[INFO] exiftool {kind}: {s['calls']:,} calls, p50 {s['p50_ms']:g} ms, "
+                  f"p90 {s['p90_ms']:g} ms, p99 {s['p99_ms']:g} ms, max {s['max_ms']:g} ms")
+
+    def write_json(self, path):
+        path = Path(path).expanduser()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.summary(), indent=2), encoding="utf-8")
+        print(f"[INFO] Wrote metrics: {path}")
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+In-place date patcher for the common case (--native-dates).
+
+Fixing dates only changes a few fixed-width fields, which most files already
+have:
+
+  JPEG       ModifyDate (IFD0), DateTimeOriginal and CreateDate (ExifIFD):
+             19-character ASCII values + NUL
+  MP4/MOV    creation/modification times in mvhd, every tkhd and every mdhd:
+             32- or 64-bit seconds since 1904-01-01
+
+When all of them are present they are overwritten through mmap, so the file is
+neither rewritten nor copied. Anything else (no Exif block, a tag missing, a
+date that does not fit a 32-bit QuickTime field, other formats, unreadable
+files) is left untouched and handed to exiftool as before.
+
+Backups follow exiftool: unless -overwrite_original is set, FILE_original
+keeps the untouched file (an existing backup is left alone). A hardlinked file
+(organize --mode hardlink) shares its data with the source, so it is replaced
+by a private copy before being patched; reflinked files are copy-on-write and
+patched directly.
+"""
+
+import mmap, os, shutil, struct
+from datetime import datetime
+
+from exiftool_pool import ExiftoolResult
+
+JPEG_EXTS = {".jpg", ".jpeg"}
+QT_EXTS = {".mp4", ".mov", ".m4v"}
+QT_EPOCH = datetime(1904, 1, 1)
+TAG_MODIFY_DATE = 0x0132
+TAG_EXIF_IFD = 0x8769
+TAG_DATE_ORIGINAL = 0x9003
+TAG_CREATE_DATE = 0x9004
+EXIF_ASCII = 2
+EXIF_DATE_LEN = 20  # "YYYY:MM:DD HH:MM:SS" + NUL
+# Same as a successful exiftool call, for the scripts' result loops.
+PATCHED = ExiftoolResult([], 0, "    1 image files updated (native)\n", "")
+
+def _tiff_date_slots(mm, base, end):
+    # -> offsets of the ModifyDate, DateTimeOriginal and CreateDate values, or None
+    order = {b"II": "<", b"MM": ">"}.get(mm[base:base + 2])
+    if not order or end > len(mm) or base + 8 > end:
+        return None
+
+    def ifd(offset):
+        pos = base + offset
+        if pos + 2 > end:
+            return None
+        n = struct.unpack_from(order + "H", mm, pos)[0]
+        if pos + 2 + 12 * n > end:
+            return None
+        entries = {}
+        for i in range(n):
+            e = pos + 2 + 12 * i
+            tag, typ, count, value = struct.unpack_from(order + "HHII", mm, e)
+            entries[tag] = (typ, count, value)
+        return entries
+
+    ifd0 = ifd(struct.unpack_from(order + "I", mm, base + 4)[0])
+    if not ifd0 or TAG_EXIF_IFD not in ifd0:
+        return None
+    exif = ifd(ifd0[TAG_EXIF_IFD][2])
+    if not exif:
+        return None
+    slots = []
+    for entries, tag in ((ifd0, TAG_MODIFY_DATE), (exif, TAG_DATE_ORIGINAL), (exif, TAG_CREATE_DATE)):
+        typ, count, value = entries.get(tag, (None, None, None))
+        if typ != EXIF_ASCII or count != EXIF_DATE_LEN or base + value + count > end:
+            return None
+        slots.append(base + value)
+    return slots
+
+def jpeg_date_slots(mm):
+    if mm[:2] != b"\xff\xd8":
+        return None
+    pos = 2
+    while pos + 4 <= len(mm):
+        if mm[pos] != 0xFF:
+            return None
+        marker = mm[pos + 1]
+        if marker == 0xFF:  # fill byte
+            pos += 1
+            continue
+        if marker in (0xD9, 0xDA):  # EOI / start of scan: no Exif block
+            return None
+        seglen = struct.unpack_from(">H", mm, pos + 2)[0]
+        if marker == 0xE1 and mm[pos + 4:pos + 10] == b"Exif\0\0":
+            return _tiff_date_slots(mm, pos + 10, pos + 2 + seglen)
+        pos += 2 + seglen
+    return None
+
+def _atoms(mm, start, end):
+    # -> (type, payload start, atom end) for each atom in [start, end)
+    pos = start
+    while pos + 8 <= end:
+        size, typ = struct.unpack_from(">I4s", mm, pos)
+        head = 8
+        if size == 1:
+            size = struct.unpack_from(">Q", mm, pos + 8)[0] if pos + 16 <= end else 0
+            head = 16
+        elif size == 0:
+            size = end - pos
+        if size < head or pos + size > end:
+            raise ValueError(f"bad atom at {pos}")
+        yield typ, pos + head, pos + size
+        pos += size
+
+def _time_slot(mm, start, end):
+    # mvhd/tkhd/mdhd: version, flags, then creation + modification time
+    version = mm[start] if start < end else None
+    width = {0: 4, 1: 8}.get(version)
+    if width is None or start + 4 + 2 * width > end:
+        raise ValueError("unsupported header version")
+    return start + 4, width
+
+def quicktime_date_slots(mm):
+    # -> [(offset, width)] of every creation/modification time pair, or None
+    try:
+        moov = next(((s, e) for t, s, e in _atoms(mm, 0, len(mm)) if t == b"moov"), None)
+        if not moov:
+            return None
+        slots = []
+        has_mvhd = False
+        for typ, s, e in _atoms(mm, *moov):
+            if typ == b"mvhd":
+                slots.append(_time_slot(mm, s, e))
+                has_mvhd = True
+            elif typ == b"trak":
+                for t2, s2, e2 in _atoms(mm, s, e):
+                    if t2 == b"tkhd":
+                        slots.append(_time_slot(mm, s2, e2))
+                    elif t2 == b"mdia":
+                        slots += [_time_slot(mm, s3, e3) for t3, s3, e3 in _atoms(mm, s2, e2) if t3 == b"mdhd"]
+        return slots if has_mvhd else None
+    except (ValueError, struct.error):
+        return None
+
+def _find_slots(path, kind):
+    ext = os.path.splitext(path)[1].lower()
+    if kind == "photo" and ext in JPEG_EXTS:
+        find = jpeg_date_slots
+    elif kind == "video" and ext in QT_EXTS:
+        find = quicktime_date_slots
+    else:
+        return None
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return None
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return find(mm)
+
+def _prepare(path, backup):
+    # Keep exiftool's FILE_original backup and never patch through a hardlink.
+    st = os.stat(path)
+    bak = path + "_original"
+    if backup and not os.path.exists(bak):
+        if st.st_nlink > 1:
+            os.link(path, bak)
+        else:
+            shutil.copy2(path, bak)
+    if st.st_nlink > 1:
+        tmp = path + ".native-tmp"
+        shutil.copy2(path, tmp)
+        os.replace(tmp, path)
+
+def patch_dates(path, exif_dt, kind, backup=True):
+    """
+    Write exif_dt ("YYYY:MM:DD HH:MM:SS") into the date fields of path in place.
+    -> True when patched; False leaves the file as it was (use exiftool).
+    """
+    path = str(path)
+    try:
+        dt = datetime.strptime(exif_dt, "%Y:%m:%d %H:%M:%S")
+        slots = _find_slots(path, kind)
+    except (OSError, ValueError):
+        return False
+    if not slots:
+        return False
+    if kind == "photo":
+        writes = [(off, exif_dt.encode("ascii") + b"\0") for off in slots]
+    else:
+        secs = int((dt - QT_EPOCH).total_seconds())
+        if secs < 0 or any(width == 4 and secs >= 1 << 32 for _, width in slots):
+            return False
+        fmt = {4: ">II", 8: ">QQ"}
+        writes = [(off, struct.pack(fmt[width], secs, secs)) for off, width in slots]
+    try:
+        _prepare(path, backup)
+        with open(path, "r+b") as f, mmap.mmap(f.fileno(), 0) as mm:
+            for off, data in writes:
+                mm[off:off + len(data)] = data
+            mm.flush()
+    except OSError:
+        return False
+    return True
+
+class NativeDates:
+    """
+    Try patch_dates first for each job and only send the rest to exiftool.
+
+    target(item) -> (path, exif_dt, kind) for jobs that only set dates, else
+    None. map() has the same contract as ExiftoolPool.map; patched jobs get a
+    successful result without an exiftool call.
+    """
+    def __init__(self, target, backup=True):
+        self.target = target
+        self.backup = backup
+        self.patched = 0
+
+    def map(self, pool, items, build_args, **kw):
+        def args(item):
+            t = self.target(item)
+            if t and patch_dates(*t, backup=self.backup):
+                self.patched += 1
+                return None
+            return build_args(item)
+
+        for item, res in pool.map(items, args, **kw):
+            yield item, PATCHED if res is None else res
@@ -1,36 +1,117 @@
 #!/usr/bin/env python3
 import argparse
 import csv
+import errno
 import os
-import shutil
 import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
-PHOTO_EXTS = {".jpg",".jpeg",".png",".heic",".tif",".tiff"}
-VIDEO_EXTS = {".mp4",".mov",".m4v"}
-
-def run_exiftool_csv(downloads_root: Path, csv_path: Path):
-    # One fast scan for all media with both DateTimeOriginal + CreateDate
-    cmd = [
-        "exiftool", "-r", "-csv",
-        "-DateTimeOriginal", "-CreateDate",
-        "-FileName", "-Directory",
-        str(downloads_root)
-    ]
-    print("[INFO] Scanning files with exiftool (this may take a bit)...")
-    res = subprocess.run(cmd, capture_output=True, text=True)
-    if res.returncode != 0:
-        raise RuntimeError(res.stderr.strip() or "exiftool failed")
-    csv_path.write_text(res.stdout, encoding="utf-8")
+from dedup import DEFAULT_HASH_WORKERS, dedup_entries
+from exiftool_pool import EXIFTOOL
+from file_copy import copy_into_place, reflink
+from media_inventory import iter_media
+from media_names import classify, pid_from_name
+from metrics import add_metrics_args
+from run_context import RunContext
+from shards import add_shard_args
+from sidecar_index import DEFAULT_JSON_WORKERS
+
+MODES = ["copy", "move", "hardlink", "reflink"]
+# os.link() errors that mean "not possible here" rather than a real failure.
+NO_LINK_ERRNOS = {errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP}
+
+# -T columns. Only the last two (file and folder name) can contain a tab themselves.
+SCAN_TAGS = ["DateTimeOriginal", "CreateDate", "FileName", "Directory"]
+MANIFEST_FIELDS = ["SourceFile"] + SCAN_TAGS
+# stderr lines shown for files exiftool printed nothing for
+SCAN_ERRORS_SHOWN = 5
+
+def scan_row(line: str) -> dict:
+    """
+    One exiftool -T line -> {tag: value, "SourceFile": path}. -T prints "-"
+    for a missing tag; missing columns are empty. A tab inside the file or
+    folder name splits it over extra columns: the split that names an
+    existing file is taken.
+    """
+    fields = line.rstrip("\r\n").split("\t")
+    n = len(SCAN_TAGS)
+    if len(fields) > n:
+        head, rest = fields[:n - 2], fields[n - 2:]
+        splits = [("\t".join(rest[:k]), "\t".join(rest[k:])) for k in range(1, len(rest))]
+        fn, d = next((s for s in splits if os.path.isfile(os.path.join(s[1], s[0]))), splits[0])
+        fields = head + [fn, d]
+    fields += [""] * (n - len(fields))
+    row = {t: ("" if v == "-" else v) for t, v in zip(SCAN_TAGS, fields)}
+    row["SourceFile"] = f"{row['Directory']}/{row['FileName']}" if row["Directory"] and row["FileName"] else ""
+    return row
+
+def stream_exiftool_scan(files, csv_path: Path):
+    """
+    Yield one row dict per file while exiftool is still scanning, and write the
+    same rows to csv_path as a side output.
+
+    exiftool -csv buffers every row until the whole tree is scanned, so this
+    uses -T (one tab-separated line per file, flushed as it goes) and parses
+    the pipe line by line (scan_row) instead. The file list comes from the
+    media inventory walk and is passed as an -@ argfile, so exiftool does not
+    walk the tree a second time.
+
+    Files exiftool cannot read (gone since the walk, unreadable) get no line;
+    they are reported at the end. Only a scan that returns nothing at all
+    with an error status raises.
+    """
+    with tempfile.NamedTemporaryFile("w", encoding="utf-8", suffix=".args") as argfile, \
+         tempfile.TemporaryFile("w+", encoding="utf-8") as err, \
+         csv_path.open("w", encoding="utf-8", newline="") as mf:
+        n = 0
+        for f in files:
+            argfile.write(f"{f}\n")
+            n += 1
+        argfile.flush()
+        print(f"[INFO] Media files found: {n:,}")
+        print("[INFO] Scanning files with exiftool (placing files as they are found)...")
+        cmd = [EXIFTOOL, "-T"] + [f"-{t}" for t in SCAN_TAGS] + ["-@", argfile.name]
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=err, text=True, encoding="utf-8", errors="replace")
+        writer = csv.DictWriter(mf, fieldnames=MANIFEST_FIELDS)
+        writer.writeheader()
+        rows = 0
+        try:
+            for line in proc.stdout:
+                row = scan_row(line)
+                writer.writerow(row)
+                rows += 1
+                yield row
+        except GeneratorExit:
+            # The caller stopped reading (organize was stopped): end the scan too.
+            proc.kill()
+            proc.wait()
+            proc.stdout.close()
+            raise
+        proc.wait()
+        if proc.returncode != 0 or rows < n:
+            err.seek(0)
+            errors = err.read().strip()
+            if not rows and n:
+                raise RuntimeError(errors or "exiftool failed")
+            if rows < n:
+                shown = "".join(f"\n  {e}" for e in errors.splitlines()[:SCAN_ERRORS_SHOWN])
+                print(f"[WARN] exiftool returned nothing for {n - rows:,} file(s); they were not placed{shown}",
+                      file=sys.stderr)
     print(f"[INFO] Wrote manifest: {csv_path}")
 
-def pick_dt(row: dict, ext: str) -> str | None:
+def pick_dt(row: dict, kind: str) -> str | None:
     # Photos: DateTimeOriginal preferred. Videos: CreateDate.
     dto = (row.get("DateTimeOriginal") or "").strip()
     cd  = (row.get("CreateDate") or "").strip()
-    if ext in PHOTO_EXTS:
+    if kind == "photo":
         return dto or cd or None
-    if ext in VIDEO_EXTS:
+    if kind == "video":
         return cd or dto or None
     return None
 
@@ -44,73 +125,360 @@ def year_month(dt: str) -> tuple[str,str] | None:
         return None
     return y, m
 
-def main():
+class DestIndex:
+    """
+    Names already taken in each output directory. A directory is listed once
+    with os.scandir (and created if needed) the first time a file goes there,
+    then updated in memory as names are handed out, so finding a free _N
+    suffix costs no filesystem calls, also when rerunning into a non-empty
+    output folder.
+
+    Names are compared case-insensitively so IMG_0001.JPG and img_0001.jpg
+    never overwrite each other on macOS/exFAT volumes.
+    """
+
+    def __init__(self):
+        self.dirs = {}
+        # (dir, stem, suffix) -> next _N to try, so each suffix is probed once
+        self.next_n = {}
+
+    def names(self, d: Path) -> set:
+        names = self.dirs.get(d)
+        if names is None:
+            d.mkdir(parents=True, exist_ok=True)
+            with os.scandir(d) as it:
+                names = {e.name.casefold() for e in it}
+            self.dirs[d] = names
+        return names
+
+    def claim(self, d: Path, name: str) -> Path:
+        names = self.names(d)
+        if name.casefold() not in names:
+            names.add(name.casefold())
+            return d / name
+        stem, suf = os.path.splitext(name)
+        key = (d, stem.casefold(), suf.casefold())
+        i = self.next_n.get(key, 1)
+        while f"{stem}_{i}{suf}".casefold() in names:
+            i += 1
+        self.next_n[key] = i + 1
+        name = f"{stem}_{i}{suf}"
+        names.add(name.casefold())
+        return d / name
+
+def place_file(src: Path, dest: Path, mode: str, dest_dev=None):
+    """
+    -> (source stat, True if no data was copied). Moves within one filesystem
+    are a rename; across devices they become copy2 + unlink. hardlink falls
+    back to copy2 where links are not possible (other device, FAT/exFAT, ...),
+    reflink to copy_file_range/plain copy on filesystems without clones.
+    Copies only appear under dest once they are complete.
+    """
+    st = src.stat()
+    if mode == "move":
+        if dest_dev is None:
+            dest_dev = os.stat(dest.parent).st_dev
+        if st.st_dev == dest_dev:
+            os.rename(src, dest)
+            return st, True
+        copy_into_place(src, dest)
+        os.unlink(src)
+    elif mode == "hardlink":
+        try:
+            os.link(src, dest)
+            return st, True
+        except OSError as e:
+            if e.errno not in NO_LINK_ERRNOS:
+                raise
+        copy_into_place(src, dest)
+    elif mode == "reflink":
+        return st, copy_into_place(src, dest, reflink)
+    else:
+        copy_into_place(src, dest)
+    return st, False
+
+class Placer:
+    """
+    Copies/moves files on a bounded thread pool. Destinations are chosen by the
+    caller before submit(), so the thread schedule never affects naming.
+    Once stop (a threading.Event) is set, files still queued are left alone.
+    """
+
+    def __init__(self, mode: str, workers: int, journal=None, on_done=None, phase=None, manifest=None,
+                 stop=None):
+        self.mode = mode
+        self.stop = stop
+        self.journal = journal
+        self.manifest = manifest
+        self.phase = phase
+        # on_done(src, dest) after each file; dest is None if it failed.
+        self.on_done = on_done
+        self.ex = ThreadPoolExecutor(max_workers=max(1, workers))
+        self.slots = threading.BoundedSemaphore(max(1, workers) * 4)
+        self.lock = threading.Lock()
+        self.dev_cache = {}
+        self.placed = 0
+        self.failed = 0
+        self.bytes = 0
+        self.shared = 0  # renamed/linked/cloned, no data copied
+        self.started = time.monotonic()
+
+    def submit(self, src: Path, dest: Path, meta=()):
+        # meta: (pid, kind, date_original, create_date, date_source) for the manifest
+        dest_dev = None
+        if self.mode == "move":
+            dest_dev = self.dev_cache.get(dest.parent)
+            if dest_dev is None:
+                dest_dev = self.dev_cache[dest.parent] = os.stat(dest.parent).st_dev
+        self.slots.acquire()
+        fut = self.ex.submit(self._place, src, dest, dest_dev, meta)
+        fut.add_done_callback(lambda f: self.slots.release())
+
+    def _place(self, src, dest, dest_dev, meta):
+        if self.stop is not None and self.stop.is_set():
+            return
+        try:
+            st, shared = place_file(src, dest, self.mode, dest_dev)
+            if self.journal:
+                self.journal.record_placed(src, st, dest)
+            if self.manifest and meta:
+                self.manifest.record_placed(src, dest, *meta)
+        except OSError as e:
+            print(f"[ERROR] {self.mode} failed: {src} -> {dest}: {e}", file=sys.stderr)
+            with self.lock:
+                self.failed += 1
+            if self.phase:
+                self.phase.add()
+            if self.on_done:
+                self.on_done(src, None)
+            return
+        with self.lock:
+            self.placed += 1
+            self.bytes += st.st_size
+            self.shared += shared
+        if self.phase:
+            self.phase.add(1, 0 if shared else st.st_size)
+        if self.on_done:
+            self.on_done(src, dest)
+
+    def close(self):
+        self.ex.shutdown(wait=True)
+
+    def throughput(self) -> float:
+        # MB/s since the placer was created
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        return self.bytes / elapsed / 1e6
+
+class GroupTracker:
+    """
+    Hands each Flickr ID to on_group({pid: [dest paths]}) as soon as every
+    source file with that ID has been placed, resumed or dropped, so a later
+    stage can start on it while other files are still being copied. Files are
+    counted with add() as they are listed; done() is called from the placer
+    threads. Only a count per ID and the destinations of unfinished IDs are
+    kept.
+    """
+
+    def __init__(self, on_group):
+        self.on_group = on_group
+        self.left = Counter()
+        self.dests = {}
+        self.lock = threading.Lock()
+
+    def add(self, entry):
+        if entry.pid:
+            with self.lock:
+                self.left[entry.pid] += 1
+
+    def done(self, src, dest=None):
+        pid = pid_from_name(src.name)
+        if not pid:
+            return
+        with self.lock:
+            if dest is not None:
+                self.dests.setdefault(pid, []).append(Path(dest))
+            self.left[pid] -= 1
+            if self.left[pid] > 0:
+                return
+            del self.left[pid]
+            paths = self.dests.pop(pid, None)
+        if paths:
+            self.on_group({pid: paths})
+
+    def flush(self):
+        # IDs with files exiftool never reported on.
+        with self.lock:
+            rest, self.dests = self.dests, {}
+            self.left.clear()
+        if rest:
+            self.on_group(rest)
+
+def build_parser():
     ap = argparse.ArgumentParser()
     ap.add_argument("--downloads", required=True)
     ap.add_argument("--out", required=True)
-    ap.add_argument("--mode", choices=["copy","move"], default="copy")
-    args = ap.parse_args()
+    ap.add_argument("--mode", choices=MODES, default="copy",
+                    help="copy (default), move, hardlink, or reflink (copy-on-write clone on Linux btrfs/XFS). "
+                         "hardlink/reflink fall back to a copy where the filesystem can't share data.")
+    ap.add_argument("--manifest", default="exif_manifest.csv",
+                    help="Where to write the exiftool scan manifest (default: ./exif_manifest.csv)")
+    ap.add_argument("--json", nargs="+", default=None,
+                    help="JSON folders; files without date tags are placed by the JSON date_taken instead of skipped")
+    ap.add_argument("--index", default=None, help="Sidecar index file (default: shared file in ~/.cache)")
+    ap.add_argument("--json-workers", type=int, default=DEFAULT_JSON_WORKERS)
+    ap.add_argument("--copy-workers", type=int, default=4,
+                    help="Parallel copy/move threads (default: 4; helps on NAS/USB targets)")
+    ap.add_argument("--journal", default=None, help="Record placed files in this JSONL journal")
+    ap.add_argument("--resume", action="store_true",
+                    help="Skip sources the journal shows as already placed (unchanged, destination present)")
+    ap.add_argument("--dedup", action="store_true",
+                    help="Organize only one copy of files with the same Flickr ID and identical content")
+    ap.add_argument("--stream", action="store_true",
+                    help="Bounded memory: list the source tree as it is scanned instead of holding an inventory")
+    ap.add_argument("--hash-workers", type=int, default=DEFAULT_HASH_WORKERS,
+                    help=f"Threads used to hash duplicate candidates (default: {DEFAULT_HASH_WORKERS})")
+    add_shard_args(ap)
+    add_metrics_args(ap)
+    return ap
 
+def run(args, ctx, on_group=None, stop=None):
+    """
+    on_group, if given, is called with {pid: [dest paths]} batches as Flickr IDs
+    finish (see GroupTracker); every placed or resumed file with an ID is
+    reported exactly once by the time run() returns. Setting stop (a
+    threading.Event) ends the run early: no further files are placed, and
+    run() returns once the copies in flight are finished.
+    """
     downloads = Path(args.downloads).expanduser()
     out_root  = Path(args.out).expanduser()
 
     out_root.mkdir(parents=True, exist_ok=True)
 
-    manifest = Path("exif_manifest.csv")
-    run_exiftool_csv(downloads, manifest)
+    manifest = Path(args.manifest).expanduser()
+    if args.shard:
+        manifest = args.shard.path(manifest)
+    manifest.parent.mkdir(parents=True, exist_ok=True)
 
-    copied = 0
     skipped = 0
+    resumed = 0
+    by_json = 0
+    archive = ctx.archive_manifest(out_root)
+    # Own connection: in rebuild_archive.py this runs on the organize thread.
+    sidecars = ctx.open_sidecar_index(args.json, args.index, args.json_workers) if args.json else None
+    # Also covers files still in flight on the placer threads.
+    dest_index = DestIndex()
+    journal = ctx.journal
+    if args.stream:
+        entries = iter_media(downloads)
+    else:
+        entries = ctx.media(downloads)
+    if args.shard:
+        # Before the scan: files of other shards are never read here.
+        entries = args.shard.entries(entries)
+        print(f"[INFO] Shard {args.shard}: only this shard's Flickr IDs are organized")
+    if args.dedup:
+        with ctx.metrics.phase("dedup", total=len(entries)) as ph:
+            entries, dropped = dedup_entries(entries, args.hash_workers)
+            ph.add(len(entries) + len(dropped))
+        print(f"[INFO] Duplicate copies skipped: {len(dropped):,} "
+              f"({sum(e.size for e, _ in dropped) / 1e6:,.1f} MB)")
+    tracker = GroupTracker(on_group) if on_group else None
+
+    def listed(entries):
+        for e in entries:
+            if tracker:
+                tracker.add(e)
+            yield e.path
+
+    total = len(entries) if isinstance(entries, list) else None
+    with ctx.metrics.phase("organize", total=total) as ph:
+        placer = Placer(args.mode, args.copy_workers, journal, tracker.done if tracker else None, ph, archive,
+                        stop)
+        try:
+            for row in stream_exiftool_scan(listed(entries), manifest):
+                if stop is not None and stop.is_set():
+                    break
+                d = row.get("Directory")
+                fn = row.get("FileName")
+                if not d or not fn:
+                    skipped += 1
+                    ph.add()
+                    continue
+
+                media = classify(fn)
+                if media is None:
+                    continue
+                kind, pid = media
+                src = Path(d) / fn
+
+                dt = pick_dt(row, kind)
+                ym = year_month(dt) if dt else None
+                source = "exif"
+                if not ym and sidecars and pid:
+                    rec = sidecars.lookup([pid]).get(pid)
+                    # date_taken is "YYYY-MM-DD HH:MM:SS"; year_month only reads the digits
+                    ym = year_month(rec["date_taken"]) if rec and rec["date_taken"] else None
+                    source = "json"
+                    by_json += bool(ym)
+                if not ym:
+                    skipped += 1
+                    archive.record_skipped(src, pid, kind, row.get("DateTimeOriginal", ""), row.get("CreateDate", ""))
+                    ph.add()
+                    if tracker:
+                        tracker.done(src)
+                    continue
+
+                meta = (pid, kind, row.get("DateTimeOriginal", ""), row.get("CreateDate", ""), source)
+                if args.resume:
+                    prev = journal.placed_dest(src, src.stat())
+                    if prev:
+                        archive.record_placed(src, prev, *meta, replace=False)
+                        resumed += 1
+                        ph.add()
+                        if tracker:
+                            tracker.done(src, prev)
+                        continue
+
+                y, m = ym
+                # Avoid overwriting: if filename collides, add _1, _2, ...
+                dest = dest_index.claim(out_root / y / m, src.name)
+
+                placer.submit(src, dest, meta)
+        finally:
+            placer.close()
+            if sidecars:
+                sidecars.close()
+    if stop is not None and stop.is_set():
+        print(f"[WARN] Organize stopped early after {placer.placed:,} files", file=sys.stderr)
+        return placer.placed
+    if tracker:
+        tracker.flush()
+    if args.mode == "move":
+        ctx.forget_media(downloads)
+    ctx.forget_media(out_root)
+
+    print(f"[DONE] {args.mode.upper()} complete. Files processed: {placer.placed:,}. Skipped (no date): {skipped:,}.")
+    print(f"[INFO] {placer.bytes / 1e6:,.1f} MB in {time.monotonic() - placer.started:,.1f}s "
+          f"({placer.throughput():,.1f} MB/s, {args.copy_workers} workers)")
+    if args.mode in ("hardlink", "reflink"):
+        print(f"[INFO] {args.mode}: {placer.shared:,} shared, {placer.placed - placer.shared:,} copied (fallback)")
+    if by_json:
+        print(f"[INFO] Placed by JSON date_taken (no date tags in the file): {by_json:,}")
+    if resumed:
+        print(f"[INFO] Already placed in a previous run (resumed): {resumed:,}")
+    if placer.failed:
+        print(f"[WARN] Failed: {placer.failed:,}", file=sys.stderr)
+    return placer.placed
 
-    with manifest.open("r", encoding="utf-8", newline="") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            d = row.get("Directory")
-            fn = row.get("FileName")
-            if not d or not fn:
-                skipped += 1
-                continue
-
-            src = Path(d) / fn
-            ext = src.suffix.lower()
-            if ext not in PHOTO_EXTS and ext not in VIDEO_EXTS:
-                continue
-
-            dt = pick_dt(row, ext)
-            if not dt:
-                skipped += 1
-                continue
-
-            ym = year_month(dt)
-            if not ym:
-                skipped += 1
-                continue
-
-            y, m = ym
-            dest_dir = out_root / y / m
-            dest_dir.mkdir(parents=True, exist_ok=True)
-
-            dest = dest_dir / src.name
-
-            # Avoid overwriting: if filename collides, add _1, _2, ...
-            if dest.exists():
-                stem = dest.stem
-                suf = dest.suffix
-                i = 1
-                while True:
-                    candidate = dest_dir / f"{stem}_{i}{suf}"
-                    if not candidate.exists():
-                        dest = candidate
-                        break
-                    i += 1
-
-            if args.mode == "move":
-                shutil.move(str(src), str(dest))
-            else:
-                shutil.copy2(str(src), str(dest))
-            copied += 1
-
-    print(f"[DONE] {args.mode.upper()} complete. Files processed: {copied:,}. Skipped (no date): {skipped:,}.")
+def main(argv=None):
+    ap = build_parser()
+    args = ap.parse_args(argv)
+    if args.resume and not args.journal:
+        ap.error("--resume requires --journal")
+    if args.stream and args.dedup:
+        ap.error("--dedup needs the whole source inventory and cannot be combined with --stream")
+    with RunContext.from_args(args) as ctx:
+        run(args, ctx)
 
 if __name__ == "__main__":
     main()
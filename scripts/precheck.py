@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Skip-if-already-correct pre-check for the write steps.
+
+Before writing, the tags a job would set are read back for the whole worklist
+in batched `exiftool -j` calls (run on the shared worker pool), and files whose
+current values already match are dropped. Rewriting a file costs a full copy
+plus a backup, so this makes a second run over the same archive nearly free.
+
+Works on the exiftool argument lists the scripts already build: every
+"-TAG=VALUE" must match the current value and every "-TAG+=VALUE" must be
+present in the current list. Unqualified tags (e.g. -CreateDate) are compared
+against whichever group exiftool reports for that name.
+
+EXIF stores GPS coordinates unsigned, with the hemisphere in GPSLatitudeRef /
+GPSLongitudeRef; those are read along with the coordinates, and a southern
+or western EXIF value is compared with its sign applied.
+"""
+
+import json
+
+READ_BATCH = 500
+# Hemisphere tag of a coordinate, and the value that makes it negative.
+GPS_REFS = {"GPSLatitude": ("GPSLatitudeRef", "S"), "GPSLongitude": ("GPSLongitudeRef", "W")}
+# Read along with a requested tag.
+RELATED_TAGS = {tag: {ref} for tag, (ref, _) in GPS_REFS.items()}
+
+def parse_tag_args(args):
+    # -> [(tag, op, value)] for "-TAG=VALUE" / "-TAG+=VALUE" arguments
+    out = []
+    for a in args:
+        if not a.startswith("-") or "=" not in a:
+            continue
+        tag, val = a[1:].split("=", 1)
+        op = "="
+        if tag.endswith("+"):
+            tag, op = tag[:-1], "+="
+        out.append((tag, op, val))
+    return out
+
+def _same(cur, want):
+    if str(cur) == want:
+        return True
+    try:
+        return abs(float(cur) - float(want)) < 1e-6
+    except (TypeError, ValueError):
+        return False
+
+def _values(cur, tag):
+    if ":" in tag:
+        v = cur.get(tag)
+        return [] if v is None else [v]
+    return [v for k, v in cur.items() if k.split(":", 1)[-1] == tag]
+
+def _signed_gps(cur):
+    # -> cur with unsigned coordinates signed by their Ref tag (-n prints "S"/"W")
+    out = dict(cur)
+    for key, v in cur.items():
+        group, _, name = key.rpartition(":")
+        if name not in GPS_REFS:
+            continue
+        ref, negative = GPS_REFS[name]
+        if str(cur.get(f"{group}:{ref}" if group else ref, "")).upper().startswith(negative):
+            try:
+                out[key] = -abs(float(v))
+            except (TypeError, ValueError):
+                pass
+    return out
+
+def is_current(cur, tag_args):
+    if not cur:
+        return False
+    cur = _signed_gps(cur)
+    for tag, op, want in tag_args:
+        values = _values(cur, tag)
+        if not values:
+            return False
+        for v in values:
+            if op == "+=":
+                items = v if isinstance(v, list) else [v]
+                if not any(_same(x, want) for x in items):
+                    return False
+            elif not _same(v, want):
+                return False
+    return True
+
+def read_current(pool, paths, tags):
+    """{path: {"Group:Tag": value}} for paths, via batched exiftool -j reads."""
+    opts = ["-j", "-n", "-G0"] + [f"-{t}" for t in sorted(tags)]
+    batches = [paths[i:i + READ_BATCH] for i in range(0, len(paths), READ_BATCH)]
+    current = {}
+    for batch, res in pool.map(batches, lambda b: opts + b):
+        # Unreadable files are just missing from the output; they stay on the worklist.
+        if not res.stdout.strip():
+            continue
+        try:
+            rows = json.loads(res.stdout)
+        except ValueError:
+            continue
+        for row in rows:
+            current[row.pop("SourceFile", "")] = row
+    return current
+
+def drop_current(pool, items, build_args):
+    """
+    Split a worklist into (items that still need a write, number already correct).
+    build_args(item) is the same builder passed to pool.map(); the file path is
+    its last argument.
+    """
+    jobs = []
+    for item in items:
+        args = build_args(item)
+        if args:
+            jobs.append((item, args[-1], parse_tag_args(args)))
+    tags = {tag for _, _, tag_args in jobs for tag, _, _ in tag_args}
+    if not jobs or not tags:
+        return list(items), 0
+    related = {r for tag in tags for r in RELATED_TAGS.get(tag, ())}
+    current = read_current(pool, [path for _, path, _ in jobs], tags | related)
+    keep = [item for item, path, tag_args in jobs if not is_current(current.get(path), tag_args)]
+    return keep, len(jobs) - len(keep)
+
+class SkipCurrent:
+    """
+    Streaming drop_current(): iterates the items that still need a write,
+    checking READ_BATCH items at a time so a lazily produced worklist (e.g. the
+    groups handed over while organize is still copying) is never materialized.
+    .skipped counts the items found already correct so far; on_skip(n), if
+    set, is called with each batch's count (progress reporting).
+    """
+    def __init__(self, pool, items, build_args):
+        self.pool = pool
+        self.items = items
+        self.build_args = build_args
+        self.skipped = 0
+        self.on_skip = None
+
+    def _check(self, batch):
+        keep, correct = drop_current(self.pool, batch, self.build_args)
+        self.skipped += correct
+        if correct and self.on_skip:
+            self.on_skip(correct)
+        return keep
+
+    def __iter__(self):
+        batch = []
+        for item in self.items:
+            batch.append(item)
+            if len(batch) >= READ_BATCH:
+                yield from self._check(batch)
+                batch = []
+        if batch:
+            yield from self._check(batch)
@@ -4,9 +4,31 @@ Unified entrypoint for flickr-archive-rebuilder (safe-by-default).
 
 SAFE DEFAULTS:
 - Does NOT modify the original Flickr downloads.
-- First organizes into --out (YYYY/MM) using --mode (default: copy).
+- First organizes into --out (YYYY/MM) using --mode (default: copy;
+  hardlink/reflink share data with the download until a file is rewritten).
 - Then fixes photo/video dates on the --out folder.
-- Optional metadata embedding also runs on --out.
+- Every step records completed files in <out>/.rebuild_journal.jsonl, so an
+  interrupted run can be continued with --resume (only new/changed files and
+  missing steps are processed again).
+- The steps run in this process and share one run context: one exiftool
+  worker pool, one journal, one sidecar index read and one walk per folder.
+- Date fixing and the optional metadata embedding both go through
+  fix_and_embed.py, so each file is rewritten once. It starts on a Flickr ID
+  as soon as organize has placed all of that ID's files, while the rest are
+  still being copied (--no-overlap runs the steps one after another).
+- Organize records each file's Flickr ID, destination and current date tags
+  in <out>/.archive_manifest.sqlite (files without date tags are placed by
+  the JSON date_taken); the write step takes its file list from it and does
+  not rewrite dates that are already correct.
+- --xmp-sidecar puts the --embed metadata into .xmp files next to the media
+  instead of rewriting the media files (see xmp_sidecar.py).
+- --shard K/N splits the rebuild across machines by Flickr ID: each runs the
+  same command with its own K, then scripts/shards.py checks and merges the
+  per-shard journals, manifests and metrics (see shards.py).
+- --backup picks what is kept of each file before it is written: exiftool's
+  FILE_original (default), nothing, a reflink clone, or only the old tag
+  values in the journal; --fsync syncs the writes once per folder (see
+  backups.py, restore_backups.py).
 
 Why: avoids polluting the original export with *_original backups and prevents
 cloud-sync conflicts.
@@ -20,10 +42,22 @@ python3 scripts/rebuild_archive.py \
 """
 
 import argparse
-import subprocess
+import queue
 import sys
+import threading
 from pathlib import Path
 
+import fix_and_embed
+import organize_by_year_month as organize
+from backups import add_backup_args
+from exiftool_pool import DEFAULT_RETRIES, DEFAULT_TIMEOUT, DEFAULT_WORKERS
+from failed_items import FAILED_NAME
+from metrics import add_metrics_args
+from run_context import RunContext
+from run_journal import JOURNAL_NAME
+from shards import METRICS_NAME, add_shard_args
+from video_tz import add_tz_args, check_tz_args
+
 def die(msg: str, code: int = 2):
     print(msg, file=sys.stderr)
     sys.exit(code)
@@ -44,70 +78,179 @@ def validate_paths(downloads: str, json_dirs: list[str], out: str):
     outp = Path(out).expanduser()
     outp.parent.mkdir(parents=True, exist_ok=True)
 
-def run(cmd: list[str]):
-    print(f"\n[RUN] {' '.join(cmd)}\n")
-    res = subprocess.run(cmd)
-    if res.returncode != 0:
-        die("[ERROR] Step failed. Aborting.", res.returncode)
+def parse_step(module, argv: list[str]):
+    print(f"\n[RUN] {module.__name__} {' '.join(argv)}\n")
+    return module.build_parser().parse_args(argv)
+
+def queued(q):
+    while True:
+        item = q.get()
+        if item is None:
+            return
+        yield item
 
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--downloads", required=True, help="Root of Flickr media export (data-download-* folders)")
     ap.add_argument("--json", required=True, nargs="+", help="One or more Flickr JSON folders (part1, part2, ...)")
     ap.add_argument("--out", required=True, help="Output folder (YYYY/MM structure)")
-    ap.add_argument("--mode", choices=["copy", "move"], default="copy", help="Organize mode (default: copy)")
+    ap.add_argument("--mode", choices=organize.MODES, default="copy",
+                    help="Organize mode: copy (default), move, hardlink or reflink (zero-copy where supported)")
     ap.add_argument("--embed", action="store_true", help="Also embed title/description/tags/geo if present in JSON")
     ap.add_argument("--overwrite-original", action="store_true", help="Avoid *_original backups when writing metadata")
     ap.add_argument("--skip-organize", action="store_true")
     ap.add_argument("--skip-fix", action="store_true", help="Skip both photo+video fix steps")
     ap.add_argument("--skip-embed", action="store_true")
+    ap.add_argument("--resume", action="store_true",
+                    help="Continue an interrupted run: skip work recorded in the journal in --out")
+    ap.add_argument("--skip-correct", action="store_true",
+                    help="Skip files whose date/metadata tags already match the JSON (fast reruns)")
+    ap.add_argument("--workers", type=int, default=0,
+                    help=f"Persistent exiftool processes shared by the write steps (default: {DEFAULT_WORKERS})")
+    ap.add_argument("--batch-size", type=int, default=0,
+                    help="Files per exiftool round trip in the write step (default: fix_and_embed default)")
+    ap.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT,
+                    help=f"Seconds per file before a stuck exiftool is restarted (default: {DEFAULT_TIMEOUT})")
+    ap.add_argument("--retries", type=int, default=DEFAULT_RETRIES,
+                    help=f"Retries with backoff for crashed/timed-out exiftool jobs (default: {DEFAULT_RETRIES})")
+    ap.add_argument("--native-dates", action="store_true",
+                    help="Patch dates of JPEG/MP4/MOV files in place where possible (see fix_and_embed.py)")
+    ap.add_argument("--xmp-sidecar", action="store_true",
+                    help="With --embed: write metadata to .xmp sidecar files instead of into the media files")
+    ap.add_argument("--copy-workers", type=int, default=0,
+                    help="Parallel copy/move threads for the organize step (default: organize default)")
+    ap.add_argument("--json-workers", type=int, default=0,
+                    help="Processes used to parse JSON sidecars (default: per-script default)")
+    ap.add_argument("--dedup", action="store_true",
+                    help="Organize (and fix) only one copy of identical files with the same Flickr ID")
+    ap.add_argument("--stream", action="store_true",
+                    help="Bounded-memory mode for very large archives (per-directory processing)")
+    ap.add_argument("--no-overlap", action="store_true",
+                    help="Finish organizing before fixing/embedding instead of overlapping the two")
+    add_tz_args(ap)
+    add_backup_args(ap)
+    add_shard_args(ap)
+    add_metrics_args(ap)
     args = ap.parse_args()
 
+    if args.stream and args.dedup:
+        die("[ERROR] --dedup needs the whole source inventory and cannot be combined with --stream")
+    check_tz_args(ap, args)
     validate_paths(args.downloads, args.json, args.out)
 
-    base = Path(__file__).parent
+    out = Path(args.out).expanduser()
+    journal = out / JOURNAL_NAME
+    failed_file = out / FAILED_NAME
+    metrics_json = args.metrics_json
+    shard_opts = []
+    if args.shard:
+        # Everything next to the output is per shard; shards.py merges it afterwards.
+        journal = args.shard.path(journal)
+        failed_file = args.shard.path(failed_file)
+        metrics_json = str(args.shard.path(Path(metrics_json).expanduser() if metrics_json else out / METRICS_NAME))
+        shard_opts = ["--shard", str(args.shard)]
+    journal_opts = ["--journal", str(journal)]
+    if args.resume:
+        journal_opts.append("--resume")
+
+    do_organize = not args.skip_organize
+    do_fix = not args.skip_fix
+    do_embed = args.embed and not args.skip_embed
+    do_write = do_fix or do_embed
 
     # 1) Organize into YYYY/MM (copy/move)
-    if not args.skip_organize:
-        run([
-            "python3", str(base / "organize_by_year_month.py"),
-            "--downloads", args.downloads,
-            "--out", args.out,
-            "--mode", args.mode
-        ])
-
-    # 2) Fix photo + video dates ON THE OUTPUT folder (safe)
-    if not args.skip_fix:
-        photo_cmd = [
-            "python3", str(base / "fix_photo_dates.py"),
-            "--downloads", args.out,
-            "--json", *args.json,
-        ]
-        if args.overwrite_original:
-            photo_cmd.append("--overwrite-original")
-        run(photo_cmd)
-
-        video_cmd = [
-            "python3", str(base / "fix_video_dates.py"),
-            "--downloads", args.out,
-            "--json", *args.json,
-        ]
-        if args.overwrite_original:
-            video_cmd.append("--overwrite-original")
-        run(video_cmd)
-
-    # 3) Optional: embed additional metadata ON THE OUTPUT folder
-    if args.embed and not args.skip_embed:
-        cmd = [
-            "python3", str(base / "embed_metadata.py"),
-            "--media-root", args.out,
-            "--json", *args.json,
-            "--title", "--description", "--tags", "--geo",
-        ]
+    organize_args = None
+    if do_organize:
+        argv = ["--downloads", args.downloads, "--out", args.out, "--mode", args.mode, "--json", *args.json]
+        if args.copy_workers:
+            argv += ["--copy-workers", str(args.copy_workers)]
+        if args.json_workers:
+            argv += ["--json-workers", str(args.json_workers)]
+        if args.dedup:
+            argv.append("--dedup")
+        if args.stream:
+            argv.append("--stream")
+        organize_args = parse_step(organize, argv + journal_opts + shard_opts)
+
+    # 2+3) Fix photo/video dates and embed metadata ON THE OUTPUT folder, one write per file
+    write_args = None
+    if do_write:
+        argv = ["--media-root", args.out, "--json", *args.json] + journal_opts
+        if do_organize:
+            argv.append("--from-manifest")
+        if not do_fix:
+            argv.append("--no-fix")
+        if do_embed:
+            argv += ["--title", "--description", "--tags", "--geo"]
         if args.overwrite_original:
-            cmd.append("--overwrite-original")
-        run(cmd)
+            argv.append("--overwrite-original")
+        if args.backup:
+            argv += ["--backup", args.backup]
+        if args.fsync:
+            argv.append("--fsync")
+        if args.skip_correct:
+            argv.append("--skip-correct")
+        if args.json_workers:
+            argv += ["--json-workers", str(args.json_workers)]
+        argv += ["--timeout", str(args.timeout), "--retries", str(args.retries)]
+        if args.native_dates:
+            argv.append("--native-dates")
+        if args.xmp_sidecar:
+            argv.append("--xmp-sidecar")
+        if args.tz:
+            argv += ["--tz", args.tz]
+        if args.tz_polygons:
+            argv += ["--tz-polygons", args.tz_polygons]
+        if args.batch_size:
+            argv += ["--batch-size", str(args.batch_size)]
+        if args.stream:
+            argv.append("--stream")
+        write_args = parse_step(fix_and_embed, argv + shard_opts)
+
+    # One context for every step, so the timing summary / --metrics-json covers the whole rebuild.
+    # Files that still fail go to <out>/failed_items.jsonl (fix_and_embed.py --retry-failed).
+    with RunContext(args.workers or DEFAULT_WORKERS, str(journal), args.progress, metrics_json,
+                    str(failed_file), shard=args.shard) as ctx:
+        if organize_args and write_args and not args.no_overlap:
+            # Both steps read the sidecar index; bring it up to date once, before they run side by side.
+            ctx.refresh_sidecar_index(organize_args.json, organize_args.index, organize_args.json_workers)
+            groups = queue.Queue()
+            failed = []
+            stop = threading.Event()
+
+            def organize_step():
+                try:
+                    organize.run(organize_args, ctx, groups.put, stop)
+                except BaseException as e:
+                    failed.append(e)
+                finally:
+                    groups.put(None)
+
+            t = threading.Thread(target=organize_step, name="organize", daemon=True)
+            t.start()
+            try:
+                fix_and_embed.run(write_args, ctx, queued(groups))
+            except BaseException:
+                # Stop placing files and wait for the copies in flight before
+                # the context (pool, journal, manifest) is closed under them.
+                stop.set()
+                t.join()
+                if failed:
+                    print(f"[ERROR] Organize step failed: {failed[0]!r}", file=sys.stderr)
+                raise
+            t.join()
+            if failed:
+                die(f"[ERROR] Organize step failed: {failed[0]!r}. Aborting.")
+        else:
+            if organize_args:
+                organize.run(organize_args, ctx)
+            if write_args:
+                fix_and_embed.run(write_args, ctx)
 
+    if args.shard:
+        print(f"\n[SUCCESS] Shard {args.shard} complete. Once all {args.shard.n} shards are done, run:\n"
+              f"  python3 scripts/shards.py --out \"{args.out}\" --shards {args.shard.n} --downloads \"{args.downloads}\"\n")
+        return
     print("\n[SUCCESS] Archive rebuild complete.\n")
 
 if __name__ == "__main__":
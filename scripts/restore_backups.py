@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Undo metadata writes from the backups kept by --backup (see backups.py).
+
+  exiftool / reflink  every FILE_original under --root is renamed back over
+                      FILE (what `exiftool -restore_original` does)
+  journal             the tag values saved in the run journal (--journal) are
+                      written back with exiftool; tags that were not set
+                      before the run are deleted again
+
+Both can be given in one call: files restored from a FILE_original are left
+out of the journal replay. If a file was written more than once, the values
+saved before its first write win. The restored files are no longer what the
+journal recorded, so a later --resume run writes them again.
+
+python3 scripts/restore_backups.py --root "/path/to/Flickr Organized" \\
+  --journal "/path/to/Flickr Organized/.rebuild_journal.jsonl"
+"""
+
+import argparse, json, os, sys
+from pathlib import Path
+
+from backups import BACKUP_SUFFIX
+from exiftool_pool import DEFAULT_WORKERS
+from file_copy import copy_into_place, reflink
+from media_names import media_kind
+from run_context import RunContext
+
+def find_backups(root):
+    """[(backup, file)] for every media FILE_original under root."""
+    out = []
+    for d, _, files in os.walk(root):
+        for name in files:
+            if name.endswith(BACKUP_SUFFIX) and media_kind(name[:-len(BACKUP_SUFFIX)]):
+                out.append((os.path.join(d, name), os.path.join(d, name[:-len(BACKUP_SUFFIX)])))
+    out.sort()
+    return out
+
+def load_saved_tags(journal_path):
+    """{path: {tag: value}} from the journal's "backup" lines, first value per tag."""
+    saved = {}
+    with open(journal_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                e = json.loads(line)
+                if e["event"] != "backup":
+                    continue
+                values = saved.setdefault(e["path"], {})
+                for tag, value in e["values"].items():
+                    values.setdefault(tag, value)
+            except (ValueError, KeyError, AttributeError):
+                continue  # torn or foreign line
+    return saved
+
+def restore_args(path, values):
+    # -n: the values were read with -n (precheck.read_current)
+    args = ["-overwrite_original", "-n"]
+    for tag, value in sorted(values.items()):
+        if value is None:
+            args.append(f"-{tag}=")
+        elif isinstance(value, list):
+            args += [f"-{tag}={v}" for v in value] or [f"-{tag}="]
+        else:
+            args.append(f"-{tag}={value}")
+    return args + [path]
+
+def build_parser():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--root", default=None, help="Folder to restore FILE_original backups in (exiftool/reflink)")
+    ap.add_argument("--journal", default=None, help="Run journal with saved tag values (--backup journal)")
+    ap.add_argument("--keep-backups", action="store_true",
+                    help="Copy FILE_original back instead of renaming it, so the backup stays")
+    ap.add_argument("--dry-run", action="store_true")
+    ap.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    return ap
+
+def run(args, ctx):
+    restored = set()
+    failed = 0
+    if args.root:
+        pairs = find_backups(Path(args.root).expanduser())
+        print(f"[INFO] {BACKUP_SUFFIX} backups found: {len(pairs):,}")
+        for bak, path in pairs:
+            if args.dry_run:
+                print(f"[DRY] {bak} -> {path}")
+            else:
+                try:
+                    if args.keep_backups:
+                        # never written over the live file in place: a .part and a rename
+                        copy_into_place(Path(bak), Path(path), reflink)
+                    else:
+                        os.replace(bak, path)
+                except OSError as e:
+                    print(f"[ERROR] Restoring {path} failed: {e}", file=sys.stderr)
+                    failed += 1
+                    continue
+            restored.add(path)
+
+    replayed = 0
+    if args.journal:
+        saved = load_saved_tags(Path(args.journal).expanduser())
+        work = [(p, v) for p, v in sorted(saved.items()) if p not in restored]
+        skipped = len(saved) - len(work)
+        gone = [p for p, _ in work if not os.path.exists(p)]
+        work = [(p, v) for p, v in work if os.path.exists(p)]
+        print(f"[INFO] Files with saved tag values: {len(saved):,} | restored from {BACKUP_SUFFIX}: {skipped:,} "
+              f"| no longer there: {len(gone):,}")
+        if args.dry_run:
+            for p, values in work:
+                print(f"[DRY] {p}  ({len(values)} tags)")
+        else:
+            for (p, _), res in ctx.pool().map(work, lambda w: restore_args(*w)):
+                if res.returncode != 0:
+                    print(f"[ERROR] exiftool failed for {p}\n{res.stderr}", file=sys.stderr)
+                    failed += 1
+                    continue
+                replayed += 1
+
+    if args.dry_run:
+        print("[DONE] Dry run complete.")
+        return 0
+    print(f"[DONE] Restored: {len(restored):,} from {BACKUP_SUFFIX} | {replayed:,} from saved tag values")
+    if failed:
+        print(f"[WARN] Failed: {failed:,}", file=sys.stderr)
+    return len(restored) + replayed
+
+def main(argv=None):
+    ap = build_parser()
+    args = ap.parse_args(argv)
+    if not (args.root or args.journal):
+        ap.error("give --root (FILE_original backups), --journal (saved tag values) or both")
+    if args.journal and not Path(args.journal).expanduser().exists():
+        ap.error(f"--journal: {args.journal} does not exist")
+    # The journal is only read here; RunContext must not open it for appending.
+    with RunContext(args.workers) as ctx:
+        run(args, ctx)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+State shared between pipeline stages.
+
+When rebuild_archive.py runs the stages in-process they share one
+RunContext: a single exiftool worker pool, the run journal, the parsed
+sidecar records and the media inventories are created once and handed from
+stage to stage instead of being rebuilt by every script. Each script's main()
+makes a private context from its own arguments, so the scripts still work
+standalone.
+"""
+
+import os, threading
+from pathlib import Path
+
+from archive_manifest import open_manifest
+from exiftool_pool import DEFAULT_WORKERS, ExiftoolPool
+from failed_items import FailedItems
+from media_inventory import media_entries
+from metrics import Metrics
+from run_journal import open_journal
+from sidecar_index import DEFAULT_JSON_WORKERS, load_records, open_index
+from video_tz import VideoTimes
+
+class RunContext:
+    def __init__(self, workers=DEFAULT_WORKERS, journal=None, progress=False, metrics_json=None,
+                 failed_file=None, retry_failed=None, shard=None):
+        self.workers = workers
+        self.shard = shard
+        self.journal = open_journal(journal)
+        self.failed = FailedItems(failed_file, retry_failed) if failed_file else None
+        self.metrics = Metrics(progress)
+        self.metrics_json = metrics_json
+        self._pool = None
+        self._lock = threading.Lock()
+        self._records = {}
+        self._indexes = {}
+        self._refreshed = set()
+        self._refresh_lock = threading.Lock()
+        self._media = {}
+        self._video_times = {}
+        self._manifests = {}
+
+    @classmethod
+    def from_args(cls, args):
+        return cls(getattr(args, "workers", DEFAULT_WORKERS), getattr(args, "journal", None),
+                   getattr(args, "progress", False), getattr(args, "metrics_json", None),
+                   getattr(args, "failed_file", None), getattr(args, "retry_failed", None),
+                   getattr(args, "shard", None))
+
+    def pool(self):
+        # Started on first use so dry runs never spawn exiftool.
+        with self._lock:
+            if self._pool is None:
+                self._pool = ExiftoolPool(self.workers, metrics=self.metrics)
+            return self._pool
+
+    def refresh_sidecar_index(self, json_dirs, index_path=None, json_workers=DEFAULT_JSON_WORKERS):
+        # Re-parse changed JSON folders once per run, whichever step (or thread) asks first;
+        # the others wait here instead of parsing the same files in parallel.
+        key = (tuple(str(Path(d).expanduser().resolve()) for d in json_dirs), index_path)
+        with self._refresh_lock:
+            if key not in self._refreshed:
+                with self.metrics.phase("load_json"):
+                    open_index(json_dirs, index_path, json_workers).close()
+                self._refreshed.add(key)
+
+    def sidecar_records(self, json_dirs, index_path=None, json_workers=DEFAULT_JSON_WORKERS):
+        key = tuple(str(Path(d).expanduser().resolve()) for d in json_dirs)
+        if key not in self._records:
+            self.refresh_sidecar_index(json_dirs, index_path, json_workers)
+            with self.metrics.phase("load_json") as ph:
+                self._records[key] = load_records(json_dirs, index_path, json_workers, refresh=False)
+                ph.add(len(self._records[key]))
+        return self._records[key]
+
+    def sidecar_index(self, json_dirs, index_path=None, json_workers=DEFAULT_JSON_WORKERS):
+        # Open index for per-chunk lookups (streaming mode) instead of loading every record.
+        key = tuple(str(Path(d).expanduser().resolve()) for d in json_dirs)
+        if key not in self._indexes:
+            self._indexes[key] = self.open_sidecar_index(json_dirs, index_path, json_workers)
+        return self._indexes[key]
+
+    def open_sidecar_index(self, json_dirs, index_path=None, json_workers=DEFAULT_JSON_WORKERS):
+        """A new read connection (the caller closes it) to the index, refreshed once per run."""
+        self.refresh_sidecar_index(json_dirs, index_path, json_workers)
+        return open_index(json_dirs, index_path, json_workers, refresh=False)
+
+    def archive_manifest(self, out_root):
+        # Written by the organize step, read (and updated) by the write step; one per --shard.
+        key = os.path.realpath(Path(out_root).expanduser())
+        with self._lock:
+            if key not in self._manifests:
+                self._manifests[key] = open_manifest(out_root, self.shard)
+            return self._manifests[key]
+
+    def video_times(self, default_tz=None, polygons=None):
+        # None when no time zone was given: video dates are then written as-is.
+        if not (default_tz or polygons):
+            return None
+        key = (default_tz, polygons)
+        if key not in self._video_times:
+            self._video_times[key] = VideoTimes(default_tz, polygons)
+        return self._video_times[key]
+
+    def media(self, root, inventory=None):
+        key = os.path.realpath(Path(root).expanduser())
+        if key not in self._media:
+            with self.metrics.phase("walk") as ph:
+                self._media[key] = media_entries(root, inventory)
+                ph.add(len(self._media[key]))
+        return self._media[key]
+
+    def forget_media(self, root):
+        # Call after a stage adds/removes files under root.
+        self._media.pop(os.path.realpath(Path(root).expanduser()), None)
+
+    def close(self):
+        for times in self._video_times.values():
+            print(times.summary())
+            times.close()
+        self._video_times.clear()
+        self.metrics.report()
+        if self.metrics_json:
+            self.metrics.write_json(self.metrics_json)
+        for idx in self._indexes.values():
+            idx.close()
+        self._indexes.clear()
+        for m in self._manifests.values():
+            m.close()
+        self._manifests.clear()
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
+        if self.journal:
+            self.journal.close()
+            self.journal = None
+        if self.failed:
+            self.failed.close()
+            self.failed = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Per-file state journal for resumable rebuilds.
+
+An append-only JSONL file (by default .rebuild_journal.jsonl in the --out
+folder) with one line per completed action:
+
+  {"event": "placed", "src": ..., "size": ..., "mtime_ns": ..., "dest": ...}
+  {"event": "step", "path": ..., "step": "fix_dates", "size": ..., "mtime_ns": ...}
+  {"event": "backup", "path": ..., "tags": [...], "values": {"Group:Tag": value or null}}
+
+"placed" is written by the organize step after a copy/move, "step" by the
+fix/embed steps after a successful write, with the file's size/mtime *after*
+the write. On --resume a source is skipped if it was placed with the same
+size/mtime and the destination still exists, and a step is skipped for an
+output file if it is recorded and the file has not changed since the last
+journaled write. Anything new or changed is processed again.
+
+"backup" (--backup journal, see backups.py) holds the values the requested
+tags had before a write, null for tags that were not set;
+restore_backups.py writes them back.
+
+Lines are appended and flushed one at a time, so an interrupted run loses at
+most the line being written; a torn last line is ignored on load.
+"""
+
+import json, os, sys, threading
+from pathlib import Path
+
+JOURNAL_NAME = ".rebuild_journal.jsonl"
+
+def stat_key(st):
+    return st.st_size, st.st_mtime_ns
+
+class RunJournal:
+    def __init__(self, path):
+        self.path = Path(path).expanduser()
+        self.placed = {}   # src -> (size, mtime_ns, dest)
+        self.files = {}    # output path -> [(size, mtime_ns), set(steps)]
+        self.backups = {}  # output path -> set(tags whose old values are saved)
+        self.lock = threading.Lock()
+        if self.path.exists():
+            self._load()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.f = self.path.open("a", encoding="utf-8")
+        if self._torn():
+            # end the torn line, or the next record would be glued onto it
+            self.f.write("\n")
+            self.f.flush()
+
+    def _load(self):
+        bad = 0
+        with self.path.open("r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    self._apply(json.loads(line))
+                except (ValueError, KeyError):
+                    bad += 1
+        if bad:
+            print(f"[WARN] Ignored {bad} unreadable journal line(s) in {self.path}", file=sys.stderr)
+
+    def _torn(self):
+        with self.path.open("rb") as f:
+            if f.seek(0, os.SEEK_END) == 0:
+                return False
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) != b"\n"
+
+    def _apply(self, e):
+        ev = e["event"]
+        if ev == "placed":
+            self.placed[e["src"]] = (e["size"], e["mtime_ns"], e["dest"])
+            self.files[e["dest"]] = [(e["dest_size"], e["dest_mtime_ns"]), set()]
+        elif ev == "step":
+            state = self.files.setdefault(e["path"], [None, set()])
+            state[0] = (e["size"], e["mtime_ns"])
+            state[1].add(e["step"])
+        elif ev == "backup":
+            self.backups.setdefault(e["path"], set()).update(e["tags"])
+
+    def _write(self, e):
+        with self.lock:
+            self._apply(e)
+            self.f.write(json.dumps(e, ensure_ascii=False) + "\n")
+            self.f.flush()
+
+    def record_placed(self, src, src_st, dest):
+        dst = os.stat(dest)
+        size, mtime_ns = stat_key(src_st)
+        dsize, dmtime_ns = stat_key(dst)
+        self._write({"event": "placed", "src": str(src), "size": size, "mtime_ns": mtime_ns,
+                     "dest": str(dest), "dest_size": dsize, "dest_mtime_ns": dmtime_ns})
+
+    def record_step(self, path, step):
+        size, mtime_ns = stat_key(os.stat(path))
+        self._write({"event": "step", "path": str(path), "step": step, "size": size, "mtime_ns": mtime_ns})
+
+    def record_backup(self, path, tags, values):
+        self._write({"event": "backup", "path": str(path), "tags": list(tags), "values": values})
+
+    def backed_up(self, path):
+        """Tags of path whose pre-write values are already in the journal."""
+        return self.backups.get(str(path), set())
+
+    def placed_dest(self, src, src_st):
+        """Destination of an unchanged, already placed source, if it still exists."""
+        rec = self.placed.get(str(src))
+        if not rec or (rec[0], rec[1]) != stat_key(src_st):
+            return None
+        return rec[2] if os.path.exists(rec[2]) else None
+
+    def step_done(self, path, step):
+        state = self.files.get(str(path))
+        if not state or step not in state[1]:
+            return False
+        try:
+            return stat_key(os.stat(path)) == state[0]
+        except FileNotFoundError:
+            return False
+
+    def close(self):
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def open_journal(path):
+    return RunJournal(path) if path else None
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Sharded rebuilds across machines (--shard K/N) and the merge afterwards.
+
+rebuild_archive.py --shard K/N runs the whole pipeline on shard K of N
+(1-based): the organize scan, the copies and the fix/embed worklist only see
+the files shard K owns. All shards write into the same --out folder, at the
+same time, from different machines.
+
+A file belongs to the shard given by a stable hash (CRC-32) of its Flickr ID,
+so all copies of an ID, and the date/metadata write that picks between them,
+stay on one machine. Files without an ID are hashed by their name with any
+trailing _N stripped. The organize step only renames a file (NAME_1.jpg,
+NAME_2.jpg, ...) when another file of the same name goes to the same YYYY/MM
+folder, and files with the same name always land on the same shard. Each
+shard therefore picks exactly the names a single-machine run would, and no
+two shards ever claim the same destination.
+
+Everything a run writes next to the output becomes per shard, with
+.shardK-of-N in the name: the journal, the organize manifest, the
+failed-items file, the exif_manifest.csv scan and the metrics JSON
+(<out>/rebuild_metrics.shardK-of-N.json unless --metrics-json is given).
+Once every shard has finished, merge them:
+
+python3 scripts/shards.py --out "/path/to/Flickr Organized" --shards 4 --downloads "/path/to/Flickr Downloads"
+
+The merge checks that each of the N shards has run, that no source was
+placed twice or by the wrong shard (e.g. a different N), that no destination
+was used twice and, with --downloads, that every source file was either
+placed or skipped for lack of a date. Only if all of that holds does it
+fold the shard files into the usual unsharded ones (journal, manifest,
+failed-items file, metrics) and remove them, so later runs (--resume,
+--from-manifest, --retry-failed) work on the whole archive.
+
+Paths are compared as the shards recorded them: mount the downloads and the
+output folder at the same path on every machine.
+"""
+
+import argparse, json, os, re, sqlite3, sys, zlib
+from collections import Counter, namedtuple
+from pathlib import Path
+
+from archive_manifest import ArchiveManifest, manifest_path
+from failed_items import FAILED_NAME
+from media_inventory import walk_media
+from metrics import merge_summaries
+from run_journal import JOURNAL_NAME
+
+METRICS_NAME = "rebuild_metrics.json"
+# Collision suffixes added by the organize step (NAME_1.jpg, NAME_1_1.jpg).
+COLLISION_SUFFIX = re.compile(r"(?:_\d+)+$")
+EXAMPLES = 5  # paths printed per problem
+
+def shard_key(name, pid):
+    if pid:
+        return pid
+    stem, ext = os.path.splitext(name.casefold())
+    return COLLISION_SUFFIX.sub("", stem) + ext
+
+def shard_of(name, pid, n):
+    """1-based shard of a file, from its name and Flickr ID ("" if none)."""
+    return zlib.crc32(shard_key(name, pid).encode("utf-8")) % n + 1
+
+class Shard(namedtuple("Shard", "k n")):
+    def __str__(self):
+        return f"{self.k}/{self.n}"
+
+    def owns(self, name, pid):
+        return shard_of(name, pid, self.n) == self.k
+
+    def entries(self, entries):
+        """MediaEntry items of this shard; a list stays a list, an iterator stays lazy."""
+        it = (e for e in entries if self.owns(os.path.basename(e.path), e.pid))
+        return list(it) if isinstance(entries, list) else it
+
+    def groups(self, id_to_files):
+        # {pid: [paths]}: every file of an ID belongs to the same shard
+        return {pid: paths for pid, paths in id_to_files.items() if self.owns("", pid)}
+
+    def path(self, path):
+        """path with .shardK-of-N before the extension."""
+        p = Path(path)
+        return p.with_name(f"{p.stem}.shard{self.k}-of-{self.n}{p.suffix}")
+
+def parse_shard(value):
+    """argparse type for --shard K/N."""
+    m = re.fullmatch(r"(\d+)/(\d+)", value.strip())
+    if not m or not 1 <= int(m.group(1)) <= int(m.group(2)):
+        raise argparse.ArgumentTypeError(f"expected K/N with 1 <= K <= N, got {value!r}")
+    return Shard(int(m.group(1)), int(m.group(2)))
+
+def add_shard_args(ap):
+    ap.add_argument("--shard", type=parse_shard, default=None, metavar="K/N",
+                    help="Only handle the Flickr IDs of shard K of N (run one per machine, then scripts/shards.py)")
+
+def _examples(paths):
+    return "".join(f"\n  {p}" for p in sorted(paths)[:EXAMPLES])
+
+def check_shards(out_root, n, downloads=None):
+    """-> list of problems found in the N shard manifests of out_root."""
+    problems = []
+    if not any(manifest_path(out_root, Shard(k, n)).exists() for k in range(1, n + 1)):
+        return [f"no shard files for {n} shards in {out_root} (already merged, or no shard has run)"]
+    seen_src = {}   # src -> shard
+    seen_dest = Counter()
+    twice, misplaced = [], []
+    for k in range(1, n + 1):
+        path = manifest_path(out_root, Shard(k, n))
+        if not path.exists():
+            problems.append(f"shard {k}/{n} has not run (no {path.name})")
+            continue
+        with sqlite3.connect(str(path)) as db:
+            rows = db.execute("SELECT src, pid, dest FROM files").fetchall()
+        placed = 0
+        for src, pid, dest in rows:
+            if src in seen_src:
+                twice.append(src)
+            seen_src[src] = k
+            if shard_of(os.path.basename(src), pid, n) != k:
+                misplaced.append(src)
+            if dest:
+                seen_dest[dest] += 1
+                placed += 1
+        print(f"[INFO] Shard {k}/{n}: {placed:,} placed, {len(rows) - placed:,} skipped (no date)")
+    if twice:
+        problems.append(f"{len(twice):,} source file(s) handled by more than one shard:{_examples(twice)}")
+    if misplaced:
+        problems.append(f"{len(misplaced):,} source file(s) handled by the wrong shard "
+                        f"(shards run with a different N?):{_examples(misplaced)}")
+    clashes = [d for d, c in seen_dest.items() if c > 1]
+    if clashes:
+        problems.append(f"{len(clashes):,} destination(s) written by more than one source:{_examples(clashes)}")
+    if downloads:
+        # A moved file is no longer in downloads; anything still there must be accounted for.
+        missing = [e.path for e in walk_media(downloads) if e.path not in seen_src]
+        if missing:
+            problems.append(f"{len(missing):,} source file(s) not placed by any shard "
+                            f"(failed copies or an unfinished shard):{_examples(missing)}")
+    return problems
+
+def _merge_journals(out_root, n):
+    main = out_root / JOURNAL_NAME
+    with main.open("a", encoding="utf-8") as f:
+        for k in range(1, n + 1):
+            part = Shard(k, n).path(main)
+            if part.exists():
+                with part.open("r", encoding="utf-8") as src:
+                    for line in src:
+                        # skip a torn last line instead of gluing it to the next shard's first
+                        if line.endswith("\n"):
+                            f.write(line)
+                part.unlink()
+
+def _merge_manifests(out_root, n):
+    with ArchiveManifest(manifest_path(out_root)) as m, m.lock:
+        for k in range(1, n + 1):
+            part = manifest_path(out_root, Shard(k, n))
+            m.db.execute("ATTACH DATABASE ? AS part", (str(part),))
+            m.db.execute("INSERT OR REPLACE INTO files SELECT * FROM part.files")
+            m.db.commit()
+            m.db.execute("DETACH DATABASE part")
+    for k in range(1, n + 1):
+        part = manifest_path(out_root, Shard(k, n))
+        for p in (part, part.with_name(part.name + "-wal"), part.with_name(part.name + "-shm")):
+            p.unlink(missing_ok=True)
+
+def _merge_failed(out_root, n):
+    main = out_root / FAILED_NAME
+    parts = [p for p in (Shard(k, n).path(main) for k in range(1, n + 1)) if p.exists()]
+    if not parts:
+        return 0
+    count = 0
+    with main.open("w", encoding="utf-8") as f:
+        for p in parts:
+            for line in p.read_text(encoding="utf-8").splitlines():
+                f.write(line + "\n")
+                count += 1
+            p.unlink()
+    return count
+
+def _merge_metrics(metrics, n):
+    parts = [p for p in (Shard(k, n).path(metrics) for k in range(1, n + 1)) if p.exists()]
+    if not parts:
+        return None
+    summary = merge_summaries([json.loads(p.read_text(encoding="utf-8")) for p in parts])
+    metrics.write_text(json.dumps(summary, indent=2), encoding="utf-8")
+    for p in parts:
+        p.unlink()
+    return summary
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--out", required=True, help="Output folder all shards wrote to")
+    ap.add_argument("--shards", type=int, required=True, help="N, the number of shards")
+    ap.add_argument("--downloads", default=None, help="Source folder; also check that no source file was missed")
+    ap.add_argument("--metrics-json", default=None,
+                    help=f"Metrics file the shards were given (default: <out>/{METRICS_NAME})")
+    ap.add_argument("--check-only", action="store_true", help="Only check, do not merge")
+    args = ap.parse_args(argv)
+    if args.shards < 1:
+        ap.error("--shards must be at least 1")
+
+    out_root = Path(args.out).expanduser()
+    problems = check_shards(out_root, args.shards, args.downloads)
+    if problems:
+        for p in problems:
+            print(f"[ERROR] {p}", file=sys.stderr)
+        sys.exit(1)
+    print(f"[INFO] All {args.shards} shards complete; no file missing or placed twice")
+    if args.check_only:
+        return
+
+    _merge_journals(out_root, args.shards)
+    _merge_manifests(out_root, args.shards)
+    failed = _merge_failed(out_root, args.shards)
+    metrics = Path(args.metrics_json).expanduser() if args.metrics_json else out_root / METRICS_NAME
+    summary = _merge_metrics(metrics, args.shards)
+    if summary:
+        print(f"[INFO] Wrote merged metrics: {metrics} (slowest shard: {summary['total_seconds']:,.1f}s)")
+    if failed:
+        print(f"[WARN] {failed:,} file(s) failed across shards; retry them with "
+              f"fix_and_embed.py --retry-failed {out_root / FAILED_NAME}", file=sys.stderr)
+    print(f"[DONE] Merged {args.shards} shards into {out_root}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Parse the Flickr JSON sidecars (photo_<id>.json) once into a SQLite index.
+
+Every step needs something from the sidecars (date_taken for the fix scripts,
+title/description/tags/geo for embedding). Instead of each script walking and
+json-loading ~200k files, the fields they use are extracted once, keyed by
+Flickr ID, and re-used until a JSON dir changes (file count or mtimes).
+Where an ID has a sidecar in more than one dir, the last dir given wins.
+
+The index lives in ~/.cache/flickr-archive-rebuilder/ by default (one file per
+set of JSON dirs) so the original export is never written to. Use --index on
+any script to put it somewhere else.
+
+Parsing is spread over a process pool (--json-workers) since json.loads is
+CPU-bound and the reads overlap well on slow/network storage.
+
+Run directly to (re)build the index:
+python3 scripts/sidecar_index.py --json "/path/to/part1" "/path/to/part2"
+"""
+
+import argparse, fnmatch, hashlib, json, os, sqlite3, sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+INDEX_VERSION = 2
+CACHE_DIR = Path("~/.cache/flickr-archive-rebuilder").expanduser()
+DEFAULT_JSON_WORKERS = min(8, os.cpu_count() or 1)
+# Below this many files a process pool costs more than it saves.
+PARALLEL_MIN_FILES = 2000
+MTIME_SUM_MOD = 1 << 63
+# IDs per "WHERE id IN (...)" query; stays under SQLite's variable limit.
+LOOKUP_BATCH = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS dirs (
+    path TEXT PRIMARY KEY, files INTEGER, mtime_sum INTEGER, mtime_max INTEGER
+);
+CREATE TABLE IF NOT EXISTS sidecars (
+    id TEXT PRIMARY KEY, dir TEXT, date_taken TEXT, name TEXT, description TEXT,
+    tags TEXT, lat, lon
+);
+CREATE INDEX IF NOT EXISTS sidecars_dir ON sidecars(dir);
+"""
+
+def default_index_path(json_dirs):
+    key = "\n".join(str(Path(d).expanduser().resolve()) for d in json_dirs)
+    return CACHE_DIR / f"sidecars-{hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]}.sqlite"
+
+def normalize_tags(tags_raw):
+    tags = []
+    if isinstance(tags_raw, list):
+        for t in tags_raw:
+            if isinstance(t, str) and t.strip():
+                tags.append(t.strip())
+            elif isinstance(t, dict):
+                for k in ("raw","tag","name","text","value"):
+                    v = t.get(k)
+                    if isinstance(v, str) and v.strip():
+                        tags.append(v.strip())
+                        break
+    seen = set()
+    return [x for x in tags if not (x.lower() in seen or seen.add(x.lower()))]
+
+def normalize_geo(g):
+    if isinstance(g, list) and len(g) > 0 and isinstance(g[0], dict):
+        g = g[0]
+    if isinstance(g, dict):
+        lat = g.get("latitude") or g.get("lat")
+        lon = g.get("longitude") or g.get("lon") or g.get("lng")
+        if lat is not None and lon is not None:
+            return lat, lon
+    return None, None
+
+def parse_sidecar(obj):
+    # -> (id, date_taken, name, description, tags, lat, lon) or None
+    pid = str(obj.get("id", "")).strip()
+    if not pid:
+        return None
+    dt = str(obj.get("date_taken", "")).strip()
+    name = (obj.get("name") or "").strip()
+    desc = (obj.get("description") or "").strip()
+    lat, lon = normalize_geo(obj.get("geo"))
+    return pid, dt, name, desc, normalize_tags(obj.get("tags") or []), lat, lon
+
+def dir_fingerprint(d):
+    # (count, mtime sum, newest mtime) of the sidecars under d, without keeping
+    # the paths (Path.rglob remembers every path it yielded). The sum wraps at
+    # 2**63 so it fits a SQLite INTEGER (ns mtimes overflow after a few
+    # thousand files).
+    count = 0
+    mtime_sum = 0
+    mtime_max = 0
+    for dirpath, _, names in os.walk(d):
+        for name in fnmatch.filter(names, "photo_*.json"):
+            mtime = os.stat(os.path.join(dirpath, name)).st_mtime_ns
+            count += 1
+            mtime_sum = (mtime_sum + mtime) % MTIME_SUM_MOD
+            mtime_max = max(mtime_max, mtime)
+    return count, mtime_sum, mtime_max
+
+def parse_chunk(paths):
+    rows = []
+    for p in paths:
+        try:
+            row = parse_sidecar(json.loads(Path(p).read_text(encoding="utf-8")))
+        except Exception as e:
+            print(f"[WARN] Failed to read {p}: {e}", file=sys.stderr)
+            continue
+        if row:
+            rows.append(row)
+    return rows
+
+def parse_files(paths, workers=1):
+    """
+    Parse sidecars into compact row tuples. With workers > 1 the paths are split
+    into chunks handled by a process pool; partial results are concatenated in
+    input order so a later duplicate ID still wins, as in the serial loop.
+    """
+    if workers <= 1 or len(paths) < PARALLEL_MIN_FILES:
+        return parse_chunk(paths)
+    size = max(256, len(paths) // (workers * 4) + 1)
+    chunks = [[str(p) for p in paths[i:i + size]] for i in range(0, len(paths), size)]
+    rows = []
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        for part in ex.map(parse_chunk, chunks):
+            rows.extend(part)
+    return rows
+
+class SidecarIndex:
+    def __init__(self, db_path):
+        self.path = Path(db_path)
+        self.db = sqlite3.connect(str(self.path))
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def refresh(self, json_dirs, workers=1):
+        """
+        Re-parse the JSON dirs if any fingerprint (or the list of dirs) changed.
+        Returns files parsed. All dirs are parsed again, in order, so that an
+        ID found in more than one dir keeps the record from the last one.
+        """
+        version = self.db.execute("SELECT value FROM meta WHERE key='version'").fetchone()
+        if not version or version[0] != str(INDEX_VERSION):
+            with self.db:
+                self.db.execute("DELETE FROM dirs")
+                self.db.execute("DELETE FROM sidecars")
+                self.db.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (str(INDEX_VERSION),))
+
+        wanted = list(dict.fromkeys(str(Path(d).expanduser().resolve()) for d in json_dirs))
+        fps = [dir_fingerprint(Path(d)) for d in wanted]
+        # rowid order is the order the dirs were parsed in
+        stored = self.db.execute("SELECT path, files, mtime_sum, mtime_max FROM dirs ORDER BY rowid").fetchall()
+        if [(row[0], tuple(row[1:])) for row in stored] == list(zip(wanted, fps)):
+            return 0
+
+        with self.db:
+            self.db.execute("DELETE FROM dirs")
+            self.db.execute("DELETE FROM sidecars")
+        parsed = 0
+        for d, fp in zip(wanted, fps):
+            paths = list(Path(d).rglob("photo_*.json"))
+            rows = parse_files(paths, workers)
+            parsed += len(paths)
+            with self.db:
+                self.db.executemany(
+                    "INSERT OR REPLACE INTO sidecars VALUES (?,?,?,?,?,?,?,?)",
+                    ((pid, d, dt, name, desc, json.dumps(tags, ensure_ascii=False), lat, lon)
+                     for pid, dt, name, desc, tags, lat, lon in rows),
+                )
+                self.db.execute("INSERT INTO dirs VALUES (?,?,?,?)", (d, *fp))
+        return parsed
+
+    def count(self):
+        return self.db.execute("SELECT COUNT(*) FROM sidecars").fetchone()[0]
+
+    def get(self, pid):
+        row = self.db.execute(
+            "SELECT name, description, tags, lat, lon, date_taken FROM sidecars WHERE id=?", (pid,)
+        ).fetchone()
+        return _record(row) if row else None
+
+    def dates(self):
+        return dict(self.db.execute("SELECT id, date_taken FROM sidecars WHERE date_taken != ''"))
+
+    def titles(self):
+        return dict(self.db.execute("SELECT id, name FROM sidecars WHERE name != ''"))
+
+    def records(self):
+        cur = self.db.execute("SELECT id, name, description, tags, lat, lon, date_taken FROM sidecars")
+        return {row[0]: _record(row[1:]) for row in cur}
+
+    def lookup(self, pids):
+        """Records for just these IDs; streaming mode calls this per directory."""
+        pids = list(pids)
+        out = {}
+        for i in range(0, len(pids), LOOKUP_BATCH):
+            batch = pids[i:i + LOOKUP_BATCH]
+            cur = self.db.execute(
+                "SELECT id, name, description, tags, lat, lon, date_taken FROM sidecars "
+                f"WHERE id IN ({','.join('?' * len(batch))})", batch)
+            for row in cur:
+                out[row[0]] = _record(row[1:])
+        return out
+
+def _record(row):
+    name, desc, tags, lat, lon, dt = row
+    geo = {"lat": lat, "lon": lon} if lat is not None and lon is not None else None
+    return {"title": name, "description": desc, "tags": json.loads(tags), "geo": geo, "date_taken": dt}
+
+def open_index(json_dirs, index_path=None, workers=DEFAULT_JSON_WORKERS, refresh=True):
+    # refresh=False: a new connection to an index already brought up to date
+    # (RunContext.refresh_sidecar_index), e.g. for another thread.
+    for d in json_dirs:
+        d = Path(d).expanduser()
+        if not d.exists():
+            print(f"[ERROR] JSON dir not found: {d}", file=sys.stderr)
+            sys.exit(1)
+    path = Path(index_path).expanduser() if index_path else default_index_path(json_dirs)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    idx = SidecarIndex(path)
+    parsed = idx.refresh(json_dirs, workers) if refresh else 0
+    if parsed:
+        print(f"[INFO] Sidecar index updated: {parsed:,} JSON files parsed -> {path}")
+    return idx
+
+def load_records(json_dirs, index_path=None, workers=DEFAULT_JSON_WORKERS, refresh=True):
+    """All records as {pid: {"title", "description", "tags", "geo", "date_taken"}}."""
+    with open_index(json_dirs, index_path, workers, refresh) as idx:
+        out = idx.records()
+    print(f"[INFO] JSON sidecars indexed: {len(out):,}")
+    return out
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--json", required=True, nargs="+", help="One or more JSON folders (part1 part2)")
+    ap.add_argument("--index", default=None, help="Index file (default: per-JSON-set file in ~/.cache)")
+    ap.add_argument("--json-workers", type=int, default=DEFAULT_JSON_WORKERS,
+                    help=f"Processes used to parse JSON (default: {DEFAULT_JSON_WORKERS}, 1 = serial)")
+    args = ap.parse_args()
+
+    with open_index(args.json, args.index, args.json_workers) as idx:
+        print(f"[DONE] {idx.count():,} sidecars indexed in {idx.path}")
+
+if __name__ == "__main__":
+    main()
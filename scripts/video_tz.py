@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+UTC conversion of video dates (--tz / --tz-polygons).
+
+QuickTime CreateDate, TrackCreateDate and MediaCreateDate (and the Modify
+variants) are defined as UTC, but Flickr's date_taken is local wall-clock
+time. Written unchanged, videos show up shifted by the UTC offset in apps that
+read those tags as UTC. The fix/embed steps can convert the video dates
+first; photo Exif dates are local by definition and stay as they are.
+
+The time zone of an item is, in order:
+
+  1. with --tz-polygons, the zone whose polygon contains the item's JSON geo
+     point. The file is a GeoJSON FeatureCollection with a "tzid" property per
+     feature (e.g. combined.json from timezone-boundary-builder). It is loaded
+     once into a SQLite R*Tree index in ~/.cache/flickr-archive-rebuilder/ and
+     re-used until the GeoJSON file changes.
+  2. --tz (an IANA name such as Europe/Berlin);
+  3. none: the date is written unchanged, as before.
+
+UTC offsets are cached per (zone, day), so 50,000 videos taken in a handful of
+zones cost a few hundred offset computations; days with a DST change are
+converted one by one. Point lookups are cached per ~10 m grid cell.
+
+python3 scripts/video_tz.py --tz-polygons combined.json --lookup 52.52 13.40 --date "2015:06:07 12:00:00"
+"""
+
+import argparse, hashlib, json, os, sqlite3
+from collections import Counter
+from datetime import datetime, time
+from functools import lru_cache
+from pathlib import Path
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from sidecar_index import CACHE_DIR
+
+EXIF_DT = "%Y:%m:%d %H:%M:%S"
+POINT_DIGITS = 4  # ~10 m; cache key for geo -> zone lookups
+RING_CACHE = 64   # decoded polygons kept in memory
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS polygons (id INTEGER PRIMARY KEY, tzid TEXT, rings TEXT);
+CREATE VIRTUAL TABLE IF NOT EXISTS bbox USING rtree(id, min_lon, max_lon, min_lat, max_lat);
+"""
+
+def add_tz_args(ap):
+    ap.add_argument("--tz", default=None,
+                    help="Time zone of date_taken for videos without a --tz-polygons match (e.g. Europe/Berlin); "
+                         "video dates are converted to UTC")
+    ap.add_argument("--tz-polygons", default=None,
+                    help="Time zone boundary GeoJSON; videos with JSON geo get the zone of their location")
+
+def check_tz_args(ap, args):
+    if args.tz:
+        try:
+            ZoneInfo(args.tz)
+        except (ZoneInfoNotFoundError, ValueError):
+            ap.error(f"unknown time zone for --tz: {args.tz} (use an IANA name such as Europe/Berlin)")
+    if args.tz_polygons and not Path(args.tz_polygons).expanduser().is_file():
+        ap.error(f"--tz-polygons file not found: {args.tz_polygons}")
+
+@lru_cache(maxsize=None)
+def day_offset(tzid, day):
+    # -> UTC offset for the whole day, or None when it changes that day (DST)
+    z = ZoneInfo(tzid)
+    first = datetime.combine(day, time.min, z).utcoffset()
+    last = datetime.combine(day, time(23, 59, 59), z).utcoffset()
+    return first if first == last else None
+
+def to_utc(exif_dt, tzid):
+    # "YYYY:MM:DD HH:MM:SS" local time in tzid -> same format in UTC
+    local = datetime.strptime(exif_dt, EXIF_DT)
+    offset = day_offset(tzid, local.date())
+    if offset is None:
+        offset = local.replace(tzinfo=ZoneInfo(tzid)).utcoffset()
+    return (local - offset).strftime(EXIF_DT)
+
+def _in_ring(ring, x, y):
+    inside = False
+    xj, yj = ring[-1]
+    for xi, yi in ring:
+        if (yi > y) != (yj > y) and x < (xj - xi) * (y - yi) / (yj - yi) + xi:
+            inside = not inside
+        xj, yj = xi, yi
+    return inside
+
+def _polygons(geometry):
+    # -> list of polygons, each [outer ring, hole, ...]
+    if not geometry:
+        return []
+    if geometry["type"] == "Polygon":
+        return [geometry["coordinates"]]
+    if geometry["type"] == "MultiPolygon":
+        return geometry["coordinates"]
+    return []
+
+def geo_point(geo):
+    """
+    (lat, lon) as floats from a sidecar geo record, or None if there is none.
+    The index keeps the JSON's own types, so strings ("52.52") are common;
+    values that do not parse or lie outside -90..90 / -180..180 count as
+    no GPS, and the --tz fallback applies.
+    """
+    if not geo:
+        return None
+    try:
+        lat, lon = float(geo["lat"]), float(geo["lon"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):  # also rejects NaN
+        return None
+    return lat, lon
+
+def polygon_index_path(source):
+    key = str(Path(source).expanduser().resolve())
+    return CACHE_DIR / f"tz-{hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]}.sqlite"
+
+class TimeZoneIndex:
+    """geo point -> IANA zone name, from a polygon GeoJSON indexed in SQLite."""
+
+    def __init__(self, source, db_path=None):
+        self.source = Path(source).expanduser()
+        self.path = Path(db_path).expanduser() if db_path else polygon_index_path(self.source)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(self.path))
+        self.db.executescript(SCHEMA)
+        self._zones = {}
+        self._rings = lru_cache(maxsize=RING_CACHE)(self._load_rings)
+        st = os.stat(self.source)
+        stamp = f"{st.st_size}:{st.st_mtime_ns}"
+        row = self.db.execute("SELECT value FROM meta WHERE key='source'").fetchone()
+        if not row or row[0] != stamp:
+            self._build(stamp)
+
+    def _build(self, stamp):
+        print(f"[INFO] Indexing time zone polygons: {self.source} (once)")
+        with open(self.source, encoding="utf-8") as f:
+            features = json.load(f).get("features", [])
+        with self.db:
+            self.db.execute("DELETE FROM polygons")
+            self.db.execute("DELETE FROM bbox")
+            n = 0
+            for feat in features:
+                tzid = (feat.get("properties") or {}).get("tzid")
+                if not tzid:
+                    continue
+                for rings in _polygons(feat.get("geometry")):
+                    lons = [p[0] for p in rings[0]]
+                    lats = [p[1] for p in rings[0]]
+                    cur = self.db.execute("INSERT INTO polygons (tzid, rings) VALUES (?,?)",
+                                          (tzid, json.dumps(rings, separators=(",", ":"))))
+                    self.db.execute("INSERT INTO bbox VALUES (?,?,?,?,?)",
+                                    (cur.lastrowid, min(lons), max(lons), min(lats), max(lats)))
+                    n += 1
+            self.db.execute("INSERT OR REPLACE INTO meta VALUES ('source', ?)", (stamp,))
+        print(f"[INFO] Time zone polygons indexed: {n:,} -> {self.path}")
+
+    def _load_rings(self, pid):
+        return json.loads(self.db.execute("SELECT rings FROM polygons WHERE id=?", (pid,)).fetchone()[0])
+
+    def zone(self, lat, lon):
+        key = (round(lat, POINT_DIGITS), round(lon, POINT_DIGITS))
+        if key not in self._zones:
+            self._zones[key] = None
+            rows = self.db.execute(
+                "SELECT p.id, p.tzid FROM bbox b JOIN polygons p ON p.id = b.id "
+                "WHERE b.min_lon <= ? AND b.max_lon >= ? AND b.min_lat <= ? AND b.max_lat >= ?",
+                (lon, lon, lat, lat),
+            ).fetchall()
+            for pid, tzid in rows:
+                rings = self._rings(pid)
+                if _in_ring(rings[0], lon, lat) and not any(_in_ring(h, lon, lat) for h in rings[1:]):
+                    self._zones[key] = tzid
+                    break
+        return self._zones[key]
+
+    def close(self):
+        self.db.close()
+
+class VideoTimes:
+    """Converts video dates to UTC; counts where each item's zone came from."""
+
+    def __init__(self, default_tz=None, polygons=None):
+        if default_tz:
+            ZoneInfo(default_tz)  # fail early on a typo
+        self.default_tz = default_tz
+        self.index = TimeZoneIndex(polygons) if polygons else None
+        self.counts = Counter()
+
+    def utc(self, exif_dt, geo=None):
+        point = geo_point(geo) if self.index else None
+        tzid = self.index.zone(*point) if point else None
+        source = "geo"
+        if not tzid:
+            tzid, source = self.default_tz, "tz"
+        try:
+            converted = to_utc(exif_dt, tzid) if tzid else None
+        except ValueError:  # not a real date (e.g. month 00)
+            converted = None
+        if converted is None:
+            self.counts["unchanged"] += 1
+            return exif_dt
+        self.counts[source] += 1
+        return converted
+
+    def summary(self):
+        c = self.counts
+        return (f"[INFO] Video dates converted to UTC: {c['geo'] + c['tz']:,} "
+                f"(geo {c['geo']:,} | --tz {c['tz']:,}) | no time zone, unchanged: {c['unchanged']:,}")
+
+    def close(self):
+        if self.index:
+            self.index.close()
+
+def main():
+    ap = argparse.ArgumentParser()
+    add_tz_args(ap)
+    ap.add_argument("--lookup", nargs=2, type=float, metavar=("LAT", "LON"), help="Print the zone of a point")
+    ap.add_argument("--date", default=None, help='Local "YYYY:MM:DD HH:MM:SS" to convert to UTC')
+    args = ap.parse_args()
+    if not (args.tz or args.tz_polygons):
+        ap.error("give --tz and/or --tz-polygons")
+    check_tz_args(ap, args)
+    times = VideoTimes(args.tz, args.tz_polygons)
+    geo = {"lat": args.lookup[0], "lon": args.lookup[1]} if args.lookup else None
+    if geo and times.index:
+        print(f"[INFO] Zone at {geo['lat']}, {geo['lon']}: {times.index.zone(geo['lat'], geo['lon'])}")
+    if args.date:
+        print(f"[INFO] {args.date} local -> {times.utc(args.date, geo)} UTC")
+    times.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+XMP sidecar output (--xmp-sidecar).
+
+Embedding titles, tags and geo through exiftool rewrites the whole media
+file, which for multi-GB videos is most of the pipeline's I/O. With
+--xmp-sidecar the same fields go into a small .xmp file next to each media
+file instead, generated here in Python; the media file is not opened and
+no exiftool process is involved. Photo apps that read sidecars (Lightroom,
+Capture One, darktable, digiKam, ...) pick them up on import.
+
+Fields, as embed_metadata.py writes them into the file:
+
+  title        dc:title        (XMP:Title)
+  description  dc:description  (XMP:Description)
+  tags         dc:subject      (XMP:Subject)
+  geo          exif:GPSLatitude / exif:GPSLongitude
+
+The IPTC copies embed_metadata.py adds to photos have no place in a sidecar;
+readers take the same values from the dc: fields.
+
+The sidecar of IMG_1234.jpg is IMG_1234.xmp (exiftool's and Adobe's
+naming). If another photo/video in the same folder has the same base name
+(IMG_1234.mov), both get the full name instead (IMG_1234.jpg.xmp) so they do
+not share one sidecar. In the overlapped rebuild organize may still be
+placing files into a folder whose sidecars are being written, so the check
+cannot rely on one listing of the folder: a base name that shows up again
+later gets the full name right away, and close() lists the folders again
+once all files are in place and renames short-named sidecars whose base
+name turned out to be shared. A sidecar with the same content is left
+untouched; one written by another program is never overwritten (it is
+reported).
+
+Sidecars are written in batches on a few threads (--workers); each write is
+a temp file + rename, so a sidecar is never half-written.
+"""
+
+import os, re, sys, threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from xml.sax.saxutils import escape, quoteattr
+
+from exiftool_pool import ExiftoolResult
+from media_names import media_kind
+
+XMP_SUFFIX = ".xmp"
+TOOLKIT = "flickr-archive-rebuilder"  # x:xmptk; marks sidecars this tool may replace
+XMP_BATCH = 256  # sidecars per thread pool task
+# Characters XML 1.0 does not allow (control characters in Flickr descriptions).
+XML_INVALID = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+EXAMPLES = 5
+
+def add_xmp_args(ap):
+    ap.add_argument("--xmp-sidecar", action="store_true",
+                    help="Write title/description/tags/geo to a .xmp file next to each media file "
+                         "instead of rewriting the file with exiftool")
+
+def _text(value):
+    return escape(XML_INVALID.sub("", str(value)))
+
+def _lang_alt(tag, value):
+    return (f"   <{tag}>\n    <rdf:Alt>\n"
+            f"     <rdf:li xml:lang=\"x-default\">{_text(value)}</rdf:li>\n"
+            f"    </rdf:Alt>\n   </{tag}>\n")
+
+def xmp_coordinate(value, pos, neg):
+    # XMP GPS format: "DDD,MM.mmmmmmk" (degrees, decimal minutes, N/S or E/W)
+    v = float(value)
+    d = abs(v)
+    deg = int(d)
+    return f"{deg},{(d - deg) * 60:.6f}{pos if v >= 0 else neg}"
+
+def xmp_packet(rec, *, title, description, tags, geo):
+    """The sidecar for one JSON record, or None if none of the fields has a value."""
+    body = ""
+    if title and rec["title"]:
+        body += _lang_alt("dc:title", rec["title"])
+    if description and rec["description"]:
+        body += _lang_alt("dc:description", rec["description"])
+    if tags and rec["tags"]:
+        body += "   <dc:subject>\n    <rdf:Bag>\n"
+        body += "".join(f"     <rdf:li>{_text(t)}</rdf:li>\n" for t in rec["tags"])
+        body += "    </rdf:Bag>\n   </dc:subject>\n"
+    gps = ""
+    if geo and rec["geo"]:
+        try:
+            gps = (f"\n    exif:GPSLatitude={quoteattr(xmp_coordinate(rec['geo']['lat'], 'N', 'S'))}"
+                   f"\n    exif:GPSLongitude={quoteattr(xmp_coordinate(rec['geo']['lon'], 'E', 'W'))}")
+        except (TypeError, ValueError):
+            gps = ""
+    if not (body or gps):
+        return None
+    return (
+        "<?xpacket begin=\"\ufeff\" id=\"W5M0MpCehiHzreSzNTczkc9d\"?>\n"
+        f"<x:xmpmeta xmlns:x=\"adobe:ns:meta/\" x:xmptk=\"{TOOLKIT}\">\n"
+        " <rdf:RDF xmlns:rdf=\"http://www.w3.org/1999/02/22-rdf-syntax-ns#\">\n"
+        "  <rdf:Description rdf:about=\"\"\n"
+        "    xmlns:dc=\"http://purl.org/dc/elements/1.1/\"\n"
+        f"    xmlns:exif=\"http://ns.adobe.com/exif/1.0/\"{gps}>\n"
+        f"{body}"
+        "  </rdf:Description>\n"
+        " </rdf:RDF>\n"
+        "</x:xmpmeta>\n"
+        "<?xpacket end=\"w\"?>\n"
+    )
+
+class XmpSidecars:
+    """
+    Collects (media path, record) pairs with add() and writes their sidecars
+    on a thread pool, XMP_BATCH at a time; close() waits and prints a summary.
+    Successful writes are journaled as step "xmp_sidecar" of the media file,
+    failures go to the failed-items file.
+    """
+
+    def __init__(self, *, title, description, tags, geo, workers=4, journal=None, failed=None,
+                 metrics=None, dry_run=False):
+        self.fields = dict(title=title, description=description, tags=tags, geo=geo)
+        self.journal = journal
+        self.failed = failed
+        self.dry_run = dry_run
+        self.workers = max(1, workers)
+        self.ex = ThreadPoolExecutor(max_workers=self.workers)
+        self.futures = []
+        self.batch = []
+        self.stems = {}  # dir -> {base name: {media names}} (casefolded), as seen so far
+        self.short = {}  # dir -> {base name: media name} of sidecars given the short name
+        self.lock = threading.Lock()
+        self.counts = Counter()
+        self.foreign = []
+        # Wall time of the phase runs from the first add() to close().
+        self._phase_cm = metrics.phase("xmp_sidecar") if metrics else None
+        self.phase = self._phase_cm.__enter__() if self._phase_cm else None
+
+    @staticmethod
+    def _media_stems(d):
+        stems = {}
+        with os.scandir(d or ".") as it:
+            for e in it:
+                if media_kind(e.name):
+                    stems.setdefault(os.path.splitext(e.name)[0].casefold(), set()).add(e.name.casefold())
+        return stems
+
+    def sidecar_path(self, path):
+        d, name = os.path.split(str(path))
+        stems = self.stems.get(d)
+        if stems is None:
+            stems = self.stems[d] = self._media_stems(d)
+        stem = os.path.splitext(name)[0]
+        names = stems.setdefault(stem.casefold(), set())
+        names.add(name.casefold())
+        if len(names) > 1:
+            return os.path.join(d, name + XMP_SUFFIX)
+        self.short.setdefault(d, {})[stem.casefold()] = name
+        return os.path.join(d, stem + XMP_SUFFIX)
+
+    def _rename_shared(self):
+        # Short names whose base name another media file in the folder now has.
+        for d, owners in self.short.items():
+            try:
+                stems = self._media_stems(d)
+            except OSError:
+                continue
+            for stem, name in owners.items():
+                if len(stems.get(stem, ())) < 2:
+                    continue
+                short = os.path.join(d, os.path.splitext(name)[0] + XMP_SUFFIX)
+                full = os.path.join(d, name + XMP_SUFFIX)
+                if not (self._ours(short) and (not os.path.exists(full) or self._ours(full))):
+                    continue
+                try:
+                    os.replace(short, full)
+                    self.counts["renamed"] += 1
+                except OSError as e:
+                    print(f"[ERROR] Renaming sidecar {short} failed: {e}", file=sys.stderr)
+
+    @staticmethod
+    def _ours(xmp):
+        try:
+            with open(xmp, "rb") as f:
+                return f'x:xmptk="{TOOLKIT}"'.encode() in f.read(512)
+        except OSError:
+            return False
+
+    def add(self, path, rec):
+        packet = xmp_packet(rec, **self.fields)
+        if packet is None:
+            return
+        if self.dry_run:
+            self.counts["listed"] += 1
+            return
+        self.batch.append((path, self.sidecar_path(path), packet))
+        if len(self.batch) >= XMP_BATCH:
+            self.flush()
+
+    def flush(self):
+        if self.batch:
+            self.futures.append(self.ex.submit(self._write_batch, self.batch))
+            self.batch = []
+        # Keep the backlog (and its memory) bounded on slow targets.
+        while len(self.futures) > self.workers * 4:
+            self.futures.pop(0).result()
+
+    def _write_batch(self, batch):
+        for path, xmp, packet in batch:
+            data = packet.encode("utf-8")
+            try:
+                state = self._write(xmp, data)
+            except OSError as e:
+                print(f"[ERROR] Writing sidecar {xmp} failed: {e}", file=sys.stderr)
+                state = "failed"
+                if self.failed:
+                    self.failed.add(path, "xmp_sidecar", ExiftoolResult([], 1, "", str(e)))
+            with self.lock:
+                self.counts[state] += 1
+                if state == "foreign" and len(self.foreign) < EXAMPLES:
+                    self.foreign.append(xmp)
+            if state in ("written", "unchanged") and self.journal:
+                self.journal.record_step(path, "xmp_sidecar")
+            if self.phase:
+                self.phase.add(1, len(data) if state == "written" else 0)
+
+    @staticmethod
+    def _write(xmp, data):
+        try:
+            with open(xmp, "rb") as f:
+                current = f.read()
+        except FileNotFoundError:
+            current = None
+        if current == data:
+            return "unchanged"
+        if current is not None and f'x:xmptk="{TOOLKIT}"'.encode() not in current[:512]:
+            return "foreign"
+        tmp = f"{xmp}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, xmp)
+        except OSError:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+        return "written"
+
+    def close(self):
+        self.flush()
+        for fut in self.futures:
+            fut.result()
+        self.ex.shutdown(wait=True)
+        if not self.dry_run:
+            self._rename_shared()
+        if self._phase_cm:
+            self._phase_cm.__exit__(None, None, None)
+            self._phase_cm = None
+        c = self.counts
+        if self.dry_run:
+            print(f"[DONE] Dry run: XMP sidecars to write: {c['listed']:,}")
+            return
+        print(f"[DONE] XMP sidecars written: {c['written']:,} | already up to date: {c['unchanged']:,}")
+        if c["renamed"]:
+            print(f"[INFO] Sidecars renamed to NAME.ext.xmp (base name shared with a file placed later): "
+                  f"{c['renamed']:,}")
+        if c["foreign"]:
+            print(f"[WARN] {c['foreign']:,} existing sidecar(s) from another program left untouched, e.g.:"
+                  + "".join(f"\n  {p}" for p in self.foreign), file=sys.stderr)
+        if c["failed"]:
+            print(f"[WARN] Sidecars failed: {c['failed']:,}", file=sys.stderr)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
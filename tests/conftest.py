@@ -0,0 +1,7 @@
+import sys
+from pathlib import Path
+
+# The scripts import each other flat, as when they are run directly.
+SCRIPTS = Path(__file__).resolve().parent.parent / "scripts"
+if str(SCRIPTS) not in sys.path:
+    sys.path.insert(0, str(SCRIPTS))
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Minimal `exiftool -stay_open True -@ -` stand-in for the pool tests.
+
+Each -execute block "writes" its file arguments; what happens depends on
+the file name:
+
+  missing  status 1 and an error on stderr
+  noisy    256 KB of warnings on stderr, status 0
+  crash    the process exits in the middle of the batch, once per file
+           (a FILE.crashed marker makes the rerun succeed)
+  hang     sleeps far beyond any test timeout
+  stall    leaves FILE_exiftool_tmp behind and sleeps, once per file
+           (a FILE.stalled marker makes the rerun go through); like
+           exiftool, a write refuses to start while FILE_exiftool_tmp exists
+
+Files that exist hold their tags as a JSON object ({"XMP:Title": ...}).
+"-TAG=VALUE" arguments are written into it ("-TAG=" deletes the tag), with
+a FILE_original of the old contents kept unless -overwrite_original is
+given or one is already there, as exiftool does. With -j the requested
+tags are printed instead, as exiftool -j -G0 would.
+
+Every block's file list is appended to $FAKE_STAY_OPEN_LOG, one line per
+block, so tests can see which jobs ran together.
+"""
+
+import json, os, shutil, sys, time
+
+OPTIONS = {"-j", "-n", "-G0", "-overwrite_original"}
+
+def _matches(key, wanted):
+    return key in wanted or key.split(":", 1)[-1] in wanted
+
+def read_tags(files, args):
+    wanted = {a[1:] for a in args if a.startswith("-") and "=" not in a and a not in OPTIONS}
+    rows = []
+    for p in files:
+        if not os.path.exists(p):
+            sys.stderr.write(f"Error: File not found - {p}\n")
+            continue
+        with open(p, encoding="utf-8") as f:
+            tags = json.load(f)
+        rows.append(dict({"SourceFile": p}, **{k: v for k, v in tags.items() if _matches(k, wanted)}))
+    if rows:
+        sys.stdout.write(json.dumps(rows) + "\n")
+
+def write_tags(p, args):
+    with open(p, encoding="utf-8") as f:
+        tags = json.load(f)
+    for a in args:
+        if not a.startswith("-") or "=" not in a:
+            continue
+        tag, value = a[1:].split("=", 1)
+        if value:
+            tags[tag] = value
+        else:
+            tags = {k: v for k, v in tags.items() if not _matches(k, {tag})}
+    if "-overwrite_original" not in args and not os.path.exists(p + "_original"):
+        shutil.copy2(p, p + "_original")
+    with open(p, "w", encoding="utf-8") as f:
+        json.dump(tags, f, sort_keys=True)
+
+def run(args):
+    files = [a for a in args if not a.startswith("-") and a not in echo_values(args)]
+    log = os.environ.get("FAKE_STAY_OPEN_LOG")
+    if log:
+        with open(log, "a", encoding="utf-8") as f:
+            f.write(" ".join(os.path.basename(p) for p in files) + "\n")
+    status = 0
+    if "-j" in args:
+        read_tags(files, args)
+        files = []
+    for p in files:
+        name = os.path.basename(p)
+        if "crash" in name and not os.path.exists(p + ".crashed"):
+            open(p + ".crashed", "w").close()
+            os._exit(1)
+        if "hang" in name:
+            time.sleep(600)
+        if os.path.exists(p + "_exiftool_tmp"):
+            sys.stderr.write(f"Error: Temporary file already exists - {p}_exiftool_tmp\n")
+            status = 1
+            continue
+        if "stall" in name and not os.path.exists(p + ".stalled"):
+            open(p + ".stalled", "w").close()
+            open(p + "_exiftool_tmp", "w").close()
+            time.sleep(600)
+        if "missing" in name:
+            sys.stderr.write(f"Error: File not found - {p}\n")
+            status = 1
+            continue
+        if "noisy" in name:
+            sys.stderr.write(("Warning: [minor] Bad MakerNotes directory - " + p + "\n") * 4000)
+        if os.path.exists(p):
+            write_tags(p, args)
+        sys.stdout.write(f"file {p}\n")
+    for i, a in enumerate(args):
+        if a in ("-echo3", "-echo4") and i + 1 < len(args):
+            stream = sys.stdout if a == "-echo3" else sys.stderr
+            stream.write(args[i + 1].replace("${status}", str(status)) + "\n")
+    return status
+
+def echo_values(args):
+    return {args[i + 1] for i, a in enumerate(args[:-1]) if a in ("-echo3", "-echo4")}
+
+def main():
+    buf = []
+    for line in sys.stdin:
+        line = line.rstrip("\n")
+        if line.startswith("-execute"):
+            run(buf)
+            sys.stdout.write("{ready%s}\n" % line[len("-execute"):])
+            sys.stdout.flush()
+            sys.stderr.flush()
+            buf = []
+        elif buf == ["-stay_open"] and line == "False":
+            break
+        else:
+            buf.append(line)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""--backup exiftool/reflink/journal, then restore_backups.py, against tests/fake_stay_open.py."""
+
+import json, os
+from pathlib import Path
+
+import pytest
+
+import backups
+import embed_titles
+import restore_backups
+from exiftool_pool import ExiftoolPool
+from run_context import RunContext
+
+FAKE = str(Path(__file__).resolve().parent / "fake_stay_open.py")
+BEFORE = {"XMP:Title": "old title"}
+
+@pytest.fixture
+def archive(tmp_path):
+    json_dir = tmp_path / "json"
+    json_dir.mkdir()
+    out = tmp_path / "out" / "2015" / "06"
+    out.mkdir(parents=True)
+    files = []
+    for i in range(3):
+        pid = str(10000000000 + i)
+        (json_dir / f"photo_{pid}.json").write_text(json.dumps({"id": pid, "name": f"new title {i}"}))
+        p = out / f"IMG_{pid}.jpg"
+        p.write_text(json.dumps(BEFORE))
+        files.append(p)
+    return tmp_path, json_dir, files
+
+def tags(path):
+    return json.loads(Path(path).read_text())
+
+def embed(tmp_path, json_dir, *extra):
+    args = embed_titles.build_parser().parse_args(
+        ["--organized", str(tmp_path / "out"), "--json", str(json_dir),
+         "--index", str(tmp_path / "index.sqlite"), *extra])
+    with RunContext(1, getattr(args, "journal", None)) as ctx:
+        ctx._pool = ExiftoolPool(1, executable=FAKE)
+        return embed_titles.run(args, ctx)
+
+def restore(*argv):
+    args = restore_backups.build_parser().parse_args(list(argv))
+    with RunContext(1) as ctx:
+        ctx._pool = ExiftoolPool(1, executable=FAKE)
+        return restore_backups.run(args, ctx)
+
+@pytest.mark.parametrize("mode", ["exiftool", "reflink"])
+def test_file_original_backups_restore_the_original_bytes(archive, mode):
+    tmp_path, json_dir, files = archive
+    before = [p.read_bytes() for p in files]
+    # An earlier run already backed up files[0]: that backup is the original and stays.
+    older = json.dumps({"XMP:Title": "older title"}).encode()
+    Path(f"{files[0]}_original").write_bytes(older)
+
+    assert embed(tmp_path, json_dir, "--backup", mode) == 3
+    assert tags(files[1]) == {"XMP:Title": "new title 1", "IPTC:ObjectName": "new title 1"}
+    assert Path(f"{files[0]}_original").read_bytes() == older
+    assert [Path(f"{p}_original").read_bytes() for p in files[1:]] == before[1:]
+    assert not list(files[0].parent.glob(".*.part"))
+
+    assert restore("--root", str(tmp_path / "out")) == 3
+    assert [p.read_bytes() for p in files] == [older] + before[1:]
+    assert not list(files[0].parent.glob("*_original"))
+
+def test_keep_backups_restores_a_copy(archive):
+    tmp_path, json_dir, files = archive
+    before = files[0].read_bytes()
+    embed(tmp_path, json_dir, "--backup", "reflink")
+    assert restore("--root", str(tmp_path / "out"), "--keep-backups") == 3
+    assert files[0].read_bytes() == before
+    assert Path(f"{files[0]}_original").read_bytes() == before
+    assert sorted(p.name for p in files[0].parent.iterdir()) == sorted(
+        [p.name for p in files] + [f"{p.name}_original" for p in files])
+
+def test_journal_backup_restores_the_tag_values(archive):
+    tmp_path, json_dir, files = archive
+    journal = str(tmp_path / "journal.jsonl")
+    assert embed(tmp_path, json_dir, "--backup", "journal", "--journal", journal) == 3
+    assert tags(files[0])["XMP:Title"] == "new title 0"
+    assert not list(files[0].parent.glob("*_original"))
+    # A second write keeps the values saved before the first one.
+    files[0].write_text(json.dumps({"XMP:Title": "edited", "IPTC:ObjectName": "edited"}))
+    embed(tmp_path, json_dir, "--backup", "journal", "--journal", journal)
+
+    assert restore("--journal", journal) == 3
+    # IPTC:ObjectName was not set before the run, so it is deleted again.
+    assert [tags(p) for p in files] == [BEFORE] * 3
+
+def test_fsync_syncs_the_written_files_and_their_folders(tmp_path, monkeypatch):
+    synced = []
+    monkeypatch.setattr(backups.os, "fsync", lambda fd: synced.append(os.readlink(f"/proc/self/fd/{fd}")))
+    monkeypatch.setattr(backups.os, "sync", lambda: pytest.fail("os.sync flushes every filesystem"))
+    paths = []
+    for d in ("a", "b"):
+        (tmp_path / d).mkdir()
+        for i in range(backups.SYNC_BATCH):
+            p = tmp_path / d / f"{i}.jpg"
+            p.write_bytes(b"x")
+            paths.append(str(p))
+    sync = backups.DirSync()
+    for p in paths:
+        sync.add(p)
+    sync.close()
+    assert sorted(synced) == sorted(paths + [str(tmp_path / "a"), str(tmp_path / "b")])
@@ -0,0 +1,63 @@
+"""dedup_entries(): identical copies of one Flickr ID are dropped, everything else kept."""
+
+import os
+
+import pytest
+
+import dedup
+from dedup import PARTIAL_BYTES, dedup_entries
+from media_inventory import walk_media
+
+@pytest.fixture
+def export(tmp_path):
+    root = tmp_path / "downloads"
+    for part in ("data-download-1", "data-download-2"):
+        (root / part).mkdir(parents=True)
+    big = os.urandom(3 * PARTIAL_BYTES)
+    # the same photo in both parts, the original ("_o") in the second
+    (root / "data-download-1" / "IMG_10000000001.jpg").write_bytes(big)
+    (root / "data-download-2" / "IMG_10000000001_o.jpg").write_bytes(big)
+    # same size and same first/last 64 KB, different middle: not a copy
+    other = bytearray(big)
+    other[len(big) // 2] ^= 0xFF
+    (root / "data-download-1" / "IMG_10000000002.jpg").write_bytes(big)
+    (root / "data-download-2" / "IMG_10000000002.jpg").write_bytes(bytes(other))
+    # identical bytes, different IDs: both kept
+    (root / "data-download-1" / "IMG_10000000003.jpg").write_bytes(b"small")
+    (root / "data-download-2" / "IMG_10000000004.jpg").write_bytes(b"small")
+    return root
+
+def names(entries, root):
+    return sorted(os.path.relpath(e.path, root) for e in entries)
+
+def test_one_copy_of_identical_files_is_kept(tmp_path, export):
+    entries = walk_media(export)
+    kept, dropped = dedup_entries(entries, 2, tmp_path / "hashes.sqlite")
+    assert [(os.path.basename(e.path), os.path.basename(k.path)) for e, k in dropped] == [
+        ("IMG_10000000001.jpg", "IMG_10000000001_o.jpg")]
+    assert len(kept) == len(entries) - 1
+    # the kept entries keep their order
+    assert [e.path for e in kept] == [e.path for e in entries if e is not dropped[0][0]]
+    assert {"data-download-1/IMG_10000000002.jpg", "data-download-2/IMG_10000000002.jpg",
+            "data-download-1/IMG_10000000003.jpg", "data-download-2/IMG_10000000004.jpg"} <= set(names(kept, export))
+
+def test_second_run_is_served_from_the_hash_cache(tmp_path, export, monkeypatch):
+    cache = tmp_path / "hashes.sqlite"
+    first = dedup_entries(walk_media(export), 2, cache)
+
+    def no_hashing(*args):
+        raise AssertionError("hashed again")
+
+    monkeypatch.setattr(dedup, "partial_hash", no_hashing)
+    monkeypatch.setattr(dedup, "full_hash", no_hashing)
+    second = dedup_entries(walk_media(export), 2, cache)
+    assert [(e.path, k.path) for e, k in second[1]] == [(e.path, k.path) for e, k in first[1]]
+
+    # a changed file is hashed again
+    hashed = []
+    monkeypatch.setattr(dedup, "partial_hash", lambda path, size: hashed.append(path) or "changed")
+    p = export / "data-download-1" / "IMG_10000000002.jpg"
+    st = p.stat()
+    os.utime(p, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    dedup_entries(walk_media(export), 2, cache)
+    assert hashed == [str(p)]
@@ -0,0 +1,28 @@
+"""DestIndex: free destination names, case-insensitively, also in a non-empty --out."""
+
+from organize_by_year_month import DestIndex
+
+def test_same_name_from_two_sources_gets_a_suffix(tmp_path):
+    idx = DestIndex()
+    d = tmp_path / "2015" / "06"
+    assert idx.claim(d, "IMG_1.jpg") == d / "IMG_1.jpg"
+    assert idx.claim(d, "IMG_1.jpg") == d / "IMG_1_1.jpg"
+    assert idx.claim(d, "IMG_1.jpg") == d / "IMG_1_2.jpg"
+    # another folder has its own names
+    assert idx.claim(tmp_path / "2015" / "07", "IMG_1.jpg") == tmp_path / "2015" / "07" / "IMG_1.jpg"
+    assert d.is_dir()
+
+def test_names_differing_only_in_case_do_not_collide(tmp_path):
+    idx = DestIndex()
+    assert idx.claim(tmp_path, "IMG.JPG") == tmp_path / "IMG.JPG"
+    assert idx.claim(tmp_path, "img.jpg") == tmp_path / "img_1.jpg"
+    assert idx.claim(tmp_path, "Img.Jpg") == tmp_path / "Img_2.Jpg"
+
+def test_names_already_in_the_output_folder_are_skipped(tmp_path):
+    for name in ("name.jpg", "name_1.jpg", "NAME_3.JPG"):
+        (tmp_path / name).write_bytes(b"")
+    idx = DestIndex()
+    assert idx.claim(tmp_path, "name.jpg") == tmp_path / "name_2.jpg"
+    assert idx.claim(tmp_path, "name.jpg") == tmp_path / "name_4.jpg"
+    # a source that is itself called name_1.jpg
+    assert idx.claim(tmp_path, "name_1.jpg") == tmp_path / "name_1_1.jpg"
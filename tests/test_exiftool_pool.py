@@ -0,0 +1,100 @@
+"""ExiftoolPool / ExiftoolWorker against a fake -stay_open exiftool (tests/fake_stay_open.py)."""
+
+import time
+from pathlib import Path
+
+import pytest
+
+import exiftool_pool
+from exiftool_pool import ExiftoolPool, ExiftoolWorker
+
+FAKE = str(Path(__file__).resolve().parent / "fake_stay_open.py")
+
+@pytest.fixture
+def log(tmp_path, monkeypatch):
+    path = tmp_path / "blocks.log"
+    monkeypatch.setenv("FAKE_STAY_OPEN_LOG", str(path))
+    monkeypatch.setattr(exiftool_pool, "RETRY_BACKOFF", 0.01)
+    return path
+
+def blocks(log):
+    return log.read_text(encoding="utf-8").splitlines() if log.exists() else []
+
+def test_status_is_parsed_per_file_in_a_batch(tmp_path, log):
+    w = ExiftoolWorker(FAKE)
+    try:
+        files = [str(tmp_path / n) for n in ("a.jpg", "b_missing.jpg", "c.jpg")]
+        results = w.execute_batch([["-overwrite_original", "-XMP:Title=x", f] for f in files])
+    finally:
+        w.close()
+    assert [r.returncode for r in results] == [0, 1, 0]
+    # each result only holds its own block's output
+    assert results[0].stdout == f"file {files[0]}\n"
+    assert results[1].stdout == "" and "File not found" in results[1].stderr
+    assert results[2].stdout == f"file {files[2]}\n" and results[2].stderr == ""
+    assert len(blocks(log)) == 3
+
+def test_ready_numbers_keep_consecutive_batches_apart(tmp_path, log):
+    w = ExiftoolWorker(FAKE)
+    try:
+        first = w.execute_batch([[str(tmp_path / f"{i}.jpg")] for i in range(5)])
+        second = w.execute_batch([[str(tmp_path / f"{i}.mov")] for i in range(3)])
+    finally:
+        w.close()
+    assert w.seq == 8
+    assert [r.stdout for r in first] == [f"file {tmp_path / f'{i}.jpg'}\n" for i in range(5)]
+    assert [r.stdout for r in second] == [f"file {tmp_path / f'{i}.mov'}\n" for i in range(3)]
+
+def test_stderr_larger_than_a_pipe_buffer_does_not_hang(tmp_path, log):
+    w = ExiftoolWorker(FAKE)
+    try:
+        files = [str(tmp_path / n) for n in ("a_noisy.jpg", "b.jpg", "c_noisy.jpg")]
+        results = w.execute_batch([[f] for f in files], timeout=20)
+    finally:
+        w.close()
+    assert [r.returncode for r in results] == [0, 0, 0]
+    assert len(results[0].stderr) > 128 * 1024 and results[1].stderr == ""
+
+def test_worker_dying_mid_batch_is_restarted_and_the_job_rerun_alone(tmp_path, log):
+    files = [str(tmp_path / n) for n in ("a.jpg", "b.jpg", "c_crash.jpg", "d.jpg", "e.jpg")]
+    with ExiftoolPool(1, executable=FAKE) as pool:
+        out = list(pool.map(files, lambda f: ["-XMP:Title=x", f], batch_size=5, retries=2, timeout=20))
+        assert [item for item, _ in out] == files
+        assert [res.returncode for _, res in out] == [0] * 5
+        assert out[2][1].stdout == f"file {files[2]}\n"
+        # the pool still works on the restarted process
+        assert pool.execute([str(tmp_path / "f.jpg")]).returncode == 0
+    # the batch ran up to the crash; every unfinished job then ran on its own
+    assert blocks(log) == ["a.jpg", "b.jpg", "c_crash.jpg", "c_crash.jpg", "d.jpg", "e.jpg", "f.jpg"]
+
+def test_stuck_worker_is_killed_after_the_timeout(tmp_path, log):
+    w = ExiftoolWorker(FAKE)
+    try:
+        res = w.execute([str(tmp_path / "x_hang.jpg")], timeout=0.5)
+        assert res.returncode == -1 and "timed out" in res.stderr
+        assert w.execute([str(tmp_path / "y.jpg")]).returncode == 0
+    finally:
+        w.close()
+
+def test_timer_of_a_replaced_worker_leaves_the_new_process_alone(tmp_path, log):
+    w = ExiftoolWorker(FAKE)
+    try:
+        first = w.proc
+        assert w.execute([str(tmp_path / "c_crash.jpg")], timeout=0.3).returncode == -1
+        assert w.proc is not first
+        time.sleep(0.5)
+        w._expire(first)  # a timer armed for the old process firing late
+        assert w.proc.poll() is None
+        assert w.execute([str(tmp_path / "y.jpg")]).returncode == 0
+    finally:
+        w.close()
+
+def test_job_that_timed_out_once_succeeds_on_retry(tmp_path, log):
+    files = [str(tmp_path / n) for n in ("a.jpg", "b_stall.jpg", "c.jpg")]
+    with ExiftoolPool(1, executable=FAKE) as pool:
+        out = list(pool.map(files, lambda f: ["-XMP:Title=x", f], batch_size=3, retries=1, timeout=0.5))
+    assert [res.returncode for _, res in out] == [0, 0, 0]
+    assert out[1][1].stdout == f"file {files[1]}\n"
+    # the killed write's temp file was cleared before the rerun
+    assert not (tmp_path / "b_stall.jpg_exiftool_tmp").exists()
+    assert blocks(log) == ["a.jpg", "b_stall.jpg", "b_stall.jpg", "c.jpg"]
@@ -0,0 +1,87 @@
+"""stream_exiftool_scan(): exiftool -T lines with an -@ argfile, against a stub exiftool."""
+
+import csv
+import os
+import stat
+import sys
+
+import pytest
+
+import organize_by_year_month as organize
+from organize_by_year_month import scan_row, stream_exiftool_scan
+
+STUB = """#!{python}
+# Prints $STUB_SCAN_OUTPUT as the -T scan of the files in the -@ argfile.
+import os, sys
+args = sys.argv[1:]
+assert args[0] == "-T" and args[-2] == "-@", args
+with open(args[-1], encoding="utf-8") as f:
+    listed = [line.rstrip("\\n") for line in f]
+with open(os.environ["STUB_LISTED"], "w", encoding="utf-8") as f:
+    f.write("\\n".join(listed))
+sys.stdout.write(open(os.environ["STUB_SCAN_OUTPUT"], encoding="utf-8").read())
+sys.stderr.write(os.environ.get("STUB_SCAN_ERRORS", ""))
+sys.exit(int(os.environ.get("STUB_SCAN_STATUS", "0")))
+"""
+
+@pytest.fixture
+def stub(tmp_path, monkeypatch):
+    exe = tmp_path / "exiftool"
+    exe.write_text(STUB.format(python=sys.executable))
+    exe.chmod(exe.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setattr(organize, "EXIFTOOL", str(exe))
+    monkeypatch.setenv("STUB_LISTED", str(tmp_path / "listed.txt"))
+
+    def output(lines, status=0, errors=""):
+        out = tmp_path / "scan.txt"
+        out.write_text("".join(line + "\n" for line in lines), encoding="utf-8")
+        monkeypatch.setenv("STUB_SCAN_OUTPUT", str(out))
+        monkeypatch.setenv("STUB_SCAN_STATUS", str(status))
+        monkeypatch.setenv("STUB_SCAN_ERRORS", errors)
+    return output
+
+def test_rows_from_tab_separated_lines(tmp_path, stub):
+    d = tmp_path / "downloads"
+    d.mkdir()
+    tabbed = d / "IMG\t10000000003.jpg"
+    tabbed.write_bytes(b"")
+    files = [str(d / "IMG_10000000001.jpg"), str(d / "IMG_10000000002.jpg"), str(tabbed), str(d / "cut.jpg")]
+    stub([f"2015:06:07 12:00:00\t2015:06:07 12:00:00\tIMG_10000000001.jpg\t{d}",
+          f"-\t2016:01:02 03:04:05\tIMG_10000000002.jpg\t{d}",
+          f"-\t-\tIMG\t10000000003.jpg\t{d}",
+          "2017:01:01 00:00:00"])
+    manifest = tmp_path / "exif_manifest.csv"
+    rows = list(stream_exiftool_scan(iter(files), manifest))
+
+    assert (tmp_path / "listed.txt").read_text(encoding="utf-8").split("\n") == files
+    assert rows[0] == {"DateTimeOriginal": "2015:06:07 12:00:00", "CreateDate": "2015:06:07 12:00:00",
+                       "FileName": "IMG_10000000001.jpg", "Directory": str(d),
+                       "SourceFile": files[0]}
+    # "-" is an empty tag
+    assert rows[1]["DateTimeOriginal"] == "" and rows[1]["CreateDate"] == "2016:01:02 03:04:05"
+    # a tab in the name: the split that names an existing file
+    assert rows[2]["FileName"] == tabbed.name and rows[2]["SourceFile"] == str(tabbed)
+    # missing columns are empty, and there is no SourceFile to place
+    assert rows[3]["FileName"] == "" and rows[3]["SourceFile"] == ""
+    with manifest.open(encoding="utf-8", newline="") as f:
+        assert list(csv.DictReader(f)) == rows
+
+def test_files_without_output_are_reported_not_fatal(tmp_path, stub, capsys):
+    files = [str(tmp_path / f"IMG_{10000000000 + i}.jpg") for i in range(3)]
+    stub([f"-\t-\tIMG_10000000001.jpg\t{tmp_path}"], status=1,
+         errors=f"Error: File not found - {files[0]}\nError: File not found - {files[2]}\n")
+    rows = list(stream_exiftool_scan(iter(files), tmp_path / "exif_manifest.csv"))
+    assert [r["SourceFile"] for r in rows] == [files[1]]
+    err = capsys.readouterr().err
+    assert "returned nothing for 2 file(s)" in err and files[2] in err
+
+def test_scan_without_any_output_fails(tmp_path, stub):
+    stub([], status=1, errors="Error: cannot read argfile\n")
+    with pytest.raises(RuntimeError, match="cannot read argfile"):
+        list(stream_exiftool_scan(iter([str(tmp_path / "a.jpg")]), tmp_path / "exif_manifest.csv"))
+
+def test_scan_row_pads_and_strips():
+    row = scan_row("2015:06:07 12:00:00\t-\r\n")
+    assert row == {"DateTimeOriginal": "2015:06:07 12:00:00", "CreateDate": "", "FileName": "",
+                   "Directory": "", "SourceFile": ""}
+    assert os.path.basename(scan_row("-\t-\ta\tb\t/nowhere")["SourceFile"]) == "a"
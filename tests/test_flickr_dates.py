@@ -0,0 +1,25 @@
+"""flickr_dates: the helpers the date-fixing steps share."""
+
+from pathlib import Path
+
+import fix_and_embed
+import fix_photo_dates
+import fix_video_dates
+from flickr_dates import date_tag_args, pick_best_file, to_exiftool_dt
+
+def test_fix_steps_share_one_implementation():
+    for module in (fix_photo_dates, fix_video_dates, fix_and_embed):
+        assert module.pick_best_file is pick_best_file and module.to_exiftool_dt is to_exiftool_dt
+
+def test_pick_best_file_prefers_the_original():
+    paths = [Path("b/IMG_1.jpg"), Path("a/IMG_1_o.JPG"), Path("c/img_0.jpg")]
+    assert pick_best_file(paths) == Path("a/IMG_1_o.JPG")
+    assert pick_best_file(paths[::2]) == Path("c/img_0.jpg")
+
+def test_to_exiftool_dt():
+    assert to_exiftool_dt(" 2015-06-07 12:34:56 ") == "2015:06:07 12:34:56"
+    assert to_exiftool_dt("2015-06-07") is None
+
+def test_photo_args_are_the_photo_date_tags():
+    assert fix_photo_dates.exiftool_args("a.jpg", "2015:06:07 12:00:00", True) == (
+        ["-overwrite_original"] + date_tag_args("2015:06:07 12:00:00", "photo") + ["a.jpg"])
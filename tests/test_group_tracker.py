@@ -0,0 +1,25 @@
+"""GroupTracker: each Flickr ID is handed on once, under the ID as written."""
+
+from pathlib import Path
+
+from media_inventory import MediaEntry
+from media_names import pid_from_name
+from organize_by_year_month import GroupTracker
+
+def entry(name):
+    return MediaEntry(f"/downloads/{name}", "photo", 1, 0, pid_from_name(name))
+
+def test_ids_with_leading_zeros_keep_them():
+    groups = []
+    tracker = GroupTracker(groups.append)
+    names = ["IMG_0012345678.jpg", "IMG_0012345678_o.jpg", "IMG_00987654321.jpg", "IMG_00987654321_o.jpg"]
+    for name in names:
+        tracker.add(entry(name))
+    tracker.done(Path(names[0]), "/out/a.jpg")
+    assert groups == []
+    tracker.done(Path(names[1]), "/out/b.jpg")
+    assert groups == [{"0012345678": [Path("/out/a.jpg"), Path("/out/b.jpg")]}]
+    # the scan never reported names[3]: the ID is handed on by flush()
+    tracker.done(Path(names[2]), "/out/c.jpg")
+    tracker.flush()
+    assert groups[1:] == [{"00987654321": [Path("/out/c.jpg")]}]
@@ -0,0 +1,170 @@
+"""Byte-level checks of the in-place date patcher on generated JPEG/MP4/MOV files."""
+
+import struct
+from datetime import datetime
+
+import pytest
+
+from native_dates import QT_EPOCH, patch_dates
+
+OLD = "2001:02:03 04:05:06"
+NEW = "2019:07:14 18:30:00"
+
+def _entry(order, tag, typ, count, value):
+    return struct.pack(order + "HHII", tag, typ, count, value)
+
+def make_jpeg(order, tags=("ModifyDate", "DateTimeOriginal", "CreateDate")):
+    """
+    JPEG with an Exif APP1 block in byte order "<" (II) or ">" (MM).
+    -> (bytes, {tag: offset of its value in the file})
+    """
+    date = OLD.encode("ascii") + b"\0"
+    exif_tags = [t for t in ("DateTimeOriginal", "CreateDate") if t in tags]
+    ifd0_n = 1 + ("ModifyDate" in tags)
+    ifd0_at = 8
+    exif_at = ifd0_at + 2 + 12 * ifd0_n + 4
+    data_at = exif_at + 2 + 12 * len(exif_tags) + 4
+    values, offsets = b"", {}
+    ifd0 = b""
+    if "ModifyDate" in tags:
+        offsets["ModifyDate"] = data_at + len(values)
+        ifd0 += _entry(order, 0x0132, 2, 20, offsets["ModifyDate"])
+        values += date
+    ifd0 += _entry(order, 0x8769, 4, 1, exif_at)
+    exif = b""
+    for t in exif_tags:
+        offsets[t] = data_at + len(values)
+        exif += _entry(order, {"DateTimeOriginal": 0x9003, "CreateDate": 0x9004}[t], 2, 20, offsets[t])
+        values += date
+    tiff = ((b"II" if order == "<" else b"MM") + struct.pack(order + "HI", 42, ifd0_at)
+            + struct.pack(order + "H", ifd0_n) + ifd0 + b"\0\0\0\0"
+            + struct.pack(order + "H", len(exif_tags)) + exif + b"\0\0\0\0" + values)
+    app1 = b"Exif\0\0" + tiff
+    head = b"\xff\xd8\xff\xe1" + struct.pack(">H", len(app1) + 2)
+    body = head + app1 + b"\xff\xda\x00\x02" + bytes(range(256)) * 4 + b"\xff\xd9"
+    tiff_base = len(head) + 6
+    return body, {t: tiff_base + off for t, off in offsets.items()}
+
+def _atom(typ, payload):
+    return struct.pack(">I4s", 8 + len(payload), typ) + payload
+
+def _qt_secs(exif_dt):
+    return int((datetime.strptime(exif_dt, "%Y:%m:%d %H:%M:%S") - QT_EPOCH).total_seconds())
+
+def _header(version, secs, rest):
+    if version == 0:
+        return bytes([0, 0, 0, 0]) + struct.pack(">II", secs, secs) + rest
+    return bytes([1, 0, 0, 0]) + struct.pack(">QQ", secs, secs) + rest
+
+def make_quicktime(version, brand=b"isom", mvhd=True):
+    """
+    MP4/MOV with mvhd, two traks (tkhd + mdia/mdhd) and an mdat.
+    -> (bytes, [(offset, width)] of every creation/modification time pair)
+    """
+    secs = _qt_secs(OLD)
+    width = 4 if version == 0 else 8
+    parts, slots = [], []
+    pos = 8  # inside moov
+    if mvhd:
+        a = _atom(b"mvhd", _header(version, secs, b"\x00\x00\x03\xe8" + b"\x11" * 84))
+        slots.append((pos + 8 + 4, width))
+        parts.append(a)
+        pos += len(a)
+    for track in range(2):
+        tkhd = _atom(b"tkhd", _header(version, secs, bytes([track]) * 76))
+        mdhd = _atom(b"mdhd", _header(version, secs, b"\x00\x00\x03\xe8" + b"\x22" * 8))
+        mdia = _atom(b"mdia", mdhd + _atom(b"hdlr", b"\0" * 24))
+        trak = _atom(b"trak", tkhd + mdia)
+        slots.append((pos + 8 + 8 + 4, width))               # trak > tkhd
+        slots.append((pos + 8 + len(tkhd) + 8 + 8 + 4, width))  # trak > mdia > mdhd
+        parts.append(trak)
+        pos += len(trak)
+    ftyp = _atom(b"ftyp", brand + b"\0\0\0\0" + brand)
+    moov = _atom(b"moov", b"".join(parts))
+    mdat = _atom(b"mdat", bytes(range(256)) * 8)
+    return ftyp + moov + mdat, [(len(ftyp) + off, w) for off, w in slots]
+
+def check_patched(path, before, expected):
+    # expected: {offset: new bytes}; every other byte must be unchanged
+    after = path.read_bytes()
+    assert len(after) == len(before)
+    want = bytearray(before)
+    for off, data in expected.items():
+        want[off:off + len(data)] = data
+    assert after == bytes(want)
+    assert after != before
+
+@pytest.mark.parametrize("order", ["<", ">"])
+def test_jpeg_only_date_bytes_change(tmp_path, order):
+    data, offsets = make_jpeg(order)
+    path = tmp_path / "IMG_12345678901.jpg"
+    path.write_bytes(data)
+    assert patch_dates(path, NEW, "photo")
+    new = NEW.encode("ascii") + b"\0"
+    check_patched(path, data, {off: new for off in offsets.values()})
+    assert (tmp_path / "IMG_12345678901.jpg_original").read_bytes() == data
+
+@pytest.mark.parametrize("version", [0, 1])
+@pytest.mark.parametrize("name,brand", [("clip.mp4", b"isom"), ("clip.mov", b"qt  ")])
+def test_quicktime_only_date_bytes_change(tmp_path, version, name, brand):
+    data, slots = make_quicktime(version, brand)
+    path = tmp_path / name
+    path.write_bytes(data)
+    assert patch_dates(path, NEW, "video")
+    secs = _qt_secs(NEW)
+    fmt = {4: ">II", 8: ">QQ"}
+    check_patched(path, data, {off: struct.pack(fmt[w], secs, secs) for off, w in slots})
+    assert len(slots) == 5
+    assert (tmp_path / (name + "_original")).read_bytes() == data
+
+def test_no_backup_with_overwrite_original(tmp_path):
+    data, _ = make_jpeg("<")
+    path = tmp_path / "a.jpg"
+    path.write_bytes(data)
+    assert patch_dates(path, NEW, "photo", backup=False)
+    assert not (tmp_path / "a.jpg_original").exists()
+
+def test_existing_backup_is_kept(tmp_path):
+    data, _ = make_jpeg("<")
+    path = tmp_path / "a.jpg"
+    path.write_bytes(data)
+    (tmp_path / "a.jpg_original").write_bytes(b"older")
+    assert patch_dates(path, NEW, "photo")
+    assert (tmp_path / "a.jpg_original").read_bytes() == b"older"
+
+@pytest.mark.parametrize("name,data,kind", [
+    ("no_create.jpg", make_jpeg("<", tags=("ModifyDate", "DateTimeOriginal"))[0], "photo"),
+    ("no_modify.jpg", make_jpeg(">", tags=("DateTimeOriginal", "CreateDate"))[0], "photo"),
+    ("no_exif.jpg", b"\xff\xd8\xff\xe0\x00\x10JFIF\0\x01\x01\0\0\x01\0\x01\0\0\xff\xda\x00\x02\xff\xd9", "photo"),
+    ("no_mvhd.mp4", make_quicktime(0, mvhd=False)[0], "video"),
+    ("truncated.mov", make_quicktime(1)[0][:100], "video"),
+    ("empty.jpg", b"", "photo"),
+    ("photo.png", b"\x89PNG\r\n\x1a\n" + b"\0" * 64, "photo"),
+])
+def test_files_without_date_fields_are_left_for_exiftool(tmp_path, name, data, kind):
+    path = tmp_path / name
+    path.write_bytes(data)
+    assert not patch_dates(path, NEW, kind)
+    assert path.read_bytes() == data
+    assert not (tmp_path / (name + "_original")).exists()
+
+def test_date_past_32_bit_field_is_left_for_exiftool(tmp_path):
+    data, _ = make_quicktime(0)
+    path = tmp_path / "late.mp4"
+    path.write_bytes(data)
+    assert not patch_dates(path, "2045:01:01 00:00:00", "video")
+    assert path.read_bytes() == data
+    # the 64-bit fields of a version 1 header take it
+    data, _ = make_quicktime(1)
+    path.write_bytes(data)
+    assert patch_dates(path, "2045:01:01 00:00:00", "video", backup=False)
+
+def test_hardlinked_source_is_not_patched(tmp_path):
+    data, _ = make_jpeg("<")
+    src = tmp_path / "src.jpg"
+    src.write_bytes(data)
+    path = tmp_path / "out.jpg"
+    path.hardlink_to(src)
+    assert patch_dates(path, NEW, "photo", backup=False)
+    assert src.read_bytes() == data
+    assert path.read_bytes() != data
@@ -0,0 +1,45 @@
+"""place_file(): copies only show up under their real name once complete."""
+
+import os
+
+import pytest
+
+import organize_by_year_month as organize
+from file_copy import copy_into_place
+
+@pytest.mark.parametrize("mode", organize.MODES)
+def test_place_file_leaves_no_part_file(tmp_path, mode):
+    src = tmp_path / "src" / "IMG_12345678901.jpg"
+    src.parent.mkdir()
+    src.write_bytes(b"x" * 100_000)
+    data = src.read_bytes()
+    dest = tmp_path / "out" / src.name
+    dest.parent.mkdir()
+    organize.place_file(src, dest, mode)
+    assert dest.read_bytes() == data
+    assert os.listdir(dest.parent) == [dest.name]
+
+def test_interrupted_copy_does_not_take_the_name(tmp_path):
+    src = tmp_path / "a.jpg"
+    src.write_bytes(b"y" * 100_000)
+    dest = tmp_path / "out" / "a.jpg"
+    dest.parent.mkdir()
+
+    def interrupted(s, d):
+        with open(d, "wb") as f:
+            f.write(b"y" * 10)
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        copy_into_place(src, dest, interrupted)
+    assert os.listdir(dest.parent) == []
+
+def test_leftover_part_file_is_replaced(tmp_path):
+    src = tmp_path / "a.jpg"
+    src.write_bytes(b"z" * 1000)
+    dest = tmp_path / "out" / "a.jpg"
+    dest.parent.mkdir()
+    (dest.parent / ".a.jpg.part").write_bytes(b"stale")
+    organize.place_file(src, dest, "copy")
+    assert dest.read_bytes() == b"z" * 1000
+    assert os.listdir(dest.parent) == ["a.jpg"]
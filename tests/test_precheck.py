@@ -0,0 +1,54 @@
+"""precheck: already-correct files are skipped, including southern/western GPS values."""
+
+import json
+from pathlib import Path
+
+from embed_metadata import metadata_tag_args
+from exiftool_pool import ExiftoolPool
+from precheck import SkipCurrent, drop_current, is_current, parse_tag_args
+from sidecar_index import normalize_geo
+
+FAKE = str(Path(__file__).resolve().parent / "fake_stay_open.py")
+
+def geo_args(path, sidecar_geo):
+    lat, lon = normalize_geo(sidecar_geo)
+    rec = {"title": "", "description": "", "tags": [], "geo": {"lat": lat, "lon": lon}}
+    return metadata_tag_args(Path(path), rec, title=False, description=False, tags=False, geo=True) + [str(path)]
+
+def written(lat, lon):
+    # what exiftool -j -n -G0 reads back after "-GPSLatitude=<lat>" etc.: EXIF unsigned plus Ref, XMP signed
+    return {"EXIF:GPSLatitude": abs(lat), "EXIF:GPSLatitudeRef": "S" if lat < 0 else "N",
+            "EXIF:GPSLongitude": abs(lon), "EXIF:GPSLongitudeRef": "W" if lon < 0 else "E",
+            "XMP:GPSLatitude": lat, "XMP:GPSLongitude": lon}
+
+def test_southern_and_western_coordinates_compare_equal():
+    tag_args = parse_tag_args(geo_args("IMG_1.jpg", [{"latitude": "-33.8688", "longitude": "-70.6693"}]))
+    assert is_current(written(-33.8688, -70.6693), tag_args)
+    assert not is_current(written(33.8688, -70.6693), tag_args)
+    # no Ref written: the unsigned EXIF value is not the wanted one
+    cur = written(-33.8688, -70.6693)
+    del cur["EXIF:GPSLatitudeRef"]
+    assert not is_current(cur, tag_args)
+
+def test_northern_and_eastern_coordinates_compare_equal():
+    tag_args = parse_tag_args(geo_args("IMG_1.jpg", {"lat": 48.8584, "lon": 2.2945}))
+    assert is_current(written(48.8584, 2.2945), tag_args)
+    assert not is_current(written(48.8584, -2.2945), tag_args)
+
+def test_drop_current_reads_the_ref_tags(tmp_path):
+    files = {}
+    for name, (lat, lon) in {"IMG_10000000001.jpg": (-33.8688, 151.2093),
+                             "IMG_10000000002.jpg": (40.7128, -74.006),
+                             "IMG_10000000003.jpg": (0, 0)}.items():
+        p = tmp_path / name
+        p.write_text(json.dumps(written(lat, lon)))
+        files[p] = (lat, lon)
+    sidecar = {p: [{"latitude": str(lat), "longitude": str(lon)}] for p, (lat, lon) in files.items()}
+    # 3's sidecar has a different location: it still needs a write
+    sidecar[tmp_path / "IMG_10000000003.jpg"] = [{"latitude": "-1.5", "longitude": "2"}]
+    build_args = lambda p: geo_args(p, sidecar[p])
+    with ExiftoolPool(1, executable=FAKE) as pool:
+        keep, correct = drop_current(pool, list(files), build_args)
+        assert [p.name for p in keep] == ["IMG_10000000003.jpg"] and correct == 2
+        skip = SkipCurrent(pool, iter(files), build_args)
+        assert [p.name for p in skip] == ["IMG_10000000003.jpg"] and skip.skipped == 2
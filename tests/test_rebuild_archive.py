@@ -0,0 +1,67 @@
+"""rebuild_archive.py: organize and the write step side by side."""
+
+import json
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+import fix_and_embed
+import organize_by_year_month as organize
+import rebuild_archive
+import sidecar_index
+from metrics import Metrics
+
+FAKE_EXIFTOOL = str(Path(__file__).resolve().parents[1] / "benchmarks" / "fake_exiftool.py")
+
+def test_failing_write_step_stops_organize_before_the_context_closes(tmp_path, monkeypatch, capsys):
+    downloads = tmp_path / "downloads" / "data-download-1"
+    downloads.mkdir(parents=True)
+    json_dir = tmp_path / "json"
+    json_dir.mkdir()
+    for i in range(60):
+        pid = str(10000000000 + i)
+        (downloads / f"IMG_{pid}.jpg").write_text("FAKEEXIF 2015:06:07 12:00:00\n")
+        (json_dir / f"photo_{pid}.json").write_text(json.dumps({"id": pid, "date_taken": "2015-06-07 12:00:00"}))
+    out = tmp_path / "out"
+    monkeypatch.chdir(tmp_path)  # exif_manifest.csv
+    monkeypatch.setattr(organize, "EXIFTOOL", FAKE_EXIFTOOL)
+    monkeypatch.setattr(sidecar_index, "CACHE_DIR", tmp_path / "cache")
+    monkeypatch.setenv("FAKE_EXIFTOOL_SCAN_MS", "20")
+    closed = []
+    monkeypatch.setattr(rebuild_archive.RunContext, "close",
+                        lambda self: closed.append([t.name for t in threading.enumerate()]))
+
+    def failing_write(args, ctx, groups):
+        next(iter(groups))
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr(fix_and_embed, "run", failing_write)
+    monkeypatch.setattr(sys, "argv", ["rebuild_archive.py", "--downloads", str(tmp_path / "downloads"),
+                                      "--json", str(json_dir), "--out", str(out)])
+    with pytest.raises(RuntimeError, match="disk full"):
+        rebuild_archive.main()
+    # the organize thread was stopped and had ended when the context closed
+    assert closed and "organize" not in closed[0]
+    assert "Organize stopped early" in capsys.readouterr().err
+    assert len(list(out.rglob("IMG_*.jpg"))) < 60
+
+def test_same_phase_on_two_threads_counts_wall_time_once():
+    m = Metrics()
+    inside = threading.Barrier(2)
+
+    def walk():
+        with m.phase("walk") as ph:
+            inside.wait()
+            ph.add()
+            inside.wait()
+
+    threads = [threading.Thread(target=walk) for _ in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    ph = m.phases["walk"]
+    assert ph.items == 2 and ph.started is None
+    assert 0 < ph.seconds < m.summary()["total_seconds"] + 1e-3
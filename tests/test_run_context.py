@@ -0,0 +1,29 @@
+"""The sidecar index is refreshed once per run, however many steps/threads read it."""
+
+import json
+import threading
+
+from run_context import RunContext
+
+def test_sidecar_index_is_parsed_once(tmp_path, capsys):
+    json_dir = tmp_path / "json"
+    json_dir.mkdir()
+    for i in range(50):
+        (json_dir / f"photo_{10000000000 + i}.json").write_text(
+            json.dumps({"id": str(10000000000 + i), "date_taken": "2015-06-07 12:00:00", "geo": []}))
+    index = str(tmp_path / "index.sqlite")
+    with RunContext(1) as ctx:
+        ctx.refresh_sidecar_index([json_dir], index, 1)
+        lookups = []
+
+        def organize_thread():
+            with ctx.open_sidecar_index([json_dir], index, 1) as idx:
+                lookups.append(idx.lookup(["10000000007"]))
+
+        t = threading.Thread(target=organize_thread)
+        t.start()
+        records = ctx.sidecar_records([json_dir], index, 1)
+        t.join()
+    assert len(records) == 50
+    assert "10000000007" in lookups[0]
+    assert capsys.readouterr().out.count("Sidecar index updated") == 1
@@ -0,0 +1,67 @@
+"""RunJournal: what --resume skips and redoes, and a torn last line."""
+
+import json
+import os
+
+from run_journal import RunJournal
+
+def touch_later(path):
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+def test_placed_dest_skips_unchanged_sources_only(tmp_path):
+    src, dest = tmp_path / "a.jpg", tmp_path / "out" / "a.jpg"
+    dest.parent.mkdir()
+    src.write_bytes(b"a" * 10)
+    dest.write_bytes(b"a" * 10)
+    path = tmp_path / "journal.jsonl"
+    with RunJournal(path) as j:
+        j.record_placed(src, src.stat(), dest)
+    with RunJournal(path) as j:
+        assert j.placed_dest(src, src.stat()) == str(dest)
+        touch_later(src)
+        assert j.placed_dest(src, src.stat()) is None
+    with RunJournal(path) as j:
+        src.write_bytes(b"a" * 11)
+        assert j.placed_dest(src, src.stat()) is None
+
+def test_placed_dest_redoes_a_deleted_destination(tmp_path):
+    src, dest = tmp_path / "a.jpg", tmp_path / "b.jpg"
+    src.write_bytes(b"a")
+    dest.write_bytes(b"a")
+    with RunJournal(tmp_path / "journal.jsonl") as j:
+        j.record_placed(src, src.stat(), dest)
+        dest.unlink()
+        assert j.placed_dest(src, src.stat()) is None
+
+def test_step_done_until_the_file_changes(tmp_path):
+    p = tmp_path / "a.jpg"
+    p.write_bytes(b"written")
+    path = tmp_path / "journal.jsonl"
+    with RunJournal(path) as j:
+        j.record_step(p, "fix_dates")
+    with RunJournal(path) as j:
+        assert j.step_done(p, "fix_dates")
+        assert not j.step_done(p, "embed_metadata")
+        p.write_bytes(b"edited elsewhere")
+        assert not j.step_done(p, "fix_dates")
+        p.unlink()
+        assert not j.step_done(p, "fix_dates")
+
+def test_torn_last_line_is_ignored_and_not_glued_to_the_next(tmp_path, capsys):
+    a, b = tmp_path / "a.jpg", tmp_path / "b.jpg"
+    a.write_bytes(b"a")
+    b.write_bytes(b"b")
+    path = tmp_path / "journal.jsonl"
+    with RunJournal(path) as j:
+        j.record_step(a, "fix_dates")
+    line = json.dumps({"event": "step", "path": str(b), "step": "fix_dates", "size": 1, "mtime_ns": 1})
+    with path.open("a", encoding="utf-8") as f:
+        f.write(line[:len(line) // 2])  # interrupted mid-write
+    with RunJournal(path) as j:
+        assert j.step_done(a, "fix_dates")
+        assert not j.step_done(b, "fix_dates")
+        j.record_step(b, "fix_dates")
+    assert "Ignored 1 unreadable journal line" in capsys.readouterr().err
+    with RunJournal(path) as j:
+        assert j.step_done(a, "fix_dates") and j.step_done(b, "fix_dates")
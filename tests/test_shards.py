@@ -0,0 +1,93 @@
+"""--shard K/N: every file on exactly one shard, and the merge equals a single run."""
+
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+import organize_by_year_month as organize
+import shards
+import sidecar_index
+from archive_manifest import manifest_path
+from media_names import pid_from_name
+from shards import Shard, check_shards, shard_of
+
+FAKE_EXIFTOOL = str(Path(__file__).resolve().parents[1] / "benchmarks" / "fake_exiftool.py")
+NAMES = ([f"IMG_{10000000000 + i}.jpg" for i in range(40)] +
+         [f"VID_{100000000000 + i}_1.mp4" for i in range(10)] +
+         ["holiday.jpg", "holiday_1.jpg", "Holiday_1_2.JPG", "scan.png", "scan_3.png"])
+
+@pytest.mark.parametrize("n", [1, 2, 3, 7])
+def test_every_file_is_on_exactly_one_shard(n):
+    for name in NAMES:
+        owners = [k for k in range(1, n + 1) if Shard(k, n).owns(name, pid_from_name(name))]
+        assert owners == [shard_of(name, pid_from_name(name), n)]
+
+def test_files_of_one_id_or_name_share_a_shard():
+    for n in (2, 3, 5):
+        assert len({shard_of(name, "10000000007", n) for name in
+                    ("IMG_10000000007.jpg", "IMG_10000000007_1.jpg", "10000000007.mov")}) == 1
+        # without an ID, the name with any _N collision suffix stripped decides
+        assert len({shard_of(name, "", n) for name in ("holiday.jpg", "holiday_1.jpg", "Holiday_1_2.JPG")}) == 1
+
+@pytest.fixture
+def downloads(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # exif_manifest.csv
+    monkeypatch.setattr(organize, "EXIFTOOL", FAKE_EXIFTOOL)
+    monkeypatch.setattr(sidecar_index, "CACHE_DIR", tmp_path / "cache")
+    monkeypatch.setenv("FAKE_EXIFTOOL_SCAN_MS", "0")
+    root = tmp_path / "downloads"
+    for part in ("data-download-1", "data-download-2"):
+        (root / part).mkdir(parents=True)
+    for i in range(30):
+        month = 1 + i % 3
+        (root / "data-download-1" / f"IMG_{10000000000 + i}.jpg").write_text(f"FAKEEXIF 2015:{month:02d}:07 12:00:00\n")
+    # same names in both parts, same month: the second copy becomes NAME_1
+    for name in ("IMG_10000000003.jpg", "holiday.jpg", "beach.jpg"):
+        (root / "data-download-2" / name).write_text("FAKEEXIF 2015:01:07 12:00:00\n")
+    (root / "data-download-1" / "holiday.jpg").write_text("FAKEEXIF 2015:01:07 12:00:00\n")
+    (root / "data-download-1" / "nodate.jpg").write_text("no tags\n")
+    return root
+
+def organize_run(downloads, out, *extra):
+    organize.main(["--downloads", str(downloads), "--out", str(out), "--copy-workers", "2", *extra])
+
+def placed(out):
+    with sqlite3.connect(str(manifest_path(out))) as db:
+        rows = db.execute("SELECT src, pid, dest, date_source FROM files").fetchall()
+    return sorted((src, pid, dest and str(Path(dest).relative_to(out)), source) for src, pid, dest, source in rows)
+
+def test_merged_shards_match_a_single_run(tmp_path, downloads):
+    single, sharded = tmp_path / "single", tmp_path / "sharded"
+    organize_run(downloads, single)
+    for k in range(1, 4):
+        organize_run(downloads, sharded, "--shard", f"{k}/3")
+    assert check_shards(sharded, 3, str(downloads)) == []
+    shards.main(["--out", str(sharded), "--shards", "3", "--downloads", str(downloads)])
+
+    assert placed(sharded) == placed(single)
+    assert "holiday_1.jpg" in {Path(d).name for _, _, d, _ in placed(single) if d}
+    files = lambda out: sorted(str(p.relative_to(out)) for p in out.rglob("*.jpg"))
+    assert files(sharded) == files(single)
+    assert not list(sharded.glob("*.shard*"))
+
+def test_merge_rejects_a_missing_or_duplicated_shard(tmp_path, downloads, capsys):
+    out = tmp_path / "out"
+    for k in (1, 2):
+        organize_run(downloads, out, "--shard", f"{k}/3")
+    with pytest.raises(SystemExit):
+        shards.main(["--out", str(out), "--shards", "3"])
+    assert "shard 3/3 has not run" in capsys.readouterr().err
+
+    organize_run(downloads, out, "--shard", "3/3")
+    # a source recorded by two shards (e.g. copied from another run)
+    with sqlite3.connect(str(manifest_path(out, Shard(1, 3)))) as one:
+        row = one.execute("SELECT * FROM files LIMIT 1").fetchone()
+    with sqlite3.connect(str(manifest_path(out, Shard(2, 3)))) as two:
+        two.execute("INSERT INTO files VALUES (?,?,?,?,?,?,?,?,?)", row)
+    problems = check_shards(out, 3)
+    assert any("more than one shard" in p for p in problems)
+    with pytest.raises(SystemExit):
+        shards.main(["--out", str(out), "--shards", "3"])
+    # nothing was merged
+    assert not manifest_path(out).exists()
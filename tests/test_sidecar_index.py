@@ -0,0 +1,49 @@
+"""SidecarIndex.refresh(): an ID found in several JSON dirs keeps the last dir's record."""
+
+import json
+import os
+
+from sidecar_index import SidecarIndex
+
+def write_sidecar(d, pid, title):
+    d.mkdir(exist_ok=True)
+    (d / f"photo_{pid}.json").write_text(json.dumps({"id": pid, "name": title}))
+
+def test_later_dir_wins_after_an_earlier_dir_changes(tmp_path):
+    part1, part2 = tmp_path / "part1", tmp_path / "part2"
+    write_sidecar(part1, "10000000001", "from part1")
+    write_sidecar(part2, "10000000001", "from part2")
+    with SidecarIndex(tmp_path / "index.sqlite") as idx:
+        assert idx.refresh([part1, part2]) == 2
+        assert idx.get("10000000001")["title"] == "from part2"
+        assert idx.refresh([part1, part2]) == 0
+
+        write_sidecar(part1, "10000000002", "new in part1")
+        assert idx.refresh([part1, part2]) == 3
+        assert idx.get("10000000001")["title"] == "from part2"
+        assert idx.get("10000000002")["title"] == "new in part1"
+        assert idx.count() == 2
+
+def test_dir_order_and_removed_dirs(tmp_path):
+    part1, part2 = tmp_path / "part1", tmp_path / "part2"
+    write_sidecar(part1, "10000000001", "from part1")
+    write_sidecar(part2, "10000000001", "from part2")
+    with SidecarIndex(tmp_path / "index.sqlite") as idx:
+        idx.refresh([part1, part2])
+        idx.refresh([part2, part1])
+        assert idx.get("10000000001")["title"] == "from part1"
+        # dropping the winning dir brings the other record back
+        idx.refresh([part2])
+        assert idx.get("10000000001")["title"] == "from part2"
+
+def test_changed_sidecar_is_reparsed(tmp_path):
+    part1 = tmp_path / "part1"
+    write_sidecar(part1, "10000000001", "old")
+    with SidecarIndex(tmp_path / "index.sqlite") as idx:
+        idx.refresh([part1])
+        p = part1 / "photo_10000000001.json"
+        p.write_text(json.dumps({"id": "10000000001", "name": "new"}))
+        st = p.stat()
+        os.utime(p, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+        assert idx.refresh([part1]) == 1
+        assert idx.get("10000000001")["title"] == "new"
@@ -0,0 +1,61 @@
+"""Time zone lookup for video dates with the geo values sidecars actually contain."""
+
+import json
+
+import pytest
+
+import video_tz
+from video_tz import VideoTimes, geo_point
+
+LOCAL = "2020:01:01 12:00:00"
+BERLIN_UTC = "2020:01:01 11:00:00"  # CET, UTC+1
+NEW_YORK_UTC = "2020:01:01 17:00:00"  # EST, UTC-5
+
+@pytest.fixture
+def polygons(tmp_path, monkeypatch):
+    # one square around Berlin; the index goes to tmp_path, not ~/.cache
+    monkeypatch.setattr(video_tz, "CACHE_DIR", tmp_path / "cache")
+    square = [[13.0, 52.0], [14.0, 52.0], [14.0, 53.0], [13.0, 53.0], [13.0, 52.0]]
+    path = tmp_path / "zones.json"
+    path.write_text(json.dumps({"type": "FeatureCollection", "features": [
+        {"type": "Feature", "properties": {"tzid": "Europe/Berlin"},
+         "geometry": {"type": "Polygon", "coordinates": [square]}},
+    ]}), encoding="utf-8")
+    return str(path)
+
+@pytest.mark.parametrize("geo", [
+    {"lat": 52.52, "lon": 13.40},
+    {"lat": "52.52", "lon": "13.40"},
+    {"lat": " 52.52 ", "lon": "13.4"},
+])
+def test_numeric_and_string_coordinates_find_the_zone(polygons, geo):
+    times = VideoTimes("America/New_York", polygons)
+    try:
+        assert times.utc(LOCAL, geo) == BERLIN_UTC
+        assert times.counts["geo"] == 1
+    finally:
+        times.close()
+
+@pytest.mark.parametrize("geo", [
+    None,
+    {},
+    {"lat": "", "lon": ""},
+    {"lat": "north", "lon": "13.40"},
+    {"lat": None, "lon": 13.40},
+    {"lat": "152.52", "lon": "13.40"},
+    {"lat": 52.52, "lon": -200},
+    {"lat": "nan", "lon": "13.40"},
+    {"lat": "48.85", "lon": "2.35"},  # parses, but outside every polygon
+])
+def test_unusable_geo_falls_back_to_tz(polygons, geo):
+    times = VideoTimes("America/New_York", polygons)
+    try:
+        assert times.utc(LOCAL, geo) == NEW_YORK_UTC
+        assert times.counts["tz"] == 1
+    finally:
+        times.close()
+
+def test_geo_point():
+    assert geo_point({"lat": "52.52", "lon": "13.40"}) == (52.52, 13.40)
+    assert geo_point({"lat": 0, "lon": 0}) == (0.0, 0.0)
+    assert geo_point({"lat": "x", "lon": 1}) is None
@@ -0,0 +1,71 @@
+"""Sidecar naming while organize is still placing files into the same folder."""
+
+from pathlib import Path
+
+import fix_and_embed
+from xmp_sidecar import XmpSidecars
+
+REC = {"title": "Sunset", "description": "", "tags": ["beach"], "geo": None, "date_taken": ""}
+
+def sidecars(folder):
+    return sorted(p.name for p in Path(folder).glob("*.xmp"))
+
+def writer():
+    return XmpSidecars(title=True, description=True, tags=True, geo=True, workers=2)
+
+def test_unique_base_name_gets_the_short_name(tmp_path):
+    (tmp_path / "IMG.jpg").write_bytes(b"")
+    (tmp_path / "OTHER.mov").write_bytes(b"")
+    with writer() as xmp:
+        xmp.add(tmp_path / "IMG.jpg", REC)
+    assert sidecars(tmp_path) == ["IMG.xmp"]
+
+def test_base_name_placed_after_the_first_write(tmp_path):
+    (tmp_path / "IMG.jpg").write_bytes(b"")
+    with writer() as xmp:
+        xmp.add(tmp_path / "IMG.jpg", REC)
+        xmp.flush()
+        (tmp_path / "IMG.mov").write_bytes(b"")  # organize places it later
+        xmp.add(tmp_path / "IMG.mov", REC)
+    assert sidecars(tmp_path) == ["IMG.jpg.xmp", "IMG.mov.xmp"]
+
+def test_shared_base_name_without_a_record(tmp_path):
+    (tmp_path / "IMG.jpg").write_bytes(b"")
+    with writer() as xmp:
+        xmp.add(tmp_path / "IMG.jpg", REC)
+        xmp.flush()
+        (tmp_path / "img.MOV").write_bytes(b"")
+    assert sidecars(tmp_path) == ["IMG.jpg.xmp"]
+
+def test_rerun_keeps_the_names(tmp_path):
+    for name in ("IMG.jpg", "IMG.mov"):
+        (tmp_path / name).write_bytes(b"")
+    for _ in range(2):
+        with writer() as xmp:
+            for name in ("IMG.jpg", "IMG.mov"):
+                xmp.add(tmp_path / name, REC)
+    assert sidecars(tmp_path) == ["IMG.jpg.xmp", "IMG.mov.xmp"]
+    assert xmp.counts["unchanged"] == 2
+
+def test_foreign_short_sidecar_is_not_renamed(tmp_path):
+    (tmp_path / "IMG.jpg").write_bytes(b"")
+    with writer() as xmp:
+        xmp.add(tmp_path / "IMG.jpg", REC)
+        xmp.flush()
+        for fut in xmp.futures:
+            fut.result()
+        (tmp_path / "IMG.xmp").write_text("<x:xmpmeta x:xmptk=\"Lightroom\"/>")
+        (tmp_path / "IMG.mov").write_bytes(b"")
+    assert sidecars(tmp_path) == ["IMG.xmp"]
+
+def test_retry_set_applies_before_sidecars(tmp_path):
+    paths = [tmp_path / f"IMG_1000000000{i}.jpg" for i in range(3)]
+    for p in paths:
+        p.write_bytes(b"")
+    id_to_files = {f"1000000000{i}": [p] for i, p in enumerate(paths)}
+    records = {pid: REC for pid in id_to_files}
+    with writer() as xmp:
+        work = fix_and_embed.build_worklist(id_to_files, {}, records, fix=False, title=True, description=True,
+                                            tags=True, geo=True, xmp=xmp, only={str(paths[1])})
+    assert work == []
+    assert sidecars(tmp_path) == ["IMG_10000000001.xmp"]